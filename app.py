@@ -1,8 +1,25 @@
-from flask import Flask, jsonify, send_from_directory, send_file
+from flask import Blueprint, Flask, Response, jsonify, request, send_from_directory, send_file
 from flask_cors import CORS
 import os
-from utils.f1_data import get_available_races, get_race_data
+from utils.admission import admission_stats, admit
+from utils.cache import get_cache_path, get_track_cache_path
+from utils.f1_data import get_available_races, get_event_index, get_race_stream
+from utils.track_analysis import DEFAULT_SEGMENT_METRES, get_speed_segments
 from utils.track_maps import get_track_coordinates
+from utils.track_render import get_thumbnail_path, get_track_svg, is_render_current
+from utils.battles import find_battles
+from utils.catalog import list_races
+from utils.disk_budget import start_background_sweep
+from utils.driver_delta import get_driver_delta, parse_laps
+from utils.lap_telemetry import get_lap_telemetry, parse_channels
+from utils.hot_cache import get_compact_race, get_encoded_race, start_background_prewarm
+from utils.live_session import read_live_session
+from utils.playback import control_playback, open_playback
+from utils.popularity import record_access
+from utils.race_events import EVENT_TYPES, find_events, get_index_path, race_state
+from utils.telemetry_codec import MIME_TYPE as COMPACT_MIME_TYPE
+from utils.race_stream import iter_json, iter_ndjson, parse_time, window_frames
+from utils.season_laps import season_pace, tyre_degradation
 
 # Get absolute path to static folder
 # Try multiple approaches to find the correct path
@@ -21,29 +38,326 @@ if not os.path.exists(STATIC_FOLDER):
         if os.path.exists(cwd_path):
             STATIC_FOLDER = cwd_path
 
-app = Flask(__name__, static_folder=STATIC_FOLDER, static_url_path='')
-CORS(app)  # Enable CORS for React dev server
+bp = Blueprint('main', __name__)
+
+# Admission classes (see utils/admission.py): a route is warm when what it serves is cached
+def _race_class(year, gp, session, **_):
+    return 'warm' if os.path.exists(get_cache_path(year, gp, session)) else 'cold'
+
+def _event_index_class(year, gp, session, **_):
+    return 'warm' if os.path.exists(get_index_path(year, gp, session)) else 'cold'
+
+def _track_class(year, gp, **_):
+    return 'warm' if os.path.exists(get_track_cache_path(year, gp)) else 'cold'
+
+def _track_render_class(year, gp, name):
+    # Rendering a cached track (matplotlib for thumbnails) is compute work
+    if not os.path.exists(get_track_cache_path(year, gp)):
+        return 'cold'
+    return 'warm' if is_render_current(year, gp, name) else 'compute'
+
+def _track_svg_class(year, gp, **_):
+    return _track_render_class(year, gp, 'path.json')
+
+def _track_thumbnail_class(year, gp, size, **_):
+    return _track_render_class(year, gp, f"{size}.png")
 
 # API Routes
-@app.route('/api/races')
+@bp.route('/api/races')
+@admit('warm')
 def api_races():
-    """List available 2025 races"""
+    """
+    List available races with their sessions and processing status.
+
+    Query parameters:
+    - year: only this season
+    - session: only events with this session type (e.g. 'R', 'Q', 'S')
+    """
     try:
-        races = get_available_races()
+        year = request.args.get('year')
+        try:
+            year = int(year) if year else None
+        except ValueError:
+            return jsonify({'error': 'year must be an integer'}), 400
+        races = get_available_races(year, request.args.get('session') or None)
         return jsonify(races)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/race/<int:year>/<gp>/<session>')
+@bp.route('/api/race/<int:year>/<gp>/<session>')
+@admit(_race_class)
 def api_race(year, gp, session):
-    """Get race telemetry data"""
+    """
+    Get race telemetry data, streamed from the cache.
+
+    Query parameters:
+    - format: 'json' (default), 'ndjson' (metadata line, then one frame per line)
+      or 'compact' (binary encoding)
+    - from, to: only frames within this race time window (seconds or H:MM:SS)
+    - telemetry=0: metadata only
+    """
+    try:
+        fmt = request.args.get('format', 'json')
+        if fmt == 'compact':
+            blob = get_compact_race(year, gp, session)
+            record_access(year, gp, session)
+            return Response(blob, mimetype=COMPACT_MIME_TYPE)
+        if fmt not in ('json', 'ndjson'):
+            return jsonify({'error': f'Unknown format: {fmt}'}), 400
+        try:
+            start = parse_time(request.args.get('from'))
+            end = parse_time(request.args.get('to'))
+        except ValueError:
+            return jsonify({'error': 'from/to must be seconds or H:MM:SS'}), 400
+        windowed = start is not None or end is not None
+        metadata_only = request.args.get('telemetry') == '0'
+
+        # Hot races are kept pre-encoded (shared copy-on-write across workers)
+        if fmt == 'json' and not windowed and not metadata_only:
+            body = get_encoded_race(year, gp, session)
+            if body is not None:
+                record_access(year, gp, session)
+                return Response(body, mimetype='application/json')
+
+        meta, frames = get_race_stream(year, gp, session)
+        record_access(year, gp, session)
+        if metadata_only:
+            frames.close()
+            return jsonify(meta)
+        frames = window_frames(frames, start, end)
+        if fmt == 'ndjson':
+            return Response(iter_ndjson(meta, frames), mimetype='application/x-ndjson')
+        return Response(iter_json(meta, frames), mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/race/<int:year>/<gp>/<session>/events')
+@admit(_event_index_class)
+def api_race_events(year, gp, session):
+    """
+    Race events (position changes, overtakes, pit stops, track status, race
+    control messages) from the race's event index.
+
+    Query parameters:
+    - t: race time (seconds or H:MM:SS); returns the events nearest after it,
+      or before it with direction=prev. Without t, every event is returned.
+    - type: comma-separated event types (default: all)
+    - driver: only events involving this driver number
+    - limit: number of events with t (default 1)
+    """
+    try:
+        t = parse_time(request.args.get('t'))
+        limit = max(int(request.args.get('limit', 1)), 1)
+    except ValueError:
+        return jsonify({'error': 't must be seconds or H:MM:SS and limit an integer'}), 400
+    types = [name for name in request.args.get('type', '').split(',') if name] or None
+    driver = request.args.get('driver') or None
+    direction = request.args.get('direction', 'next')
+    try:
+        index = get_event_index(year, gp, session)
+        if index is None:
+            return jsonify({'error': 'No event index for this race'}), 404
+        if t is None:
+            # The whole index: a search from before the start up to every event
+            t, direction, limit = float('-inf'), 'next', len(index['events'])
+        events = find_events(index, t, direction, types, driver, limit)
+        return jsonify({'t': t if t != float('-inf') else None, 'direction': direction, 'events': events})
+    except ValueError as e:
+        return jsonify({'error': str(e), 'types': list(EVENT_TYPES)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/race/<int:year>/<gp>/<session>/battles')
+@admit(_event_index_class)
+def api_race_battles(year, gp, session):
+    """
+    Battles (two cars running close together for several laps) from the
+    race's event index.
+
+    Query parameters:
+    - t: race time (seconds or H:MM:SS); only battles active at that time
+    - driver: only battles involving this driver number
+    """
+    try:
+        t = parse_time(request.args.get('t'))
+    except ValueError:
+        return jsonify({'error': 't must be seconds or H:MM:SS'}), 400
     try:
-        data = get_race_data(year, gp, session)
-        return jsonify(data)
+        index = get_event_index(year, gp, session)
+        if index is None:
+            return jsonify({'error': 'No event index for this race'}), 404
+        return jsonify({'t': t, 'battles': find_battles(index, t, request.args.get('driver') or None)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/track/<int:year>/<gp>')
+@bp.route('/api/race/<int:year>/<gp>/<session>/state')
+@admit(_event_index_class)
+def api_race_state(year, gp, session):
+    """
+    The state of the race at one instant, from the race's event index: each
+    driver's position, lap, tyre and pit lane state, the running order, the
+    track status and the last race control message.
+
+    Query parameters:
+    - t: race time (seconds or H:MM:SS, default 0), clamped to the race
+    """
+    try:
+        t = parse_time(request.args.get('t')) or 0.0
+    except ValueError:
+        return jsonify({'error': 't must be seconds or H:MM:SS'}), 400
+    try:
+        index = get_event_index(year, gp, session)
+        if index is None:
+            return jsonify({'error': 'No event index for this race'}), 404
+        return jsonify(race_state(index, t))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/race/<int:year>/<gp>/<session>/lap/<driver>/<int:lap>')
+@admit('compute')
+def api_lap_telemetry(year, gp, session, driver, lap):
+    """
+    One driver's lap (number or code) at full telemetry rate.
+
+    Query parameters:
+    - channels: comma-separated channels (default: time, distance, speed,
+      throttle, brake, gear, rpm, drs; also x, y, z)
+    """
+    try:
+        channels = parse_channels(request.args.get('channels'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = get_lap_telemetry(year, gp, session, driver, lap, channels)
+        if result is None:
+            return jsonify({'error': 'No telemetry for this lap'}), 404
+        record_access(year, gp, session)
+        return jsonify(result)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/live/<int:year>/<gp>/<session>')
+@admit('warm')
+def api_live(year, gp, session):
+    """
+    Get an in-progress session processed so far (see run_live.py).
+
+    Query parameters:
+    - since: first frame index to return (defaults to 0); poll again with
+      since set to the 'frames' count in the response's 'live' entry
+    - format: 'json' (default) or 'ndjson'
+    """
+    try:
+        fmt = request.args.get('format', 'json')
+        if fmt not in ('json', 'ndjson'):
+            return jsonify({'error': f'Unknown format: {fmt}'}), 400
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return jsonify({'error': 'since must be a frame index'}), 400
+
+        live = read_live_session(year, gp, session, since)
+        if live is None:
+            return jsonify({'error': 'No live session'}), 404
+        meta, frames = live
+        if fmt == 'ndjson':
+            return Response(iter_ndjson(meta, frames), mimetype='application/x-ndjson')
+        return Response(iter_json(meta, frames), mimetype='application/json')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/delta/<int:year>/<gp>/<session>')
+@admit('compute')
+def api_delta(year, gp, session):
+    """
+    Time delta of driver b relative to driver a along the lap distance,
+    from the raw telemetry (positive: b is behind).
+
+    Query parameters:
+    - a, b: drivers (number or code)
+    - laps: 'N' or 'N-M' (default: the whole session)
+    - reference: 'lap' (delta resets every lap, default with laps) or 'race' (on-track gap)
+    - step: grid spacing in metres (default 10)
+    """
+    if not request.args.get('a') or not request.args.get('b'):
+        return jsonify({'error': 'a and b are required'}), 400
+    try:
+        laps = parse_laps(request.args.get('laps'))
+        step = float(request.args.get('step', 10))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        delta = get_driver_delta(year, gp, session, request.args['a'], request.args['b'],
+                                 laps=laps, reference=request.args.get('reference'), step=step)
+        if delta is None:
+            return jsonify({'error': 'No telemetry for these drivers and laps'}), 404
+        record_access(year, gp, session)
+        return jsonify(delta)
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/playback/<int:year>/<gp>/<session>')
+@admit(_race_class, stream='playback')
+def api_playback(year, gp, session):
+    """
+    Play a race back as Server-Sent Events, one 'frame' event per telemetry frame
+    at the requested speed. Viewers at the same position and speed share one
+    frame generator (see utils/playback.py).
+
+    Query parameters:
+    - from: race time to start at (seconds or H:MM:SS); on reconnect the
+      Last-Event-ID header resumes after the last frame received
+    - speed: playback speed (defaults to 1)
+
+    The first event ('meta') carries the viewer id used by the control endpoint.
+    """
+    try:
+        try:
+            start = parse_time(request.args.get('from'))
+            speed = float(request.args.get('speed', 1))
+        except ValueError:
+            return jsonify({'error': 'from must be seconds or H:MM:SS and speed a number'}), 400
+        last_event_id = request.headers.get('Last-Event-ID')
+        last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+        try:
+            _, events = open_playback(year, gp, session, start, speed, last_event_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        record_access(year, gp, session)
+        return Response(events, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/playback/<viewer>', methods=['POST'])
+def api_playback_control(viewer):
+    """
+    Control an open playback stream without reconnecting.
+    JSON body (all optional): seek (seconds or H:MM:SS), speed, paused (bool).
+    """
+    try:
+        body = request.get_json(silent=True) or {}
+        try:
+            seek = parse_time(str(body['seek'])) if body.get('seek') is not None else None
+            speed = float(body['speed']) if body.get('speed') is not None else None
+            state = control_playback(viewer, seek=seek, speed=speed, paused=body.get('paused'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if state is None:
+            return jsonify({'error': 'No such playback stream'}), 404
+        return jsonify(state)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/track/<int:year>/<gp>')
+@admit(_track_class)
 def api_track(year, gp):
     """Get track coordinates from FastF1"""
     try:
@@ -52,16 +366,127 @@ def api_track(year, gp):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Renders only change when a track is reprocessed; clients revalidate with the ETag
+TRACK_RENDER_MAX_AGE = 86400
+
+@bp.route('/api/track/<int:year>/<gp>/svg')
+@admit(_track_svg_class)
+def api_track_svg(year, gp):
+    """Compact SVG path of a cached track (800 x 600 viewBox, like the track map)"""
+    try:
+        svg = get_track_svg(year, gp)
+        if svg is None:
+            return jsonify({'error': 'Track not cached'}), 404
+        response = jsonify(svg)
+        response.cache_control.public = True
+        response.cache_control.max_age = TRACK_RENDER_MAX_AGE
+        response.add_etag()
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/track/<int:year>/<gp>/thumbnail/<int:size>.png')
+@admit(_track_thumbnail_class)
+def api_track_thumbnail(year, gp, size):
+    """PNG thumbnail of a cached track, size pixels square (one of TRACK_THUMBNAIL_SIZES)"""
+    try:
+        path = get_thumbnail_path(year, gp, size)
+        if path is None:
+            return jsonify({'error': 'Track not cached'}), 404
+        return send_file(path, mimetype='image/png', max_age=TRACK_RENDER_MAX_AGE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/track/<int:year>/<gp>/speed')
+@admit('compute')
+def api_track_speed(year, gp):
+    """
+    Speed per track segment (min, median, max over representative laps, and
+    the fastest lap's), to colour the track map.
+
+    Query parameters:
+    - session: session type (default 'R')
+    - segment: segment length in metres (default TRACK_SEGMENT_METRES)
+    """
+    try:
+        segment = float(request.args.get('segment', DEFAULT_SEGMENT_METRES))
+    except ValueError:
+        return jsonify({'error': 'segment must be a number of metres'}), 400
+    session = request.args.get('session', 'R')
+    try:
+        segments = get_speed_segments(year, gp, session, segment)
+        if segments is None:
+            return jsonify({'error': 'No telemetry for this session'}), 404
+        return jsonify(segments)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _season_order(year):
+    """Grand Prix of a season in round order, from the catalog"""
+    return [race['gp'] for race in list_races(year)]
+
+@bp.route('/api/season/<int:year>/pace')
+@admit('compute')
+def api_season_pace(year):
+    """
+    Median pace of each driver at each event, over clean laps of the season lap table.
+
+    Query parameters:
+    - driver: only this driver (code or number)
+    - session: session type (default 'R')
+    """
+    try:
+        pace = season_pace(year, request.args.get('session', 'R'), request.args.get('driver') or None,
+                           _season_order(year))
+        if pace is None:
+            return jsonify({'error': 'No lap data for this season'}), 404
+        return jsonify(pace)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/season/<int:year>/degradation')
+@admit('compute')
+def api_season_degradation(year):
+    """
+    Lap time lost per lap of tyre age, by compound, fitted within stints.
+
+    Query parameters:
+    - compound, event: only this compound / Grand Prix
+    - by=event: one result per event and compound
+    - session: session type (default 'R')
+    """
+    try:
+        degradation = tyre_degradation(year, request.args.get('session', 'R'),
+                                       compound=request.args.get('compound') or None,
+                                       event=request.args.get('event') or None,
+                                       by_event=request.args.get('by') == 'event',
+                                       events=_season_order(year))
+        if degradation is None:
+            return jsonify({'error': 'No lap data for this season'}), 404
+        return jsonify(degradation)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Admission lane state, for monitoring (never admission-controlled itself)
+@bp.route('/api/admission')
+def api_admission():
+    """Admission lanes of the worker process that serves this request"""
+    return jsonify(admission_stats())
+
 # Serve React app static files
-@app.route('/assets/<path:filename>')
+@bp.route('/assets/<path:filename>')
 def serve_assets(filename):
     """Serve static assets from the dist folder"""
     assets_dir = os.path.join(STATIC_FOLDER, 'assets')
     return send_from_directory(assets_dir, filename)
 
 # Serve React app in production - catch all other routes
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+@bp.route('/', defaults={'path': ''})
+@bp.route('/<path:path>')
 def serve(path):
     """Serve React app - all non-API routes go to index.html for client-side routing"""
     # Don't serve API routes
@@ -89,6 +514,17 @@ def serve(path):
     else:
         return jsonify({'error': f'Frontend not found. Tried: {possible_paths}'}), 500
 
+def create_app():
+    """Application factory used by `flask run`, `python app.py` and wsgi.py"""
+    app = Flask(__name__, static_folder=STATIC_FOLDER, static_url_path='')
+    CORS(app)  # Enable CORS for React dev server
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    # Under gunicorn each worker starts these in gunicorn.conf.py instead
+    start_background_sweep()
+    start_background_prewarm()
     app.run(debug=True, host='0.0.0.0', port=5001)
 
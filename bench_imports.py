@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the serving path.
+
+Imports the given module (default: app) in a fresh interpreter and reports
+wall time, peak RSS and the slowest imports (from `python -X importtime`).
+Fails if any heavy processing dependency (fastf1, pandas, numpy, boto3) is
+imported, or if the import takes longer than the budget, so it can run in CI.
+
+Usage:
+    python bench_imports.py [--module app] [--budget-ms 500] [--runs 5] [--top 10]
+"""
+
+import sys
+import os
+import json
+import argparse
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Only needed when a race is actually processed or S3 is used
+HEAVY_MODULES = ['fastf1', 'pandas', 'numpy', 'boto3', 'botocore', 'matplotlib', 'scipy']
+
+PROBE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': [m for m in {heavy!r} if m in sys.modules],
+}}))
+'''
+
+def probe(module, importtime=False):
+    """Import module in a fresh interpreter. Returns (result dict, stderr)."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', PROBE.format(module=module, heavy=HEAVY_MODULES)]
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+def slowest_imports(importtime_output, module, top):
+    """Parse `-X importtime` output into (cumulative microseconds, name) pairs for module's dependencies"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: <self us> | <cumulative us> | <indent><module>"
+        _, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        name = name.strip()
+        if name != module:
+            rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import cost of the serving path')
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget-ms', type=float, default=500.0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    results = [probe(args.module)[0] for _ in range(args.runs)]
+    times_ms = sorted(r['seconds'] * 1000 for r in results)
+    median_ms = times_ms[len(times_ms) // 2]
+    maxrss_mb = max(r['maxrss_kb'] for r in results) / 1024
+    heavy = sorted({m for r in results for m in r['heavy']})
+
+    print("=" * 60)
+    print(f"Import benchmark: import {args.module}")
+    print("=" * 60)
+    print(f"Median import time: {median_ms:.1f} ms (min {times_ms[0]:.1f}, max {times_ms[-1]:.1f}, {args.runs} runs)")
+    print(f"Peak RSS:           {maxrss_mb:.1f} MB")
+    print(f"Heavy modules:      {', '.join(heavy) if heavy else 'none'}")
+    print()
+    print("Slowest imports (cumulative):")
+    _, importtime_output = probe(args.module, importtime=True)
+    for us, name in slowest_imports(importtime_output, args.module, args.top):
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if heavy:
+        failures.append(f"heavy modules imported on the serving path: {', '.join(heavy)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"import took {median_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if failures:
+        print()
+        for failure in failures:
+            print(f"✗ {failure}")
+        sys.exit(1)
+    print()
+    print("✓ Within budget")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Peak-memory report for the race processing pipeline.
+
+Writes synthetic telemetry stores of increasing race length, then rebuilds
+each race in a fresh interpreter and reports its peak RSS. 'stream' is the
+pipeline get_race_data() uses (drivers resampled one at a time, frames
+written to the cache as they are produced); 'memory' builds the whole
+payload in memory first, for comparison. Peak RSS in stream mode should stay
+roughly flat as races get longer.
+
+Usage:
+    python bench_pipeline.py [--durations 1800 3600 7200] [--drivers 20] [--hz 4]
+"""
+
+import sys
+import os
+import json
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import numpy, pandas, pyarrow.parquet
+from utils.f1_data import build_race_data, rebuild_race_from_store
+from utils.telemetry_store import load_store
+
+def rss_mb():
+    # ru_maxrss survives exec on Linux (it would include the parent's peak); VmHWM does not
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+baseline = rss_mb()
+start = time.perf_counter()
+if {mode!r} == 'stream':
+    rebuild_race_from_store({year!r}, {gp!r}, 'R')
+else:
+    data = build_race_data({year!r}, {gp!r}, 'R', load_store({year!r}, {gp!r}, 'R'))
+    body = json.dumps(data, separators=(',', ':'))
+print(json.dumps({{'seconds': time.perf_counter() - start, 'baseline_mb': baseline, 'peak_mb': rss_mb()}}))
+'''
+
+def probe(cache_dir, year, gp, mode):
+    """Rebuild one race in a fresh interpreter. Returns the measurements."""
+    env = dict(os.environ, DATA_CACHE_DIR=cache_dir)
+    code = PROBE.format(root=PROJECT_ROOT, year=year, gp=gp, mode=mode)
+    proc = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def main():
+    parser = argparse.ArgumentParser(description='Report peak memory of race processing')
+    parser.add_argument('--durations', type=int, nargs='+', default=[1800, 3600, 7200],
+                        help='Race lengths in seconds')
+    parser.add_argument('--drivers', type=int, default=20)
+    parser.add_argument('--hz', type=int, default=4, help='Telemetry samples per second per driver')
+    parser.add_argument('--modes', nargs='+', default=['stream', 'memory'], choices=['stream', 'memory'])
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='f1-bench-pipeline-')
+    os.environ['DATA_CACHE_DIR'] = cache_dir
+    sys.path.insert(0, PROJECT_ROOT)
+    from utils.cache import get_cache_path
+    from utils.synthetic import make_session_store
+    from utils.telemetry_store import get_store_path
+
+    print("=" * 78)
+    print(f"Pipeline memory: {args.drivers} drivers, {args.hz} Hz telemetry (cache: {cache_dir})")
+    print("=" * 78)
+    print(f"{'race':>8s} {'store':>9s} {'artifact':>9s} {'mode':>7s} {'baseline':>9s} {'peak':>9s} {'delta':>9s} {'time':>7s}")
+    for duration in args.durations:
+        gp = f"Synthetic {duration}s"
+        make_session_store(2025, gp, 'R', args.drivers, duration, hz=args.hz)
+        store_mb = directory_size(get_store_path(2025, gp, 'R')) / 1024 / 1024
+        for mode in args.modes:
+            result = probe(cache_dir, 2025, gp, mode)
+            artifact_mb = os.path.getsize(get_cache_path(2025, gp, 'R')) / 1024 / 1024
+            delta = result['peak_mb'] - result['baseline_mb']
+            print(f"{duration:>7d}s {store_mb:>7.1f}MB {artifact_mb:>7.1f}MB {mode:>7s} "
+                  f"{result['baseline_mb']:>7.1f}MB {result['peak_mb']:>7.1f}MB {delta:>7.1f}MB "
+                  f"{result['seconds']:>6.1f}s")
+    print()
+    print("baseline: RSS after imports; delta: growth while processing one race")
+    print("(stream mode RSS includes reclaimable pages of its disk-backed sample arrays)")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nBenchmark interrupted by user.")
+        sys.exit(1)
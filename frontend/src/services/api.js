@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { decodeRaceData } from './telemetryCodec';
 
 // In production (Docker), use relative path. In dev, use localhost:5001
 const API_BASE_URL = import.meta.env.PROD ? '/api' : 'http://localhost:5001/api';
@@ -21,6 +22,87 @@ export const getRaceData = async (year, gp, session = 'R') => {
   return response.data;
 };
 
+// Same data as getRaceData, fetched in the compact binary encoding (~20x smaller)
+export const getRaceDataCompact = async (year, gp, session = 'R') => {
+  const response = await api.get(`/race/${year}/${gp}/${session}`, {
+    params: { format: 'compact' },
+    responseType: 'arraybuffer',
+  });
+  return decodeRaceData(response.data);
+};
+
+// Same data as getRaceData, streamed as NDJSON so playback can start before the
+// download finishes: onMeta(meta) fires once the metadata line arrives and
+// onFrames(frames) for every batch of telemetry frames. Resolves with the full race.
+export const streamRaceData = async (year, gp, session = 'R', { onMeta, onFrames } = {}) => {
+  const response = await fetch(`${API_BASE_URL}/race/${year}/${gp}/${session}?format=ndjson`);
+  if (!response.ok) {
+    throw new Error(`Failed to load race data (${response.status})`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  const telemetry = [];
+  let meta = null;
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    buffer += value || '';
+    const lines = buffer.split('\n');
+    buffer = done ? '' : lines.pop();
+
+    const frames = [];
+    for (const line of lines) {
+      if (!line) continue;
+      if (meta === null) {
+        meta = JSON.parse(line);
+        onMeta?.(meta);
+      } else {
+        frames.push(JSON.parse(line));
+      }
+    }
+    if (frames.length) {
+      for (const frame of frames) telemetry.push(frame);
+      onFrames?.(frames);
+    }
+    if (done) break;
+  }
+  return { ...meta, telemetry };
+};
+
+// Server-pushed playback (Server-Sent Events) for clients that should not hold
+// the whole race: the server sends each frame when it is due. onMeta(meta) fires
+// first, then onFrame(frame, index) per frame, onState(state) after every
+// seek/speed/pause and onEnd() when the race is over. Returns controls that
+// change playback without reconnecting.
+export const playRace = (year, gp, session = 'R', { from, speed = 1, onMeta, onFrame, onState, onEnd } = {}) => {
+  const params = new URLSearchParams({ speed });
+  if (from !== undefined) params.set('from', from);
+  const source = new EventSource(`${API_BASE_URL}/playback/${year}/${gp}/${session}?${params}`);
+  let viewer = null;
+
+  source.addEventListener('meta', (event) => {
+    const meta = JSON.parse(event.data);
+    viewer = meta.playback.viewer;
+    onMeta?.(meta);
+  });
+  source.addEventListener('frame', (event) => onFrame?.(JSON.parse(event.data), Number(event.lastEventId)));
+  source.addEventListener('state', (event) => onState?.(JSON.parse(event.data)));
+  source.addEventListener('end', () => onEnd?.());
+
+  const control = async (body) => {
+    if (!viewer) return null;
+    const response = await api.post(`/playback/${viewer}`, body);
+    return response.data;
+  };
+  return {
+    seek: (seconds) => control({ seek: seconds }),
+    setSpeed: (newSpeed) => control({ speed: newSpeed }),
+    pause: () => control({ paused: true }),
+    resume: () => control({ paused: false }),
+    close: () => source.close(),
+  };
+};
+
 export const getTrackCoordinates = async (year, gp) => {
   const response = await api.get(`/track/${year}/${gp}`);
   return response.data;
@@ -0,0 +1,110 @@
+// Decoder for the compact telemetry encoding served by
+// GET /api/race/{year}/{gp}/{session}?format=compact
+// The format is documented in utils/telemetry_codec.py; this mirrors its
+// reference decoder and returns the same shape as the JSON race payload.
+
+const MAGIC = 'F1TC';
+const VERSION = 1;
+const FLAG_ZLIB = 1;
+const PREFIX_SIZE = 12;
+
+const readers = {
+  i1: (view, offset) => view.getInt8(offset),
+  i2: (view, offset) => view.getInt16(offset, true),
+  i4: (view, offset) => view.getInt32(offset, true),
+  i8: (view, offset) => Number(view.getBigInt64(offset, true)),
+};
+const sizes = { i1: 1, i2: 2, i4: 4, i8: 8 };
+
+const inflate = async (bytes) => {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('deflate'));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+};
+
+const formatTime = (totalSeconds) => {
+  const hours = Math.floor(totalSeconds / 3600);
+  const minutes = Math.floor((totalSeconds % 3600) / 60);
+  const seconds = totalSeconds % 60;
+  return `${hours}:${String(minutes).padStart(2, '0')}:${String(seconds).padStart(2, '0')}`;
+};
+
+const readBitmap = (body, column) => {
+  const bits = new Uint8Array(column.count);
+  for (let i = 0; i < column.count; i++) {
+    bits[i] = (body[column.offset + (i >> 3)] >> (7 - (i & 7))) & 1;
+  }
+  return bits;
+};
+
+const readDeltas = (body, column) => {
+  const view = new DataView(body.buffer, body.byteOffset);
+  const read = readers[column.dtype];
+  const size = sizes[column.dtype];
+  const values = new Float64Array(column.count);
+  let value = column.base;
+  for (let i = 0; i < column.count; i++) {
+    value += read(view, column.offset + i * size);
+    values[i] = value;
+  }
+  return values;
+};
+
+export const decodeRaceData = async (buffer) => {
+  const bytes = new Uint8Array(buffer);
+  const prefix = new DataView(bytes.buffer, bytes.byteOffset, PREFIX_SIZE);
+  const magic = String.fromCharCode(...bytes.subarray(0, 4));
+  if (magic !== MAGIC) {
+    throw new Error('Not an F1TC telemetry blob');
+  }
+  const version = prefix.getUint8(4);
+  if (version !== VERSION) {
+    throw new Error(`Unsupported F1TC version: ${version}`);
+  }
+  const flags = prefix.getUint8(5);
+  const headerLength = prefix.getUint32(8, true);
+  const headerBytes = bytes.subarray(PREFIX_SIZE, PREFIX_SIZE + headerLength);
+  const header = JSON.parse(new TextDecoder().decode(headerBytes));
+  let body = bytes.subarray(PREFIX_SIZE + headerLength);
+  if (flags & FLAG_ZLIB) {
+    body = await inflate(body);
+  }
+
+  const { columns } = header;
+  const times = readDeltas(body, columns[0]);
+  const telemetry = Array.from(times, (t) => ({ time: formatTime(t), drivers: {} }));
+
+  // Columns per driver: present bitmap, then (bitmap, deltas) for each field
+  let i = 1;
+  while (i < columns.length) {
+    const driver = columns[i].driver;
+    const present = readBitmap(body, columns[i]);
+    i += 1;
+    const fields = {};
+    while (i < columns.length && columns[i].driver === driver) {
+      const { field } = columns[i];
+      const valid = readBitmap(body, columns[i]);
+      const values = readDeltas(body, columns[i + 1]);
+      const scale = header.fields[field].scale;
+      const full = new Array(header.n_samples).fill(null);
+      let next = 0;
+      for (let sample = 0; sample < valid.length; sample++) {
+        if (valid[sample]) {
+          full[sample] = values[next++] / scale;
+        }
+      }
+      fields[field] = full;
+      i += 2;
+    }
+    for (let sample = 0; sample < present.length; sample++) {
+      if (present[sample]) {
+        const entry = {};
+        for (const field of Object.keys(fields)) {
+          entry[field] = fields[field][sample];
+        }
+        telemetry[sample].drivers[driver] = entry;
+      }
+    }
+  }
+
+  return { ...header.meta, telemetry };
+};
@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for production.
+
+Environment variables:
+- PORT (defaults to 5001)
+- WEB_CONCURRENCY: number of worker processes (defaults to CPU count)
+- GUNICORN_THREADS: threads per worker (defaults to 8); every open playback
+  stream (/api/playback) holds one, and the playback admission lane is sized
+  from the threads left once cold work has its share
+- ADMISSION_*: per-worker limits on cold, compute, warm and playback requests
+  (see utils/admission.py); keep cold concurrency + queue plus playback
+  concurrency below GUNICORN_THREADS
+- GUNICORN_TIMEOUT: seconds before a silent worker is restarted (defaults to 300,
+  since processing an uncached race can take minutes)
+- PRELOAD_HOT_RACES: races to preload before forking (see utils/hot_cache.py)
+- PREWARM_RACES: popular races each worker prewarms in the background after it starts
+"""
+
+import os
+import multiprocessing
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Import the app (and preload hot races) once in the master, then fork
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers periodically; replacements are forked from the preloaded master
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    # boto3 clients hold pooled sockets that must not be shared across processes
+    from utils.s3_cache import reset_s3_client
+    reset_s3_client()
+
+def post_worker_init(worker):
+    # Threads do not survive the fork, so each worker starts its own prewarm and
+    # disk budget sweep (never in the master: a thread running there at fork
+    # time could leave the workers' copies of its locks held)
+    from utils.disk_budget import start_background_sweep
+    from utils.hot_cache import start_background_prewarm
+    start_background_sweep()
+    start_background_prewarm()
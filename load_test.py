@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Load test for the production server.
+
+Synthetic races are written to a temporary data cache, so this runs fully
+offline (no FastF1 or network access). For each worker count and
+concurrency level, gunicorn is started with gunicorn.conf.py and driven by
+a pool of keep-alive client threads.
+
+By default every client requests full races round-robin (raw throughput).
+With --mix, clients replay a realistic request mix instead and the report
+has throughput, p50/p95/p99 latency and error rate per request type, plus
+the server's peak memory (PSS summed over master and workers, so pages
+shared copy-on-write are counted once):
+
+    list     GET /api/races
+    race     full race from the local cache (warm)
+    cold     race with no local artifact, processed from its telemetry store
+    track    GET /api/track/...
+    window   5 minutes of frames (?from=&to=, JSON or NDJSON)
+    meta     metadata only (?telemetry=0)
+
+Cold races are cycled through a pool larger than a worker's memory tier
+(MEMORY_CACHE_MAX_ENTRIES, MEMORY_CACHE_MAX_BYTES), so every cold request really reprocesses.
+
+Usage:
+    python load_test.py [--workers 1 2 4] [--concurrency 16] [--duration 10]
+                        [--races 4] [--race-seconds 1800] [--threads 1] [--preload 0]
+    python load_test.py --mix [--weights list:5,race:30,cold:2,track:20,window:25,meta:18]
+                        [--workers 2] [--threads 8] [--concurrency 16 64] [--json results.json]
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import random
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import quote
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = 'list:5,race:30,cold:2,track:20,window:25,meta:18'
+REQUEST_KINDS = ('list', 'race', 'cold', 'track', 'window', 'meta')
+
+# Length of the time window requested by 'window' requests
+WINDOW_SECONDS = 300
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_ready(port, timeout=60):
+    """Poll the race list endpoint until the server answers"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/races')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def start_server(cache_dir, workers, threads, preload):
+    """Start gunicorn against the synthetic cache. Returns (process, port)."""
+    port = find_free_port()
+    env = dict(os.environ)
+    env.update({
+        'DATA_CACHE_DIR': cache_dir,
+        'FASTF1_CACHE_DIR': os.path.join(cache_dir, 'fastf1'),
+        'PORT': str(port),
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'PRELOAD_HOT_RACES': str(preload),
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=PROJECT_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    if not wait_until_ready(port):
+        process.terminate()
+        raise RuntimeError(f"Server with {workers} workers did not start")
+    return process, port
+
+def run_clients(port, paths, concurrency, duration):
+    """Request paths round-robin from concurrent keep-alive clients"""
+    deadline = time.time() + duration
+    lock = threading.Lock()
+    totals = {'requests': 0, 'errors': 0, 'bytes': 0}
+
+    def client(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        i = offset
+        requests = errors = received = 0
+        while time.time() < deadline:
+            try:
+                conn.request('GET', paths[i % len(paths)])
+                response = conn.getresponse()
+                body = response.read()
+                if response.status == 200:
+                    requests += 1
+                    received += len(body)
+                else:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            i += 1
+        conn.close()
+        with lock:
+            totals['requests'] += requests
+            totals['errors'] += errors
+            totals['bytes'] += received
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    totals['elapsed'] = time.time() - started
+    return totals
+
+def parse_mix(text):
+    """Parse 'kind:weight,...' into (kinds, weights)"""
+    kinds, weights = [], []
+    for item in text.split(','):
+        kind, _, weight = item.partition(':')
+        kind = kind.strip()
+        if kind not in REQUEST_KINDS:
+            raise ValueError(f"Unknown request kind {kind!r} (expected one of {', '.join(REQUEST_KINDS)})")
+        kinds.append(kind)
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+def _process_memory(pid):
+    """(RSS, PSS) of one process in bytes; PSS falls back to RSS where smaps_rollup is missing"""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return rss or 0, pss if pss is not None else rss or 0
+
+def server_memory(pid):
+    """(RSS, PSS) summed over the gunicorn master and its workers, or None off Linux"""
+    if not os.path.isdir('/proc'):
+        return None
+    pids = [pid]
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # The command may contain spaces; fields after it are fixed
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    pids.append(int(name))
+        except (OSError, ValueError, IndexError):
+            continue
+    totals = [_process_memory(p) for p in pids]
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+def sample_memory(pid, stop, peak, interval=0.5):
+    """Record the peak server memory in peak until stop is set"""
+    while not stop.is_set():
+        memory = server_memory(pid)
+        if memory:
+            peak['rss'] = max(peak.get('rss', 0), memory[0])
+            peak['pss'] = max(peak.get('pss', 0), memory[1])
+        stop.wait(interval)
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def run_mix(port, plan, concurrency, duration, seed=0):
+    """
+    Replay the request mix from concurrent keep-alive clients.
+    Returns (samples, elapsed) where each sample is (kind, seconds, ok, bytes).
+    """
+    deadline = time.time() + duration
+    samples = []
+    lock = threading.Lock()
+
+    def request(conn, kind, rng):
+        race = rng.choice(plan['races'])
+        path = f"/api/race/{race['year']}/{quote(race['gp'])}/R"
+        cold = None
+        if kind == 'list':
+            path = '/api/races'
+        elif kind == 'track':
+            path = f"/api/track/{race['year']}/{quote(race['gp'])}"
+        elif kind == 'meta':
+            path += '?telemetry=0'
+        elif kind == 'window':
+            start = rng.uniform(0, max(plan['race_seconds'] - WINDOW_SECONDS, 0))
+            fmt = rng.choice(['json', 'ndjson'])
+            path += f"?format={fmt}&from={start:.0f}&to={start + WINDOW_SECONDS:.0f}"
+        elif kind == 'cold':
+            try:
+                cold = plan['cold'].get_nowait()
+            except queue.Empty:
+                cold = None
+            if cold is None:
+                # Every cold race is being loaded right now: count it as a warm load
+                kind = 'race'
+            else:
+                # Drop the artifact so this request processes the race from its store
+                for cache_path in cold['paths']:
+                    try:
+                        os.remove(cache_path)
+                    except OSError:
+                        pass
+                path = f"/api/race/{cold['year']}/{quote(cold['gp'])}/R"
+
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            body = response.read()
+            ok = response.status == 200
+        finally:
+            if cold is not None:
+                plan['cold'].put(cold)
+        return kind, time.perf_counter() - started, ok, len(body)
+
+    def client(n):
+        rng = random.Random(seed * 1000 + n)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        local = []
+        while time.time() < deadline:
+            kind = rng.choices(plan['kinds'], plan['weights'])[0]
+            started = time.perf_counter()
+            try:
+                local.append(request(conn, kind, rng))
+            except (OSError, http.client.HTTPException):
+                local.append((kind, time.perf_counter() - started, False, 0))
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        conn.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.time() - started
+
+def summarize(samples, elapsed):
+    """Throughput, error rate and latency percentiles, overall and per request kind"""
+    def stats(group):
+        latencies = sorted(s[1] for s in group)
+        errors = sum(1 for s in group if not s[2])
+        return {
+            'requests': len(group),
+            'rate': len(group) / elapsed if elapsed else 0.0,
+            'error_rate': errors / len(group) if group else 0.0,
+            'mb_per_s': sum(s[3] for s in group) / elapsed / 1e6 if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+
+    summary = {'all': stats(samples)}
+    for kind in REQUEST_KINDS:
+        group = [s for s in samples if s[0] == kind]
+        if group:
+            summary[kind] = stats(group)
+    return summary
+
+def print_summary(summary, peak):
+    print(f"  {'kind':<8} {'requests':>9} {'req/s':>9} {'MB/s':>8} {'errors':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, s in summary.items():
+        print(f"  {kind:<8} {s['requests']:>9d} {s['rate']:>9.1f} {s['mb_per_s']:>8.1f} "
+              f"{s['error_rate'] * 100:>7.2f}% {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+    if peak:
+        print(f"  server memory peak: {peak['pss'] / 1024 / 1024:.1f} MB PSS "
+              f"({peak['rss'] / 1024 / 1024:.1f} MB RSS summed over processes)")
+
+def prepare_cold_races(count, race_seconds):
+    """Telemetry stores without processed artifacts, for 'cold' requests"""
+    from utils.cache import get_cache_path
+    from utils.synthetic import make_session_store
+
+    cold = queue.Queue()
+    for i in range(count):
+        gp = f"Cold {i + 1}"
+        make_session_store(2025, gp, 'R', duration_seconds=race_seconds, seed=100 + i)
+        cache_path = get_cache_path(2025, gp, 'R')
+        cold.put({'year': 2025, 'gp': gp, 'paths': [cache_path, cache_path[:-len('.json')] + '.f1tc']})
+    return cold
+
+def run_mix_benchmark(args, cache_dir, races):
+    kinds, weights = parse_mix(args.weights)
+    plan = {'races': races, 'race_seconds': args.race_seconds, 'kinds': kinds, 'weights': weights}
+    if 'cold' in kinds:
+        print(f"Generating {args.cold_races} telemetry stores for cold loads...")
+        plan['cold'] = prepare_cold_races(args.cold_races, args.race_seconds)
+
+    results = []
+    for workers in args.workers:
+        process, port = start_server(cache_dir, workers, args.threads, args.preload)
+        try:
+            for concurrency in args.concurrency:
+                run_mix(port, plan, concurrency, min(2.0, args.duration), seed=1)  # warm-up
+                stop = threading.Event()
+                peak = {}
+                sampler = threading.Thread(target=sample_memory, args=(process.pid, stop, peak))
+                sampler.start()
+                try:
+                    samples, elapsed = run_mix(port, plan, concurrency, args.duration)
+                finally:
+                    stop.set()
+                    sampler.join()
+                summary = summarize(samples, elapsed)
+                print()
+                print(f"workers={workers} threads={args.threads} concurrency={concurrency} "
+                      f"({elapsed:.1f}s, mix {args.weights})")
+                print_summary(summary, peak)
+                results.append({
+                    'workers': workers, 'threads': args.threads, 'concurrency': concurrency,
+                    'duration': elapsed, 'mix': args.weights, 'summary': summary,
+                    'server_pss_peak': peak.get('pss'), 'server_rss_peak': peak.get('rss'),
+                })
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the API against synthetic races')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16], help='Concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run')
+    parser.add_argument('--races', type=int, default=4)
+    parser.add_argument('--race-seconds', type=int, default=1800, help='Length of each synthetic race')
+    parser.add_argument('--threads', type=int, default=1, help='Threads per worker')
+    parser.add_argument('--preload', type=int, default=0, help='PRELOAD_HOT_RACES for the server')
+    parser.add_argument('--mix', action='store_true', help='Replay a realistic request mix')
+    parser.add_argument('--weights', default=DEFAULT_MIX, help='Request mix as kind:weight,...')
+    parser.add_argument('--cold-races', type=int, default=10,
+                        help='Cold race pool (keep it above MEMORY_CACHE_MAX_ENTRIES)')
+    parser.add_argument('--json', help='Also write the --mix results to this file')
+    args = parser.parse_args()
+    try:
+        parse_mix(args.weights)
+    except ValueError as e:
+        parser.error(str(e))
+
+    cache_dir = tempfile.mkdtemp(prefix='f1-load-test-')
+    try:
+        # Point the cache at the scratch directory before utils is imported
+        os.environ['DATA_CACHE_DIR'] = cache_dir
+        sys.path.insert(0, PROJECT_ROOT)
+        from utils.synthetic import populate_cache
+
+        print(f"Generating {args.races} synthetic races ({args.race_seconds}s each) in {cache_dir}...")
+        races = populate_cache(num_races=args.races, duration_seconds=args.race_seconds)
+        paths = [f"/api/race/{r['year']}/{quote(r['gp'])}/R" for r in races]
+
+        if args.mix:
+            results = run_mix_benchmark(args, cache_dir, races)
+            if args.json:
+                with open(args.json, 'w') as f:
+                    json.dump(results, f, indent=2)
+                print(f"\nResults written to {args.json}")
+            return
+
+        print()
+        print(f"{'workers':>8} {'clients':>8} {'req/s':>10} {'MB/s':>10} {'errors':>8} {'speedup':>8}")
+        print("-" * 57)
+        baseline = None
+        for workers in args.workers:
+            process, port = start_server(cache_dir, workers, args.threads, args.preload)
+            try:
+                for concurrency in args.concurrency:
+                    run_clients(port, paths, concurrency, min(2.0, args.duration))  # warm-up
+                    totals = run_clients(port, paths, concurrency, args.duration)
+                    rate = totals['requests'] / totals['elapsed']
+                    baseline = baseline or rate
+                    print(f"{workers:>8} {concurrency:>8} {rate:>10.1f} "
+                          f"{totals['bytes'] / totals['elapsed'] / 1e6:>10.1f} "
+                          f"{totals['errors']:>8} {rate / baseline:>7.2f}x")
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nLoad test interrupted by user.")
+        sys.exit(1)
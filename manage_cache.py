@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Inspect and trim the processed data cache and the FastF1 raw cache.
+
+Usage:
+    python manage_cache.py report
+    python manage_cache.py sweep --max-size 20G [--dry-run]
+    python manage_cache.py clear [--year 2025] [--gp Monaco] [--session R|all]
+    python manage_cache.py rebuild [--year 2025] [--gp Monaco] [--session R]
+    python manage_cache.py catalog [--sync 2024 2025] [--scan]
+    python manage_cache.py season-laps --year 2025
+    python manage_cache.py render-tracks [--year 2025] [--gp Monaco] [--workers 4] [--force]
+    python manage_cache.py gc-blobs [--dry-run]
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.blob_store import collect_garbage
+from utils.cache import clear_cache
+from utils.catalog import list_races, scan_artifacts, sync_season
+from utils.f1_data import rebuild_race_from_store
+from utils.season_laps import get_table_path, rebuild_season_laps
+from utils.telemetry_store import list_stores
+from utils.track_render import MATPLOTLIB_AVAILABLE, cached_tracks, render_all
+from utils.disk_budget import (
+    RAW, PROCESSED, DISK_BUDGET, scan_entries, disk_usage, eviction_order,
+    sweep, parse_size, format_size
+)
+
+def report(limit=20):
+    """Print cache usage and the next eviction candidates"""
+    entries = scan_entries()
+    usage = disk_usage(entries)
+    print("=" * 60)
+    print("Cache Usage")
+    print("=" * 60)
+    print(f"Raw FastF1 cache:    {format_size(usage[RAW])}")
+    print(f"Processed artifacts: {format_size(usage[PROCESSED])}")
+    print(f"Total:               {format_size(usage['total'])}")
+    if DISK_BUDGET:
+        print(f"Budget:              {DISK_BUDGET}")
+    print()
+    print(f"Next eviction candidates (up to {limit}):")
+    print("-" * 60)
+    for entry in eviction_order(entries)[:limit]:
+        last_access = datetime.fromtimestamp(entry['last_access']).strftime('%Y-%m-%d %H:%M')
+        print(f"  [{entry['kind']:9s}] {format_size(entry['size']):>8s}  {last_access}  {entry['path']}")
+
+def rebuild(year=None, gp=None, session_type=None):
+    """Rebuild processed races from their telemetry stores (no FastF1 needed)"""
+    rebuilt = 0
+    for store_year, store_gp, store_session in list_stores():
+        if (year and store_year != year) or (gp and store_gp != gp) or \
+                (session_type and store_session != session_type):
+            continue
+        try:
+            if rebuild_race_from_store(store_year, store_gp, store_session):
+                rebuilt += 1
+                print(f"✓ Rebuilt {store_year} {store_gp} {store_session}")
+        except Exception as e:
+            print(f"✗ {store_year} {store_gp} {store_session}: {e}")
+    print(f"Rebuilt {rebuilt} races from telemetry stores")
+
+def catalog(sync_years, scan):
+    """Sync season schedules and/or re-index artifacts, then summarize the catalog"""
+    for year in sync_years or []:
+        sync_season(year)
+    if scan:
+        print(f"Indexed {scan_artifacts()} artifacts")
+    races = list_races()
+    statuses = {}
+    for race in races:
+        for session in race['sessions']:
+            statuses[session['status']] = statuses.get(session['status'], 0) + 1
+    summary = ', '.join(f"{count} {status}" for status, count in sorted(statuses.items()))
+    print(f"Catalog: {len(races)} events with sessions that have started ({summary or 'none'})")
+
+def season_laps(year):
+    """Rebuild a season's lap table from the stores and race artifacts in the cache"""
+    races = [(race['gp'], session['session']) for race in list_races(year) for session in race['sessions']]
+    added = rebuild_season_laps(year, races)
+    print(f"Added {added} sessions to {get_table_path(year)}" if added else f"No cached sessions for {year}")
+
+def render_tracks(year=None, gp=None, workers=None, force=False):
+    """Render SVG paths and PNG thumbnails for cached tracks in parallel"""
+    tracks = [(y, g) for y, g in cached_tracks() if (not year or y == year) and (not gp or g == gp)]
+    if not MATPLOTLIB_AVAILABLE:
+        print("matplotlib is not installed: rendering SVG paths only")
+    rendered = 0
+    for track_year, track_gp, ok, error in render_all(tracks, workers, force):
+        if ok:
+            rendered += 1
+            print(f"✓ Rendered {track_year} {track_gp}")
+        else:
+            print(f"✗ {track_year} {track_gp}: {error or 'track not cached'}")
+    print(f"Rendered {rendered} of {len(tracks)} tracks")
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the F1 data caches')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help='Show cache usage')
+    report_parser.add_argument('--limit', type=int, default=20)
+
+    sweep_parser = subparsers.add_parser('sweep', help='Evict LRU entries to fit a budget')
+    sweep_parser.add_argument('--max-size', default=DISK_BUDGET, help='Budget, e.g. 20G (defaults to $DISK_BUDGET)')
+    sweep_parser.add_argument('--dry-run', action='store_true', help='Only list what would be evicted')
+    sweep_parser.add_argument('--min-idle', type=int, default=None, help='Skip entries accessed within N seconds')
+
+    clear_parser = subparsers.add_parser('clear', help='Remove processed artifacts')
+    clear_parser.add_argument('--year', type=int)
+    clear_parser.add_argument('--gp')
+    clear_parser.add_argument('--session', default='R', help="Session type, or 'all'")
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='Rebuild processed races from telemetry stores')
+    rebuild_parser.add_argument('--year', type=int)
+    rebuild_parser.add_argument('--gp')
+    rebuild_parser.add_argument('--session', help='Session type (default: all)')
+
+    catalog_parser = subparsers.add_parser('catalog', help='Sync and inspect the race catalog')
+    catalog_parser.add_argument('--sync', type=int, nargs='+', metavar='YEAR',
+                                help='Add these seasons from the FastF1 schedule')
+    catalog_parser.add_argument('--scan', action='store_true', help='Re-index artifacts in the cache directory')
+
+    laps_parser = subparsers.add_parser('season-laps', help='Rebuild a season lap table from the cache')
+    laps_parser.add_argument('--year', type=int, required=True)
+
+    render_parser = subparsers.add_parser('render-tracks', help='Pre-render track SVG paths and thumbnails')
+    render_parser.add_argument('--year', type=int)
+    render_parser.add_argument('--gp')
+    render_parser.add_argument('--workers', type=int, help='Worker processes (default: one per CPU)')
+    render_parser.add_argument('--force', action='store_true', help='Re-render tracks that are up to date')
+
+    gc_parser = subparsers.add_parser('gc-blobs', help='Remove shared blobs no cached artifact references')
+    gc_parser.add_argument('--dry-run', action='store_true', help='Only count what would be removed')
+    gc_parser.add_argument('--min-age', type=int, default=None, help='Keep blobs written within N seconds')
+
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        report(args.limit)
+    elif args.command == 'sweep':
+        if not args.max_size:
+            parser.error('--max-size is required when DISK_BUDGET is not set')
+        result = sweep(parse_size(args.max_size), dry_run=args.dry_run, min_idle_seconds=args.min_idle)
+        for entry in result['evicted']:
+            print(f"  [{entry['kind']:9s}] {format_size(entry['size']):>8s}  {entry['path']}")
+        print(f"Usage: {format_size(result['before'])} -> {format_size(result['after'])} "
+              f"(budget {format_size(result['budget'])}, {result['skipped']} entries in use or recently accessed)")
+    elif args.command == 'clear':
+        session_type = None if args.session == 'all' else args.session
+        if args.gp and not args.year:
+            parser.error('--gp requires --year')
+        cleared = clear_cache(args.year, args.gp, session_type)
+        print("✓ Cache cleared" if cleared else "Nothing to clear")
+    elif args.command == 'rebuild':
+        rebuild(args.year, args.gp, args.session)
+    elif args.command == 'catalog':
+        catalog(args.sync, args.scan)
+    elif args.command == 'season-laps':
+        season_laps(args.year)
+    elif args.command == 'render-tracks':
+        render_tracks(args.year, args.gp, args.workers, args.force)
+    elif args.command == 'gc-blobs':
+        kwargs = {} if args.min_age is None else {'min_age_seconds': args.min_age}
+        removed, freed = collect_garbage(dry_run=args.dry_run, **kwargs)
+        action = 'Would remove' if args.dry_run else 'Removed'
+        print(f"{action} {removed} unreferenced blobs ({format_size(freed)})")
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nOperation interrupted by user.")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Process a session incrementally while it is running.
+
+Polls a feed, appends the telemetry frames that became final since the last
+poll and refreshes laps, track status and messages, so /api/live serves the
+session seconds behind real time. Progress is checkpointed on disk: stopping
+and restarting the runner resumes where it left off. When the session
+finishes it is saved as a regular race for /api/race.
+
+Usage:
+    # Follow a FastF1 live timing recording that is still being written
+    # (python -m fastf1.livetiming save saved_data.txt)
+    python run_live.py --year 2025 --gp Monaco --livedata saved_data.txt [--poll 30]
+
+    # Rehearse with a recorded session (needs its telemetry store)
+    python run_live.py --year 2025 --gp Monaco --replay [--speed 20] [--poll 5]
+"""
+
+import sys
+import os
+import argparse
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.live_session import LiveTimingFeed, ReplayFeed, remove_live_session, run_live_session
+
+def main():
+    parser = argparse.ArgumentParser(description='Process an in-progress session incrementally')
+    parser.add_argument('--year', type=int, required=True)
+    parser.add_argument('--gp', required=True)
+    parser.add_argument('--session', default='R', help='Session type (default: R)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--livedata', help='FastF1 live timing recording to follow')
+    source.add_argument('--replay', action='store_true', help='Replay the session from its telemetry store')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed (default: real time)')
+    parser.add_argument('--poll', type=float, default=None,
+                        help='Seconds between updates (default: 5 for replays, 30 for live data)')
+    parser.add_argument('--reset', action='store_true', help='Discard earlier progress and start over')
+    args = parser.parse_args()
+
+    if args.reset and remove_live_session(args.year, args.gp, args.session):
+        print(f"Discarded live progress for {args.year} {args.gp} {args.session}")
+
+    if args.replay:
+        feed = ReplayFeed(args.year, args.gp, args.session, speed=args.speed)
+        poll = args.poll or 5.0
+    else:
+        feed = LiveTimingFeed(args.year, args.gp, args.session, args.livedata)
+        poll = args.poll or 30.0
+
+    print("=" * 60)
+    print(f"Live processing: {args.year} {args.gp} {args.session}")
+    print("=" * 60)
+    ok = run_live_session(args.year, args.gp, args.session, feed, poll_seconds=poll)
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nStopped; run again to resume from the last checkpoint.")
+        sys.exit(1)
@@ -1,25 +1,32 @@
 #!/usr/bin/env python3
 """
-Save the race list to cache so it doesn't need to be loaded each time
+Sync a season's race list into the race catalog so it doesn't need to be loaded each time
+
+Usage:
+    python save_race_list.py [--year 2025 ...]
 """
 
 import sys
 import os
+import argparse
 
 # Add the project root to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from utils.catalog import CATALOG_PATH, CATALOG_SEASONS, sync_season
 from utils.f1_data import get_available_races
 
-def save_race_list():
-    """Fetch and save the race list to cache"""
+def save_race_list(years):
+    """Sync the seasons' schedules into the catalog and show the available races"""
     print("=" * 60)
-    print("Saving Race List to Cache")
+    print("Saving Race List to the Catalog")
     print("=" * 60)
     print()
     
-    print("Fetching available races...")
-    races = get_available_races()
+    print("Fetching event schedules...")
+    for year in years:
+        sync_season(year)
+    races = [race for year in years for race in get_available_races(year)]
     
     if not races:
         print("No races found. Make sure FastF1 can access the data.")
@@ -30,19 +37,24 @@ def save_race_list():
     print("Race list:")
     print("-" * 60)
     for i, race in enumerate(races, 1):
-        print(f"{i:2d}. {race.get('name', race.get('gp', 'Unknown'))} ({race.get('date', 'N/A')})")
+        sessions = ', '.join(f"{s['session']}:{s['status']}" for s in race['sessions'])
+        print(f"{i:2d}. {race.get('name', race.get('gp', 'Unknown'))} ({race.get('date', 'N/A')}) [{sessions}]")
     
     print()
     print("=" * 60)
-    print("✓ Race list has been saved to cache")
+    print("✓ Race list has been saved to the catalog")
     print("=" * 60)
     print()
-    print("The race list is now cached in: data_cache/available_races.json")
-    print("The app will use this cached list instead of fetching from the API each time.")
+    print(f"The race list is now stored in: {CATALOG_PATH}")
+    print("The app will use this catalog instead of fetching from the API each time.")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sync season schedules into the race catalog')
+    parser.add_argument('--year', type=int, nargs='+', default=CATALOG_SEASONS,
+                        help='Seasons to sync (defaults to $CATALOG_SEASONS)')
+    args = parser.parse_args()
     try:
-        save_race_list()
+        save_race_list(args.year)
     except KeyboardInterrupt:
         print("\n\nOperation interrupted by user.")
         sys.exit(1)
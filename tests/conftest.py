@@ -0,0 +1,16 @@
+"""
+Tests run offline against synthetic sessions (utils/synthetic.py). The cache
+directories are read when utils is imported, so they point at a scratch
+directory before any test module imports it.
+"""
+
+import os
+import sys
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix='f1-timing-tests-')
+os.environ['DATA_CACHE_DIR'] = os.path.join(_scratch, 'data_cache')
+os.environ['FASTF1_CACHE_DIR'] = os.path.join(_scratch, 'cache')
+os.environ['CATALOG_SEASONS'] = ''
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
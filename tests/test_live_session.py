@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from utils.cache import clear_cache
+from utils.f1_data import get_race_data
+from utils.live_session import (
+    ReplayFeed, SessionFeed, finalize_live_session, load_checkpoint, read_live_session, update_live_session
+)
+from utils.synthetic import make_session_store
+
+def test_session_feed_is_abstract():
+    with pytest.raises(TypeError):
+        SessionFeed([], {}, {})
+
+def test_replay_matches_full_pipeline():
+    year, gp = 2025, 'Replay'
+    make_session_store(year, gp, 'R', num_drivers=6, duration_seconds=900, hz=4)
+    full = get_race_data(year, gp, 'R')
+    clear_cache(year, gp, 'R')
+
+    # Replay on a fake clock, polling every 37.3 s of session time
+    now = [0.0]
+    feed = ReplayFeed(year, gp, 'R', speed=1.0, resume=False, clock=lambda: now[0])
+    while not load_checkpoint(year, gp, 'R') or not load_checkpoint(year, gp, 'R')['finished']:
+        now[0] += 37.3
+        update_live_session(year, gp, 'R', feed)
+
+    meta, frames = read_live_session(year, gp, 'R')
+    assert [json.loads(frame) for frame in frames] == full['telemetry']
+
+    assert finalize_live_session(year, gp, 'R', feed)
+    finalized = get_race_data(year, gp, 'R')
+    assert finalized['telemetry'] == full['telemetry']
+    assert {k: v for k, v in finalized.items() if k != 'telemetry'} == \
+        {k: v for k, v in full.items() if k != 'telemetry'}
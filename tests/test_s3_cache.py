@@ -0,0 +1,55 @@
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+moto = pytest.importorskip('moto')
+
+from utils import s3_cache
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with moto.mock_aws():
+        s3_cache.reset_s3_client()
+        client = s3_cache.get_s3_client()
+        client.create_bucket(Bucket=s3_cache.S3_BUCKET)
+        yield client
+    s3_cache.reset_s3_client()
+
+def _wrapper(data):
+    return {'cached_at': datetime.now().isoformat(), 'year': 2025, 'gp': 'Test', 'session': 'R', 'data': data}
+
+def test_objects_are_gzipped_compact_json(s3):
+    wrapper = _wrapper({'total_duration': '0:01:00', 'telemetry': [{'time': '0:00:00', 'drivers': {}}]})
+    assert s3_cache.put_to_s3(2025, 'Test', 'R', wrapper)
+
+    response = s3.get_object(Bucket=s3_cache.S3_BUCKET, Key=s3_cache.get_s3_key(2025, 'Test', 'R'))
+    assert response['ContentEncoding'] == 'gzip'
+    body = gzip.decompress(response['Body'].read())
+    assert body == json.dumps(wrapper, separators=(',', ':')).encode('utf-8')
+
+def test_streamed_upload_round_trips(s3):
+    wrapper = _wrapper({'telemetry': [{'time': f"0:00:{n:02d}", 'drivers': {}} for n in range(60)]})
+    body = io.BytesIO(json.dumps(wrapper).encode('utf-8'))
+    etag = s3_cache.put_file_to_s3(2025, 'Test', 'R', body)
+    assert etag
+
+    status, data, fetched_etag = s3_cache.fetch_from_s3(2025, 'Test', 'R')
+    assert (status, data, fetched_etag) == ('hit', wrapper, etag)
+
+def test_conditional_get(s3):
+    wrapper = _wrapper({'total_duration': '0:01:00'})
+    etag = s3_cache.put_to_s3(2025, 'Test', 'R', wrapper)
+
+    # A matching ETag is answered with 304 and no body
+    assert s3_cache.fetch_from_s3(2025, 'Test', 'R', etag=etag) == ('not_modified', None, etag)
+
+    # Once the object is replaced the old ETag no longer matches
+    updated = _wrapper({'total_duration': '0:02:00'})
+    new_etag = s3_cache.put_to_s3(2025, 'Test', 'R', updated)
+    assert new_etag != etag
+    assert s3_cache.fetch_from_s3(2025, 'Test', 'R', etag=etag) == ('hit', updated, new_etag)
@@ -0,0 +1,209 @@
+"""
+Admission control: keep cached reads fast while uncached work is throttled.
+
+Processing an uncached race can hold a worker thread for minutes. Without a
+limit, a burst of cold requests after a race takes every gunicorn thread, and
+cheap cached requests queue behind them. Each request is therefore admitted
+through the lane of its route class:
+
+    cold      work that may process a race or call FastF1
+    compute   derived analytics computed on first request (deltas, speed
+              maps, full-rate laps, season tables)
+    warm      reads of cached artifacts
+    playback  open playback streams (SSE), held for the life of the stream
+
+A lane runs at most CONCURRENCY requests at once. Up to QUEUE more wait up to
+WAIT_SECONDS for a slot. Anything beyond that is rejected at once with 503
+and a Retry-After estimated from the lane's recent request times. Cold
+requests can therefore hold at most cold CONCURRENCY + QUEUE threads per
+worker. Keep that below GUNICORN_THREADS so warm requests always find a
+thread. Limits are per worker process.
+
+@admit(route_class) wraps a view. route_class may be a function of the view's
+arguments, so one route can be warm when its artifact is cached and cold
+otherwise. A streamed response (race bodies, playback) keeps its slot until
+the server closes it, so the limits bound the streaming work too.
+@admit(route_class, stream=lane) instead holds that lane's slot for the body
+and releases the route's slot once the view returns. A full stream lane is
+checked first, so a rejected stream never starts any work.
+
+An open playback stream holds a gthread thread for as long as it is
+watched. The playback lane has no queue, so viewers beyond its concurrency
+are rejected at once. Its concurrency defaults to the GUNICORN_THREADS left
+once cold work (CONCURRENCY + QUEUE) and RESERVED_THREADS for other requests
+have theirs, so raising GUNICORN_THREADS admits more viewers per worker.
+
+Configure with environment variables (CLASS is COLD, COMPUTE, WARM or PLAYBACK):
+- ADMISSION_ENABLED (optional, defaults to 1)
+- ADMISSION_{CLASS}_CONCURRENCY (optional, defaults: cold 1, compute 2, warm 32, playback
+  sized from GUNICORN_THREADS as above: 4 with the default 8 threads)
+- ADMISSION_{CLASS}_QUEUE (optional, defaults: cold 1, compute 4, warm 64, playback 0)
+- ADMISSION_{CLASS}_WAIT_SECONDS (optional, defaults: cold 10, compute 5, warm 5, playback 0)
+"""
+
+import os
+import math
+import time
+import functools
+import threading
+
+from flask import jsonify, make_response
+
+ENABLED = os.getenv('ADMISSION_ENABLED', '1') != '0'
+
+# class -> (concurrency, queue, wait seconds); None is sized from the worker's threads
+DEFAULT_LIMITS = {
+    'cold': (1, 1, 10.0),
+    'compute': (2, 4, 5.0),
+    'warm': (32, 64, 5.0),
+    'playback': (None, 0, 0.0),
+}
+
+# Threads per worker (see gunicorn.conf.py), and how many of them playback
+# streams leave for warm and compute requests
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '8'))
+RESERVED_THREADS = 2
+
+# Retry-After bounds (seconds)
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+
+# Weight of the latest request in a lane's average duration
+DURATION_SMOOTHING = 0.2
+
+class Lane:
+    """A bounded set of slots with a bounded, time-limited wait queue"""
+
+    def __init__(self, name, concurrency, queue, wait_seconds):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.queue = max(queue, 0)
+        self.wait_seconds = wait_seconds
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.average_seconds = None
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if there is room. Returns False if rejected."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.queue:
+                    self.rejected += 1
+                    return False
+                self.waiting += 1
+            try:
+                admitted = self._slots.acquire(timeout=self.wait_seconds)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not admitted:
+                with self._lock:
+                    self.rejected += 1
+                return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def release(self, seconds):
+        with self._lock:
+            self.active -= 1
+            if self.average_seconds is None:
+                self.average_seconds = seconds
+            else:
+                self.average_seconds += DURATION_SMOOTHING * (seconds - self.average_seconds)
+        self._slots.release()
+
+    def retry_after(self):
+        """Seconds until a slot is likely free for a new request"""
+        with self._lock:
+            average = self.average_seconds if self.average_seconds is not None else self.wait_seconds
+            backlog = self.active + self.waiting
+        estimate = average * math.ceil((backlog + 1) / self.concurrency)
+        return int(min(max(math.ceil(estimate), MIN_RETRY_AFTER), MAX_RETRY_AFTER))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'rejected': self.rejected,
+                'average_seconds': round(self.average_seconds, 3) if self.average_seconds is not None else None,
+            }
+
+def _limit(name, setting, default):
+    return type(default)(os.getenv(f"ADMISSION_{name.upper()}_{setting}", str(default)))
+
+def _spare_threads(lanes):
+    """Threads of a worker left once cold work and RESERVED_THREADS have theirs"""
+    cold = lanes['cold']
+    return max(GUNICORN_THREADS - cold.concurrency - cold.queue - RESERVED_THREADS, 1)
+
+LANES = {}
+for _name, (_concurrency, _queue, _wait) in DEFAULT_LIMITS.items():
+    if _concurrency is None:
+        _concurrency = _spare_threads(LANES)
+    LANES[_name] = Lane(_name, _limit(_name, 'CONCURRENCY', _concurrency), _limit(_name, 'QUEUE', _queue),
+                        _limit(_name, 'WAIT_SECONDS', _wait))
+
+def admission_stats():
+    """Current state of every lane in this process"""
+    return {name: lane.stats() for name, lane in LANES.items()}
+
+def _busy(name, lane):
+    response = jsonify({'error': 'Server busy, try again shortly', 'class': name})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(lane.retry_after())
+    return response
+
+def _slot(lane):
+    """A function releasing a slot just taken in lane, recording how long it was held"""
+    started = time.monotonic()
+    return lambda: lane.release(time.monotonic() - started)
+
+def admit(route_class, stream=None):
+    """
+    Decorator admitting a view through a lane. route_class is a lane name or a
+    function of the view's keyword arguments returning one. With stream, a
+    streamed response's body holds a slot in that lane instead of the route's.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return view(*args, **kwargs)
+            stream_release = None
+            if stream is not None:
+                if not LANES[stream].acquire():
+                    return _busy(stream, LANES[stream])
+                stream_release = _slot(LANES[stream])
+            name = route_class(**kwargs) if callable(route_class) else route_class
+            lane = LANES[name]
+            if not lane.acquire():
+                if stream_release:
+                    stream_release()
+                return _busy(name, lane)
+            release = _slot(lane)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                release()
+                if stream_release:
+                    stream_release()
+                raise
+            if stream_release:
+                release()
+                release = stream_release
+            if response.is_streamed:
+                # The body runs after the view returns: hold the slot until it is closed
+                response.call_on_close(release)
+            else:
+                release()
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+"""
+Battle detection: cars running close together on track for a while.
+
+Comparing every pair of drivers at every sample is O(samples x drivers^2).
+Instead the cars are sorted by race progress at each sample (one argsort
+over the drivers x samples array), so only neighbours in that order need
+comparing: an (n - 1) x samples array of gaps, all vectorized. The gap in
+seconds is the distance between the cars over the chasing car's speed.
+
+A battle is a run of samples where the same two cars are neighbours within
+BATTLE_GAP_SECONDS. Breaks of up to BATTLE_BREAK_SECONDS are bridged, and
+only runs covering at least BATTLE_MIN_LAPS laps count. Swapping places does
+not end a battle. Samples where either car is in the pit lane, or the race is
+neutralized (SC, VSC or red flag), are left out, so a queue behind the safety
+car is not a battle.
+
+Battles are stored in the race's event index (see race_events.py);
+find_battles() queries them.
+
+Configure with environment variables:
+- BATTLE_GAP_SECONDS (optional, defaults to 1.0)
+- BATTLE_MIN_LAPS (optional, defaults to 2)
+"""
+
+import os
+import bisect
+
+BATTLE_GAP_SECONDS = float(os.getenv('BATTLE_GAP_SECONDS', '1.0'))
+BATTLE_MIN_LAPS = float(os.getenv('BATTLE_MIN_LAPS', '2'))
+BATTLE_BREAK_SECONDS = 5
+
+# Chasing speeds below this (m/s) are treated as this, so stopped cars do not give huge gaps
+MIN_SPEED = 10.0
+
+def detect_battles(drivers, progress, speed, positions, lap, interval, track_length, excluded=None, neutral=None):
+    """
+    Battles over a race. progress (metres, NaN where a car has no sample),
+    speed (km/h), positions and lap are (drivers x samples) arrays on the
+    race's sample grid; excluded marks (drivers x samples) where a car
+    cannot battle (pit lane) and neutral marks samples where nobody can.
+
+    Returns a list of battles sorted by start: {'start', 'end' (seconds),
+    'drivers' (ahead, behind at the start), 'position' (of the car ahead at
+    the start), 'laps' ([first, last] of the car ahead), 'min_gap' (seconds)}.
+    """
+    import numpy as np
+
+    n_drivers, n_samples = progress.shape
+    if n_drivers < 2 or n_samples == 0:
+        return []
+    valid = ~np.isnan(progress)
+    if excluded is not None:
+        valid &= ~excluded
+    if neutral is not None:
+        valid &= ~neutral[None, :]
+    ranked_progress = np.where(valid, progress, -np.inf)
+
+    # Cars in race order at every sample; neighbours are rows i and i + 1
+    order = np.argsort(-ranked_progress, axis=0, kind='stable')
+    ranked = np.take_along_axis(ranked_progress, order, axis=0)
+    ahead, behind = order[:-1], order[1:]
+    chaser_speed = np.take_along_axis(speed, behind, axis=0) / 3.6
+    with np.errstate(invalid='ignore'):
+        gap = (ranked[:-1] - ranked[1:]) / np.maximum(np.nan_to_num(chaser_speed), MIN_SPEED)
+        close = np.isfinite(ranked[1:]) & (gap <= BATTLE_GAP_SECONDS)
+
+    rows, samples = np.nonzero(close)
+    if len(samples) == 0:
+        return []
+    first, second = ahead[rows, samples], behind[rows, samples]
+    pair = np.minimum(first, second) * n_drivers + np.maximum(first, second)
+    gaps = gap[rows, samples]
+
+    # Runs of one pair with no break longer than BATTLE_BREAK_SECONDS
+    sort = np.lexsort((samples, pair))
+    pair, samples, gaps, first, second = pair[sort], samples[sort], gaps[sort], first[sort], second[sort]
+    max_break = max(int(round(BATTLE_BREAK_SECONDS / interval)), 1)
+    new_run = np.concatenate(([True], (pair[1:] != pair[:-1]) | (np.diff(samples) > max_break)))
+    starts = np.flatnonzero(new_run)
+    ends = np.concatenate((starts[1:], [len(pair)])) - 1
+    min_gap = np.minimum.reduceat(gaps, starts)
+
+    leader, chaser = first[starts], second[starts]
+    start_sample, end_sample = samples[starts], samples[ends]
+    covered = (progress[leader, end_sample] - progress[leader, start_sample]) / (track_length or 1.0)
+    keep = covered >= BATTLE_MIN_LAPS
+
+    battles = []
+    for i in np.flatnonzero(keep):
+        a, b, k0, k1 = int(leader[i]), int(chaser[i]), int(start_sample[i]), int(end_sample[i])
+        first_lap, last_lap = lap[a, k0], lap[a, k1]
+        battles.append({
+            'start': round(k0 * interval, 3),
+            'end': round(k1 * interval, 3),
+            'drivers': [drivers[a], drivers[b]],
+            'position': int(positions[a, k0]),
+            'laps': [int(first_lap) if not np.isnan(first_lap) else None,
+                     int(last_lap) if not np.isnan(last_lap) else None],
+            'min_gap': round(float(min_gap[i]), 3),
+        })
+    battles.sort(key=lambda b: (b['start'], b['position']))
+    return battles
+
+def find_battles(index, t=None, driver=None):
+    """Battles of a prepared event index, optionally only those active at race time t and/or involving a driver"""
+    battles = index.get('battles', [])
+    if t is not None:
+        # Battles are sorted by start: only those started by t can be active
+        battles = battles[:bisect.bisect_right(index['battle_starts'], t)]
+        battles = [b for b in battles if b['end'] >= t]
+    if driver is not None:
+        battles = [b for b in battles if str(driver) in b['drivers']]
+    return battles
@@ -0,0 +1,180 @@
+"""
+Content-addressed storage for data that many artifacts share.
+
+Processed artifacts repeat a lot of data: every race of a season carries the
+same driver table (names, teams, colours), and a circuit's geometry rarely
+changes from one year to the next. Such values are stored once as blobs
+named by the SHA-256 of their canonical JSON:
+
+    DATA_CACHE_DIR/blobs/{hash[:2]}/{hash}.json
+
+and the artifact holds {"$blob": "<hash>"} in their place, so a race or
+track file is a manifest of its own data plus references to shared blobs.
+pack() replaces fields with references when an artifact is written and
+unpack() resolves them when it is read; artifacts without references are
+read unchanged.
+
+A blob never changes once written, so it is never revalidated: it is read
+from memory, then local disk, then S3 (blobs/{hash}.json, uploaded once),
+and a blob fetched from S3 is kept locally. The disk budget manager does
+not evict blobs; collect_garbage() (manage_cache.py gc-blobs) removes the
+ones no local artifact references.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .cache import CACHE_DIR, USE_S3, atomic_write_bytes, touch_access
+
+try:
+    from .s3_cache import fetch_blob_from_s3, put_blob_to_s3
+except ImportError:
+    fetch_blob_from_s3 = None
+    put_blob_to_s3 = None
+
+BLOB_DIR = os.path.join(CACHE_DIR, 'blobs')
+
+# Decoded blobs kept in memory (they are small and shared between artifacts)
+BLOB_MEMORY_ENTRIES = 64
+
+# Unreferenced blobs younger than this are kept: a writer may not have
+# written the manifest that references them yet
+GC_MIN_AGE_SECONDS = 3600
+
+REF_KEY = '$blob'
+_REF_PATTERN = re.compile(r'"\$blob":"([0-9a-f]{64})"')
+
+# hash -> decoded value
+_blobs = OrderedDict()
+_blobs_lock = threading.Lock()
+
+def _encode(value):
+    """Canonical JSON bytes: the same value always hashes the same"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+def blob_hash(value):
+    """The hash a value is stored under"""
+    return hashlib.sha256(_encode(value)).hexdigest()
+
+def get_blob_path(digest):
+    """Get the file path of a blob"""
+    return os.path.join(BLOB_DIR, digest[:2], f"{digest}.json")
+
+def is_blob_ref(value):
+    return isinstance(value, dict) and len(value) == 1 and isinstance(value.get(REF_KEY), str)
+
+def _remember(digest, value):
+    with _blobs_lock:
+        _blobs[digest] = value
+        _blobs.move_to_end(digest)
+        while len(_blobs) > BLOB_MEMORY_ENTRIES:
+            _blobs.popitem(last=False)
+
+def put_blob(value):
+    """Store a value (locally and in S3 if configured) and return its hash"""
+    body = _encode(value)
+    digest = hashlib.sha256(body).hexdigest()
+    path = get_blob_path(digest)
+    try:
+        # Mark it as freshly referenced so collect_garbage() leaves it alone
+        os.utime(path)
+    except FileNotFoundError:
+        atomic_write_bytes(path, body)
+        if USE_S3 and put_blob_to_s3:
+            put_blob_to_s3(digest, body)
+    _remember(digest, value)
+    return digest
+
+def get_blob(digest):
+    """A blob's value from memory, local disk or S3, or None if it is nowhere"""
+    with _blobs_lock:
+        if digest in _blobs:
+            _blobs.move_to_end(digest)
+            return _blobs[digest]
+
+    path = get_blob_path(digest)
+    try:
+        with open(path, 'rb') as f:
+            body = f.read()
+        touch_access(path)
+    except FileNotFoundError:
+        body = fetch_blob_from_s3(digest) if USE_S3 and fetch_blob_from_s3 else None
+        if body is None or hashlib.sha256(body).hexdigest() != digest:
+            return None
+        try:
+            atomic_write_bytes(path, body)
+        except Exception as e:
+            print(f"Error warming blob cache: {e}")
+    try:
+        value = json.loads(body)
+    except ValueError:
+        return None
+    _remember(digest, value)
+    return value
+
+def pack(data, fields):
+    """A copy of data with each of fields stored as a blob and replaced by a reference"""
+    packed = dict(data)
+    for field in fields:
+        value = packed.get(field)
+        if value is not None and not is_blob_ref(value):
+            packed[field] = {REF_KEY: put_blob(value)}
+    return packed
+
+def unpack(data):
+    """A copy of data with every blob reference resolved. Raises KeyError for a missing blob."""
+    if not any(is_blob_ref(value) for value in data.values()):
+        return data
+    unpacked = dict(data)
+    for field, value in data.items():
+        if is_blob_ref(value):
+            resolved = get_blob(value[REF_KEY])
+            if resolved is None:
+                raise KeyError(f"Missing blob {value[REF_KEY]} for '{field}'")
+            unpacked[field] = resolved
+    return unpacked
+
+def referenced_blobs(path):
+    """Hashes referenced by an artifact. References are in its first line (see cache._write_race_stream)."""
+    try:
+        with open(path, 'r') as f:
+            return set(_REF_PATTERN.findall(f.readline()))
+    except (OSError, UnicodeDecodeError):
+        return set()
+
+def collect_garbage(dry_run=False, min_age_seconds=GC_MIN_AGE_SECONDS):
+    """Remove blobs that no artifact in the cache directory references. Returns (count, bytes)."""
+    if not os.path.isdir(BLOB_DIR):
+        return 0, 0
+    referenced = set()
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.json') and not name.startswith('.'):
+            referenced |= referenced_blobs(os.path.join(CACHE_DIR, name))
+
+    removed, freed = 0, 0
+    now = time.time()
+    for root, _, files in os.walk(BLOB_DIR):
+        for name in files:
+            digest = name[:-len('.json')] if name.endswith('.json') else None
+            if digest is None or digest in referenced:
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+                if now - st.st_mtime < min_age_seconds:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+            except OSError:
+                continue
+            if not dry_run:
+                with _blobs_lock:
+                    _blobs.pop(digest, None)
+            removed += 1
+            freed += st.st_size
+    return removed, freed
@@ -1,107 +1,634 @@
 import os
 import json
-import hashlib
+import time
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+# Advisory file locks are POSIX-only; without them pinning is per-process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Try to import S3 cache adapter
 try:
-    from .s3_cache import load_from_s3, save_to_s3
-    S3_AVAILABLE = True
+    from .s3_cache import S3_AVAILABLE, fetch_from_s3, put_file_to_s3, put_to_s3
 except ImportError:
     S3_AVAILABLE = False
-    load_from_s3 = None
-    save_to_s3 = None
+    fetch_from_s3 = None
+    put_file_to_s3 = None
+    put_to_s3 = None
 
 # Cache directory for processed race data
-CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'data_cache')
-os.makedirs(CACHE_DIR, exist_ok=True)
+# (created on first write, not at import time)
+CACHE_DIR = os.getenv('DATA_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'data_cache'))
+
+# Files derived from an artifact share its cache key: {key}.json, {key}.f1tc
+CACHE_FILE_SUFFIXES = ('.json', '.f1tc')
+
+# Per-key lock files used to serialize regeneration across processes
+LOCK_DIR = os.path.join(CACHE_DIR, '.locks')
+
+# Raw FastF1 cache (HTTP responses and parsed session pickles)
+FASTF1_CACHE_DIR = os.getenv('FASTF1_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache'))
 
 # Check if S3 should be used (if AWS credentials are set)
 USE_S3 = S3_AVAILABLE and os.getenv('AWS_ACCESS_KEY_ID') and os.getenv('AWS_SECRET_ACCESS_KEY')
 
+# Payload fields stored as shared blobs (see blob_store.py), by data type
+BLOB_FIELDS = {
+    'race': ('drivers',),
+    'track': ('path',),
+}
+
+# Cached data expires after 30 days in every tier
+CACHE_MAX_AGE_DAYS = 30
+
+# Decoded artifacts kept in process memory, bounded by count and by their
+# approximate decoded size. Each worker process has its own tier, so the
+# node-wide cost is up to MEMORY_CACHE_MAX_BYTES times the number of workers.
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv('MEMORY_CACHE_MAX_ENTRIES', '8'))
+MEMORY_CACHE_MAX_BYTES = int(os.getenv('MEMORY_CACHE_MAX_BYTES', str(256 * 1024 ** 2)))
+
+# Decoded JSON takes about this many times its size on disk in memory
+MEMORY_SIZE_FACTOR = 3
+
+# Local copies that came from S3 are revalidated with a conditional GET at most
+# this often, so another node's reprocessed artifact is eventually picked up
+S3_REVALIDATE_SECONDS = int(os.getenv('S3_REVALIDATE_SECONDS', '3600'))
+
+# Tier 1: in-process LRU of cache wrappers, keyed by cache key.
+# Each entry is (local file mtime or None, cache wrapper, approximate bytes).
+_memory_cache = OrderedDict()
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+
+# Last time (monotonic) each cache key was revalidated against S3
+_s3_validated = {}
+
+# Paths currently being read in this process; the disk budget manager never
+# evicts these. Other processes are covered by the shared flock taken on read.
+_pinned = Counter()
+_pinned_lock = threading.Lock()
+
+# Memory-tier hits refresh the on-disk access time at most this often
+ACCESS_TOUCH_SECONDS = 60
+_last_touch = {}
+
+# Fallback per-key locks when fcntl is unavailable (single process only)
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
 def get_cache_key(year, gp, session_type='R'):
     """Generate a cache key for a race"""
     return f"{year}_{gp}_{session_type}"
 
+def parse_cache_key(cache_key):
+    """Split '{year}_{gp}_{session}' back into its parts, or None"""
+    parts = cache_key.split('_')
+    if len(parts) < 3 or not parts[0].isdigit():
+        return None
+    return int(parts[0]), '_'.join(parts[1:-1]), parts[-1]
+
 def get_cache_path(year, gp, session_type='R'):
     """Get the file path for cached race data"""
     cache_key = get_cache_key(year, gp, session_type)
     return os.path.join(CACHE_DIR, f"{cache_key}.json")
 
-def is_cache_valid(cache_path, max_age_days=30):
+def get_track_cache_path(year, gp):
+    """Get the file path for cached track coordinates"""
+    return get_cache_path(year, gp, 'track')
+
+def is_cache_valid(cache_path, max_age_days=CACHE_MAX_AGE_DAYS):
     """Check if cache file exists and is still valid"""
     if not os.path.exists(cache_path):
         return False
-    
+
     # Check file age
     file_time = datetime.fromtimestamp(os.path.getmtime(cache_path))
     age = datetime.now() - file_time
-    
+
     return age < timedelta(days=max_age_days)
 
-def load_from_cache(year, gp, session_type='R'):
-    """Load race data from cache if available (tries S3 first, then local)"""
-    # Try S3 first if configured
-    if USE_S3 and load_from_s3:
-        s3_data = load_from_s3(year, gp, session_type, 'race')
-        if s3_data:
-            return {'data': s3_data}
-    
-    # Fall back to local cache
-    cache_path = get_cache_path(year, gp, session_type)
-    
-    if is_cache_valid(cache_path):
+def _is_wrapper_valid(cached_data, max_age_days=CACHE_MAX_AGE_DAYS):
+    """Check the cached_at stamp of a cache wrapper"""
+    try:
+        cached_at = datetime.fromisoformat(cached_data.get('cached_at', ''))
+    except (TypeError, ValueError):
+        return False
+    return (datetime.now() - cached_at) < timedelta(days=max_age_days)
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+@contextmanager
+def pin_entry(path):
+    """Mark a cache path as in use so it is not evicted while being read"""
+    path = os.path.abspath(path)
+    with _pinned_lock:
+        _pinned[path] += 1
+    try:
+        yield
+    finally:
+        with _pinned_lock:
+            _pinned[path] -= 1
+            if _pinned[path] <= 0:
+                del _pinned[path]
+
+def is_entry_pinned(path):
+    """Check whether a cache path is being read in this process"""
+    path = os.path.abspath(path)
+    with _pinned_lock:
+        return any(p == path or p.startswith(path + os.sep) for p in _pinned)
+
+def touch_access(path):
+    """Record a read by bumping the file's access time (mtime is left alone)"""
+    now = time.time()
+    last = _last_touch.get(path)
+    if last is not None and now - last < ACCESS_TOUCH_SECONDS:
+        return
+    _last_touch[path] = now
+    try:
+        st = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+    except OSError:
+        pass
+
+def _atomic_write(path, mode, write):
+    """
+    Write a file so readers only ever see the old or the complete new file:
+    write to a temp file in the same directory, fsync, then rename over path.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    # Dot-prefixed so the disk budget manager ignores in-flight temp files
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def atomic_write_json(path, obj):
+    """Atomically write obj as compact JSON"""
+    _atomic_write(path, 'w', lambda f: json.dump(obj, f, separators=(',', ':')))
+
+def atomic_write_bytes(path, data):
+    """Atomically write raw bytes"""
+    _atomic_write(path, 'wb', lambda f: f.write(data))
+
+@contextmanager
+def cache_key_lock(cache_key):
+    """
+    Hold an exclusive advisory lock on a cache key while regenerating it.
+    Only writers take this lock; readers never wait on it. Callers should
+    re-check the cache after acquiring it, since another process may have
+    produced the data while they waited.
+    """
+    if fcntl is None:
+        with _key_locks_lock:
+            lock = _key_locks.setdefault(cache_key, threading.Lock())
+        with lock:
+            yield
+        return
+
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f"{cache_key}.lock"), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def try_cache_key_lock(cache_key):
+    """
+    Like cache_key_lock, but never waits: yields True holding the lock, or
+    False (without it) if another writer, in any process, holds it.
+    """
+    if fcntl is None:
+        with _key_locks_lock:
+            lock = _key_locks.setdefault(cache_key, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f"{cache_key}.lock"), 'a') as lock_file:
         try:
-            with open(cache_path, 'r') as f:
-                data = json.load(f)
-                print(f"Loaded race data from local cache: {year} {gp}")
-                return data
-        except Exception as e:
-            print(f"Error loading cache: {e}")
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _memory_get(cache_key, cache_path):
+    """Tier 1 lookup. Entries are dropped if the file on disk was replaced."""
+    with _memory_lock:
+        entry = _memory_cache.get(cache_key)
+        if entry is None:
             return None
-    
+        mtime, cached_data, _ = entry
+        current_mtime = _get_mtime(cache_path)
+        stale = current_mtime is not None and current_mtime != mtime
+        if stale or not _is_wrapper_valid(cached_data):
+            _memory_pop(cache_key)
+            return None
+        _memory_cache.move_to_end(cache_key)
+    if current_mtime is not None:
+        touch_access(cache_path)
+    return cached_data
+
+def _memory_pop(cache_key):
+    """Drop an entry (the caller holds _memory_lock)"""
+    global _memory_bytes
+    entry = _memory_cache.pop(cache_key, None)
+    if entry is not None:
+        _memory_bytes -= entry[2]
+
+def _memory_size(cache_path, cached_data):
+    """Approximate decoded size of a wrapper, from its file (or its JSON if it has none)"""
+    try:
+        size = os.path.getsize(cache_path)
+    except OSError:
+        size = len(json.dumps(cached_data, separators=(',', ':')))
+    return size * MEMORY_SIZE_FACTOR
+
+def _memory_put(cache_key, cache_path, cached_data):
+    global _memory_bytes
+    if MEMORY_CACHE_MAX_ENTRIES <= 0:
+        return
+    size = _memory_size(cache_path, cached_data)
+    with _memory_lock:
+        _memory_pop(cache_key)
+        if size > MEMORY_CACHE_MAX_BYTES:
+            # Larger than the whole tier: keeping it would evict everything else
+            return
+        _memory_cache[cache_key] = (_get_mtime(cache_path), cached_data, size)
+        _memory_bytes += size
+        while len(_memory_cache) > MEMORY_CACHE_MAX_ENTRIES or _memory_bytes > MEMORY_CACHE_MAX_BYTES:
+            _memory_pop(next(iter(_memory_cache)))
+
+def discard_from_memory(cache_key=None):
+    """Drop one entry (or everything) from the in-process memory tier"""
+    global _memory_bytes
+    with _memory_lock:
+        if cache_key is None:
+            _memory_cache.clear()
+            _memory_bytes = 0
+        else:
+            _memory_pop(cache_key)
+
+def _read_local(cache_path):
+    """Tier 2 lookup. Returns the cache wrapper or None."""
+    try:
+        with pin_entry(cache_path), open(cache_path, 'r') as f:
+            if fcntl is not None:
+                # Shared lock tells the disk budget manager in other processes
+                # that this file is being read; never wait for it
+                try:
+                    fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                except OSError:
+                    pass
+            data = json.load(f)
+        touch_access(cache_path)
+        return data
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading cache: {e}")
+        return None
+
+def _write_local(cache_path, cached_data):
+    data = cached_data.get('data')
+    if isinstance(data, dict) and isinstance(data.get('telemetry'), list):
+        # Race payloads keep the line-oriented layout so they can be streamed
+        header = {k: v for k, v in cached_data.items() if k != 'data'}
+        meta = {k: v for k, v in data.items() if k != 'telemetry'}
+        _atomic_write(cache_path, 'w', lambda f: _write_race_stream(f, header, meta, data['telemetry']))
+    else:
+        atomic_write_json(cache_path, cached_data)
+
+def _pack(data, data_type):
+    """Replace a payload's shared fields with blob references"""
+    # Imported here: blob_store.py builds on this module
+    from .blob_store import pack
+    return pack(data, BLOB_FIELDS.get(data_type, ()))
+
+def _unpack_wrapper(cached_data):
+    """A cache wrapper with its blob references resolved, or None if a blob is missing"""
+    from .blob_store import unpack
+    if cached_data is None or not isinstance(cached_data.get('data'), dict):
+        return cached_data
+    try:
+        return dict(cached_data, data=unpack(cached_data['data']))
+    except KeyError as e:
+        print(f"Error loading cache: {e}")
+        return None
+
+def _catalog_artifact(year, gp, session_type, cache_path):
+    """Index a written artifact in the race catalog"""
+    # Imported here: catalog.py builds on this module
+    from .catalog import record_artifact
+    if session_type == 'track':
+        record_artifact(year, gp, '', 'track', cache_path)
+    else:
+        record_artifact(year, gp, session_type, 'race', cache_path)
+
+def _needs_s3_revalidation(cache_key, cached_data):
+    if not (USE_S3 and fetch_from_s3) or not cached_data.get('s3_etag'):
+        return False
+    last = _s3_validated.get(cache_key)
+    return last is None or (time.monotonic() - last) >= S3_REVALIDATE_SECONDS
+
+def _load_tiered(cache_key, year, gp, session_type, data_type):
+    """Look up a cache wrapper in memory, then on local disk, then in S3"""
+    cache_path = os.path.join(CACHE_DIR, f"{cache_key}.json")
+
+    cached_data = _memory_get(cache_key, cache_path)
+    if cached_data is not None:
+        return cached_data
+
+    local_data = None
+    if os.path.exists(cache_path):
+        local_data = _read_local(cache_path)
+        if local_data is not None and not (is_cache_valid(cache_path) and _is_wrapper_valid(local_data)):
+            local_data = None
+        local_data = _unpack_wrapper(local_data)
+
+    if local_data is not None and not _needs_s3_revalidation(cache_key, local_data):
+        print(f"Loaded {data_type} data from local cache: {year} {gp}")
+        _memory_put(cache_key, cache_path, local_data)
+        return local_data
+
+    if USE_S3 and fetch_from_s3:
+        etag = local_data.get('s3_etag') if local_data else None
+        status, s3_data, etag = fetch_from_s3(year, gp, session_type, data_type, etag=etag)
+        if status == 'not_modified':
+            _s3_validated[cache_key] = time.monotonic()
+            _memory_put(cache_key, cache_path, local_data)
+            return local_data
+        if status == 'hit':
+            # Warm the local tier so the next process on this node skips S3
+            s3_data['s3_etag'] = etag
+            try:
+                _write_local(cache_path, s3_data)
+                _catalog_artifact(year, gp, session_type, cache_path)
+            except Exception as e:
+                print(f"Error warming local cache: {e}")
+            s3_data = _unpack_wrapper(s3_data)
+            if s3_data is not None:
+                _s3_validated[cache_key] = time.monotonic()
+                _memory_put(cache_key, cache_path, s3_data)
+                return s3_data
+
+    if local_data is not None:
+        # S3 unreachable or object gone: the local copy is still good
+        _s3_validated[cache_key] = time.monotonic()
+        _memory_put(cache_key, cache_path, local_data)
+        return local_data
+
     return None
 
+def _save_tiered(cache_key, year, gp, session_type, data_type, data):
+    """
+    Write a cache wrapper to every tier (S3 first so the local copy records its
+    ETag). Disk and S3 hold the payload with its shared fields as blob
+    references; memory holds it resolved.
+    """
+    cache_path = os.path.join(CACHE_DIR, f"{cache_key}.json")
+    cached_data = {
+        'cached_at': datetime.now().isoformat(),
+        'year': year,
+        'gp': gp,
+        'session': session_type if data_type == 'race' else None,
+        'data': data
+    }
+
+    try:
+        stored = dict(cached_data, data=_pack(data, data_type))
+    except Exception as e:
+        print(f"Error saving cache: {e}")
+        return False
+
+    if USE_S3 and put_to_s3:
+        etag = put_to_s3(year, gp, session_type, stored, data_type)
+        if etag:
+            cached_data['s3_etag'] = stored['s3_etag'] = etag
+            _s3_validated[cache_key] = time.monotonic()
+
+    try:
+        _write_local(cache_path, stored)
+        print(f"Saved {data_type} data to local cache: {year} {gp}")
+        _memory_put(cache_key, cache_path, cached_data)
+        _catalog_artifact(year, gp, session_type, cache_path)
+        return True
+    except Exception as e:
+        print(f"Error saving cache: {e}")
+        return False
+
+def load_from_cache(year, gp, session_type='R'):
+    """Load race data from cache if available (memory, then local disk, then S3)"""
+    cache_key = get_cache_key(year, gp, session_type)
+    return _load_tiered(cache_key, year, gp, session_type, 'race')
+
 def save_to_cache(year, gp, session_type, data):
-    """Save processed race data to cache (saves to both S3 and local if configured)"""
-    # Save to S3 if configured
-    if USE_S3 and save_to_s3:
-        save_to_s3(year, gp, session_type, data, 'race')
-    
-    # Also save locally as backup
+    """Save processed race data to cache (local disk, memory and S3 if configured)"""
+    cache_key = get_cache_key(year, gp, session_type)
+    return _save_tiered(cache_key, year, gp, session_type, 'race', data)
+
+def _write_race_stream(f, cached_header, meta, frames, upload=None):
+    """
+    Write a race wrapper with one telemetry frame per line:
+
+        {"cached_at":...,"data":{<meta>,"telemetry":[
+        {"time":"0:00:00","drivers":{...}},
+        ...
+        {"time":"1:32:10","drivers":{...}}
+        ]},"s3_etag":"..."}
+
+    The result is ordinary JSON that can also be read a frame at a time.
+    upload, if given, is called with a binary file
+    object holding the complete wrapper and returns an ETag to record.
+    """
+    head = json.dumps(cached_header, separators=(',', ':'))[:-1]
+    data_head = json.dumps(meta, separators=(',', ':'))[:-1]
+    f.write(f'{head},"data":{data_head},"telemetry":[\n')
+    pending = None
+    for frame in frames:
+        if pending is not None:
+            f.write(pending + ',\n')
+        pending = json.dumps(frame, separators=(',', ':'))
+    if pending is not None:
+        f.write(pending + '\n')
+    f.write(']}')
+
+    if upload is not None:
+        end = f.tell()
+        f.write('}')
+        f.flush()
+        with open(f.fileno(), 'rb', closefd=False) as body:
+            body.seek(0)
+            etag = upload(body)
+        f.seek(end)
+        f.truncate()
+        if etag:
+            f.write(',"s3_etag":' + json.dumps(etag))
+    f.write('}')
+
+def save_race_stream_to_cache(year, gp, session_type, meta, frames):
+    """
+    Save processed race data from its metadata (every key except 'telemetry')
+    and an iterable of telemetry frames, writing frames as they are produced
+    so the full payload is never held in memory. Returns True on success.
+    """
+    cache_key = get_cache_key(year, gp, session_type)
     cache_path = get_cache_path(year, gp, session_type)
-    
+    cached_header = {
+        'cached_at': datetime.now().isoformat(),
+        'year': year,
+        'gp': gp,
+        'session': session_type
+    }
+
+    def upload(body):
+        return put_file_to_s3(year, gp, session_type, body, 'race')
+
+    if not (USE_S3 and put_file_to_s3):
+        upload = None
+
     try:
-        # Add metadata
-        cached_data = {
-            'cached_at': datetime.now().isoformat(),
-            'year': year,
-            'gp': gp,
-            'session': session_type,
-            'data': data
-        }
-        
-        with open(cache_path, 'w') as f:
-            json.dump(cached_data, f, indent=2)
-        
-        print(f"Saved race data to local cache: {year} {gp}")
-        return True
+        meta = _pack(meta, 'race')
+        _atomic_write(cache_path, 'w', lambda f: _write_race_stream(f, cached_header, meta, frames, upload))
     except Exception as e:
         print(f"Error saving cache: {e}")
         return False
 
-def clear_cache(year=None, gp=None):
-    """Clear cache files. If year/gp specified, clear only those."""
+    if upload is not None:
+        _s3_validated[cache_key] = time.monotonic()
+    discard_from_memory(cache_key)
+    print(f"Saved race data to local cache: {year} {gp}")
+    _catalog_artifact(year, gp, session_type, cache_path)
+    return True
+
+def _iter_frame_lines(f, cache_path):
+    """Yield each telemetry frame's JSON text from an open race artifact, then close it"""
+    try:
+        with pin_entry(cache_path):
+            for line in f:
+                line = line.rstrip('\n')
+                if line.startswith(']'):
+                    break
+                yield line[:-1] if line.endswith(',') else line
+    finally:
+        f.close()
+
+def open_race_stream(year, gp, session_type='R'):
+    """
+    Open a local race artifact for streaming without decoding it.
+
+    Returns (metadata, frames): metadata holds every payload key except
+    'telemetry', and frames lazily yields each telemetry frame as JSON text and keeps the file
+    open (and shielded from eviction) until exhausted or closed. Returns None
+    if there is no valid local artifact in the line-oriented layout.
+    """
+    cache_path = get_cache_path(year, gp, session_type)
+    if not is_cache_valid(cache_path):
+        return None
+    try:
+        f = open(cache_path, 'r')
+    except FileNotFoundError:
+        return None
+
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError:
+                pass
+        first_line = f.readline()
+        marker = ',"telemetry":[\n'
+        if not first_line.endswith(marker):
+            f.close()
+            return None
+        header = json.loads(first_line[:-len(marker)] + '}}')
+    except Exception as e:
+        f.close()
+        print(f"Error opening race stream: {e}")
+        return None
+
+    header = _unpack_wrapper(header) if _is_wrapper_valid(header) else None
+    if header is None:
+        f.close()
+        return None
+    meta = header.pop('data')
+    touch_access(cache_path)
+    return meta, _iter_frame_lines(f, cache_path)
+
+def load_track_from_cache(year, gp):
+    """Load track coordinates from cache if available (memory, then local disk, then S3)"""
+    cache_key = get_cache_key(year, gp, 'track')
+    return _load_tiered(cache_key, year, gp, 'track', 'track')
+
+def save_track_to_cache(year, gp, data):
+    """Save track coordinates to cache (local disk, memory and S3 if configured)"""
+    cache_key = get_cache_key(year, gp, 'track')
+    return _save_tiered(cache_key, year, gp, 'track', 'track', data)
+
+def clear_cache(year=None, gp=None, session_type='R'):
+    """
+    Clear cache files. If year/gp specified, clear only that race
+    (session_type=None clears every session and the track for that GP).
+    If only year is specified, clear every artifact for that season.
+    """
     if year and gp:
-        cache_path = get_cache_path(year, gp)
-        if os.path.exists(cache_path):
-            os.remove(cache_path)
-            return True
+        if session_type is None:
+            prefix = get_cache_key(year, gp, '')
+            return _clear_matching(lambda name: name.startswith(prefix)) > 0
+        cache_key = get_cache_key(year, gp, session_type)
+        return _clear_matching(lambda name: os.path.splitext(name)[0] == cache_key) > 0
+    elif year:
+        return _clear_matching(lambda name: name.startswith(f"{year}_")) > 0
     else:
         # Clear all cache
-        for filename in os.listdir(CACHE_DIR):
-            if filename.endswith('.json'):
-                os.remove(os.path.join(CACHE_DIR, filename))
+        if os.path.isdir(CACHE_DIR):
+            _clear_matching(lambda name: True)
         return True
-    return False
 
+def _clear_matching(predicate):
+    """Remove cache files whose name matches predicate. Returns the count."""
+    from .catalog import forget_artifact
+    removed = 0
+    if not os.path.isdir(CACHE_DIR):
+        return removed
+    for filename in os.listdir(CACHE_DIR):
+        if filename.endswith(CACHE_FILE_SUFFIXES) and predicate(filename):
+            discard_from_memory(os.path.splitext(filename)[0])
+            try:
+                os.remove(os.path.join(CACHE_DIR, filename))
+                forget_artifact(os.path.join(CACHE_DIR, filename))
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,473 @@
+"""
+Race catalog: an embedded SQLite database of seasons, events, sessions,
+their processing status and the artifacts stored for them.
+
+/api/races is answered from indexed queries here (filtered by year and
+session type) instead of a JSON race list, and artifacts are looked up by
+session instead of by guessing file names. Tables:
+
+    seasons     year, when its schedule was last synced from FastF1
+    events      one per Grand Prix: year, gp (the name used in URLs and cache
+                keys), display name, round, date
+    sessions    one per event session ('FP1', 'Q', 'S', 'R', ...) with its UTC
+                start and processing status: available, processing,
+                processed or failed
+    artifacts   files stored for a session: kind ('race', 'compact', 'store', 'events';
+                'track' for the event-level track with session ''), path
+                relative to DATA_CACHE_DIR, size, sha256, written_at
+
+Recording an artifact only stats it, since it happens on the request path
+right after the write. Its sha256 stays NULL until fill_artifact_hashes()
+computes it in the background (the disk budget sweep, or
+manage_cache.py catalog --scan); stores are directories and have none.
+
+The database lives at DATA_CACHE_DIR/.catalog.sqlite (override with
+CATALOG_PATH) in WAL mode, shared by every process on the node. On first
+use it imports the legacy available_races.json and any artifacts already in
+the cache. Catalog updates never fail the write they describe: errors are
+logged and the cache keeps working without them.
+
+Configure with CATALOG_SEASONS (seasons synced on first use, defaults to
+'2025').
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from .cache import CACHE_DIR, CACHE_FILE_SUFFIXES, parse_cache_key
+
+CATALOG_PATH = os.getenv('CATALOG_PATH', os.path.join(CACHE_DIR, '.catalog.sqlite'))
+CATALOG_SEASONS = [int(y) for y in os.getenv('CATALOG_SEASONS', '2025').split(',') if y.strip()]
+SCHEMA_VERSION = 1
+
+# A season whose schedule could not be fetched is retried after this long
+SYNC_RETRY_SECONDS = 3600
+
+# A session still 'processing' after this long was left so by a worker that
+# died mid-build, and is listed as available again
+PROCESSING_STALE_SECONDS = 3600
+
+# FastF1 schedule session names -> session identifiers used by the API
+SESSION_TYPES = {
+    'Practice 1': 'FP1',
+    'Practice 2': 'FP2',
+    'Practice 3': 'FP3',
+    'Qualifying': 'Q',
+    'Sprint': 'S',
+    'Sprint Qualifying': 'SQ',
+    'Sprint Shootout': 'SQ',
+    'Race': 'R',
+}
+
+# Artifact kinds by file suffix
+ARTIFACT_KINDS = {'.json': 'race', '.f1tc': 'compact'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seasons (
+    year INTEGER PRIMARY KEY,
+    synced_at TEXT,
+    attempted_at TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL,
+    gp TEXT NOT NULL,
+    name TEXT,
+    round INTEGER,
+    date TEXT,
+    UNIQUE (year, gp)
+);
+CREATE INDEX IF NOT EXISTS events_by_round ON events (year, round);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    session_type TEXT NOT NULL,
+    date_utc TEXT,
+    status TEXT NOT NULL DEFAULT 'available',
+    error TEXT,
+    updated_at TEXT,
+    UNIQUE (event_id, session_type)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_type ON sessions (session_type, date_utc);
+CREATE TABLE IF NOT EXISTS artifacts (
+    event_id INTEGER NOT NULL REFERENCES events (id) ON DELETE CASCADE,
+    session_type TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER,
+    sha256 TEXT,
+    written_at TEXT,
+    PRIMARY KEY (event_id, session_type, kind)
+);
+"""
+
+# One connection per thread, reopened after a fork
+_local = threading.local()
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def _utc_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+@contextmanager
+def _transaction(conn, immediate=False):
+    conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+def connect():
+    """This thread's catalog connection, creating the database on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        return conn
+    os.makedirs(os.path.dirname(os.path.abspath(CATALOG_PATH)), exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        _create(conn)
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+def _create(conn):
+    with _transaction(conn, immediate=True):
+        # Another process may have created it while we waited for the lock
+        if conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+            return
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+        _import_legacy(conn)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+def _event_id(conn, year, gp, name=None, date=None):
+    conn.execute('INSERT OR IGNORE INTO events (year, gp, name, date) VALUES (?, ?, ?, ?)',
+                 (year, gp, name or f"{gp} Grand Prix", date))
+    return conn.execute('SELECT id FROM events WHERE year = ? AND gp = ?', (year, gp)).fetchone()[0]
+
+def _ensure_session(conn, event_id, session_type, date_utc=None):
+    conn.execute('INSERT OR IGNORE INTO sessions (event_id, session_type, date_utc, updated_at) '
+                 'VALUES (?, ?, ?, ?)', (event_id, session_type, date_utc, _now()))
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _path_size(path):
+    """Size of a file, or total size of a directory"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(path) for name in files)
+    return os.path.getsize(path)
+
+def _written_at(path):
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')
+
+def _record(conn, year, gp, session_type, kind, path):
+    size = _path_size(path)
+    written_at = _written_at(path)
+    event_id = _event_id(conn, year, gp)
+    if session_type:
+        _ensure_session(conn, event_id, session_type)
+    conn.execute('DELETE FROM artifacts WHERE path = ?', (os.path.relpath(path, CACHE_DIR),))
+    conn.execute('INSERT OR REPLACE INTO artifacts (event_id, session_type, kind, path, size, sha256, written_at) '
+                 'VALUES (?, ?, ?, ?, ?, NULL, ?)',
+                 (event_id, session_type, kind, os.path.relpath(path, CACHE_DIR), size, written_at))
+    if kind == 'race':
+        conn.execute("UPDATE sessions SET status = 'processed', error = NULL, updated_at = ? "
+                     "WHERE event_id = ? AND session_type = ?", (_now(), event_id, session_type))
+
+def _scan(conn):
+    """Record every artifact found in the cache directory. Returns the number found."""
+    found = 0
+    if not os.path.isdir(CACHE_DIR):
+        return found
+    for filename in sorted(os.listdir(CACHE_DIR)):
+        stem, suffix = os.path.splitext(filename)
+        parsed = parse_cache_key(stem) if suffix in CACHE_FILE_SUFFIXES else None
+        if not parsed:
+            continue
+        year, gp, session_type = parsed
+        if session_type == 'track':
+            _record(conn, year, gp, '', 'track', os.path.join(CACHE_DIR, filename))
+        else:
+            _record(conn, year, gp, session_type, ARTIFACT_KINDS[suffix], os.path.join(CACHE_DIR, filename))
+        found += 1
+
+    events_dir = os.path.join(CACHE_DIR, 'events')
+    if os.path.isdir(events_dir):
+        for filename in sorted(os.listdir(events_dir)):
+            parsed = parse_cache_key(filename[:-len('.json')]) if filename.endswith('.json') else None
+            if parsed:
+                _record(conn, *parsed, 'events', os.path.join(events_dir, filename))
+                found += 1
+
+    store_dir = os.path.join(CACHE_DIR, 'telemetry')
+    if os.path.isdir(store_dir):
+        for name in sorted(os.listdir(store_dir)):
+            try:
+                with open(os.path.join(store_dir, name, 'meta.json'), 'r') as f:
+                    meta = json.load(f)
+                _record(conn, meta['year'], meta['gp'], meta['session'], 'store', os.path.join(store_dir, name))
+                found += 1
+            except (OSError, ValueError, KeyError):
+                continue
+    return found
+
+def _import_legacy(conn):
+    """Import the JSON race list and the artifacts already in the cache"""
+    try:
+        with open(os.path.join(CACHE_DIR, 'available_races.json'), 'r') as f:
+            races = json.load(f).get('races', [])
+    except (OSError, ValueError):
+        races = []
+    for race in races:
+        event_id = _event_id(conn, race['year'], race['gp'], race.get('name'), race.get('date'))
+        _ensure_session(conn, event_id, 'R')
+    found = _scan(conn)
+    if races or found:
+        print(f"Catalog created: imported {len(races)} listed races and {found} cached artifacts")
+
+def scan_artifacts():
+    """Re-index the artifacts in the cache directory, dropping entries whose files are gone"""
+    conn = connect()
+    with _transaction(conn, immediate=True):
+        for row in conn.execute('SELECT path FROM artifacts').fetchall():
+            if not os.path.exists(os.path.join(CACHE_DIR, row['path'])):
+                conn.execute('DELETE FROM artifacts WHERE path = ?', (row['path'],))
+        found = _scan(conn)
+    fill_artifact_hashes()
+    return found
+
+def fill_artifact_hashes():
+    """
+    Compute the sha256 of recorded files that have none yet. A file rewritten
+    while it is hashed keeps NULL until the next call. Returns the number filled.
+    """
+    try:
+        rows = connect().execute(
+            "SELECT path, size, written_at FROM artifacts WHERE sha256 IS NULL AND kind != 'store'").fetchall()
+    except sqlite3.Error as e:
+        print(f"Error reading catalog: {e}")
+        return 0
+    filled = 0
+    for row in rows:
+        path = os.path.join(CACHE_DIR, row['path'])
+        try:
+            # Hashed outside any transaction, so writers are never blocked on it
+            sha256 = _file_hash(path)
+            if (_path_size(path), _written_at(path)) != (row['size'], row['written_at']):
+                continue
+            connect().execute('UPDATE artifacts SET sha256 = ? WHERE path = ? AND size = ? AND written_at = ?',
+                              (sha256, row['path'], row['size'], row['written_at']))
+            filled += 1
+        except (OSError, sqlite3.Error):
+            continue
+    return filled
+
+def add_event(year, gp, name=None, date=None, round_number=None, sessions=('R',)):
+    """Register an event and its sessions (for sources other than the FastF1 schedule)"""
+    try:
+        conn = connect()
+        with _transaction(conn):
+            event_id = _event_id(conn, year, gp, name, date)
+            if round_number is not None:
+                conn.execute('UPDATE events SET round = ? WHERE id = ?', (round_number, event_id))
+            for session_type in sessions:
+                _ensure_session(conn, event_id, session_type)
+    except sqlite3.Error as e:
+        print(f"Error updating catalog: {e}")
+
+def record_artifact(year, gp, session_type, kind, path):
+    """Record (or refresh) an artifact that was just written"""
+    try:
+        conn = connect()
+        with _transaction(conn):
+            _record(conn, year, gp, session_type, kind, path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error updating catalog: {e}")
+
+def forget_artifact(path):
+    """
+    Drop the record of an artifact that was deleted (or evicted). Without its
+    race artifact a processed session is available again.
+    """
+    try:
+        conn = connect()
+        with _transaction(conn):
+            row = conn.execute('SELECT event_id, session_type, kind FROM artifacts WHERE path = ?',
+                               (os.path.relpath(path, CACHE_DIR),)).fetchone()
+            if row is None:
+                return
+            conn.execute('DELETE FROM artifacts WHERE path = ?', (os.path.relpath(path, CACHE_DIR),))
+            if row['kind'] == 'race':
+                conn.execute("UPDATE sessions SET status = 'available', error = NULL, updated_at = ? "
+                             "WHERE event_id = ? AND session_type = ? AND status = 'processed'",
+                             (_now(), row['event_id'], row['session_type']))
+    except sqlite3.Error as e:
+        print(f"Error updating catalog: {e}")
+
+def set_session_status(year, gp, session_type, status, error=None):
+    """
+    Record a session's processing status: available, processing, processed or
+    failed. Sessions not in the catalog are left out, so requests for unknown
+    Grands Prix do not add them to the race list.
+    """
+    try:
+        connect().execute(
+            'UPDATE sessions SET status = ?, error = ?, updated_at = ? '
+            'WHERE session_type = ? AND event_id = (SELECT id FROM events WHERE year = ? AND gp = ?)',
+            (status, error, _now(), session_type, year, gp))
+    except sqlite3.Error as e:
+        print(f"Error updating catalog: {e}")
+
+def get_artifact(year, gp, session_type, kind='race'):
+    """Artifact record (with an absolute 'path') for a session, or None"""
+    row = connect().execute(
+        'SELECT a.* FROM artifacts a JOIN events e ON e.id = a.event_id '
+        'WHERE e.year = ? AND e.gp = ? AND a.session_type = ? AND a.kind = ?',
+        (year, gp, session_type, kind)).fetchone()
+    if row is None:
+        return None
+    artifact = dict(row)
+    artifact['path'] = os.path.join(CACHE_DIR, artifact['path'])
+    return artifact
+
+def _schedule_events(year):
+    """Events and session start times (UTC) from FastF1's schedule for a season"""
+    from .fastf1_loader import get_fastf1
+    import pandas as pd
+
+    schedule = get_fastf1().get_event_schedule(year, include_testing=False)
+    events = []
+    for _, event in schedule.iterrows():
+        sessions = []
+        for n in range(1, 6):
+            session_type = SESSION_TYPES.get(event.get(f'Session{n}'))
+            date_utc = event.get(f'Session{n}DateUtc')
+            if session_type:
+                sessions.append((session_type, str(date_utc)[:19] if pd.notna(date_utc) else None))
+        events.append({
+            'round': int(event['RoundNumber']),
+            'gp': event['EventName'].replace(' Grand Prix', ''),
+            'name': event['EventName'],
+            'date': str(event['EventDate'])[:19] if pd.notna(event['EventDate']) else None,
+            'sessions': sessions,
+        })
+    return schedule, events
+
+def sync_season(year):
+    """
+    Add a season's events and sessions from the FastF1 schedule. Events already
+    in the catalog (e.g. from the legacy race list) keep their gp identifier,
+    so existing cache keys stay valid. Returns the number of events.
+    """
+    conn = connect()
+    conn.execute('INSERT OR IGNORE INTO seasons (year) VALUES (?)', (year,))
+    conn.execute('UPDATE seasons SET attempted_at = ? WHERE year = ?', (_now(), year))
+    try:
+        schedule, events = _schedule_events(year)
+    except Exception as e:
+        print(f"Could not load the {year} schedule: {e}")
+        return 0
+
+    with _transaction(conn, immediate=True):
+        # Match events known by name only (legacy list) to their round
+        for row in conn.execute('SELECT id, gp FROM events WHERE year = ? AND round IS NULL', (year,)).fetchall():
+            try:
+                event = schedule.get_event_by_name(row['gp'])
+                conn.execute('UPDATE events SET round = ? WHERE id = ?', (int(event['RoundNumber']), row['id']))
+            except Exception:
+                continue
+
+        for event in events:
+            row = conn.execute('SELECT id FROM events WHERE year = ? AND round = ?',
+                               (year, event['round'])).fetchone()
+            if row is None:
+                event_id = _event_id(conn, year, event['gp'], event['name'], event['date'])
+            else:
+                event_id = row['id']
+            conn.execute('UPDATE events SET name = ?, round = ?, date = ? WHERE id = ?',
+                         (event['name'], event['round'], event['date'], event_id))
+            for session_type, date_utc in event['sessions']:
+                _ensure_session(conn, event_id, session_type, date_utc)
+                conn.execute('UPDATE sessions SET date_utc = ? WHERE event_id = ? AND session_type = ?',
+                             (date_utc, event_id, session_type))
+        conn.execute('UPDATE seasons SET synced_at = ? WHERE year = ?', (_now(), year))
+    print(f"Synced {year} schedule into the catalog ({len(events)} events)")
+    return len(events)
+
+def needs_sync(years):
+    """
+    Check whether any of the seasons has no events yet and has not been synced
+    (or tried within SYNC_RETRY_SECONDS). Seasons that already have events,
+    e.g. from the legacy race list, are refreshed with sync_season() explicitly.
+    """
+    conn = connect()
+    for year in years:
+        if conn.execute('SELECT 1 FROM events WHERE year = ? LIMIT 1', (year,)).fetchone():
+            continue
+        row = conn.execute('SELECT synced_at, attempted_at FROM seasons WHERE year = ?', (year,)).fetchone()
+        if row is None or not (row['synced_at'] or row['attempted_at']):
+            return True
+        if not row['synced_at']:
+            elapsed = datetime.now() - datetime.fromisoformat(row['attempted_at'])
+            if elapsed.total_seconds() >= SYNC_RETRY_SECONDS:
+                return True
+    return False
+
+def ensure_seasons(years=None):
+    """Sync the seasons (default CATALOG_SEASONS) that need it; see needs_sync()"""
+    for year in CATALOG_SEASONS if years is None else years:
+        if needs_sync([year]):
+            sync_season(year)
+
+def list_races(year=None, session_type=None):
+    """
+    Events with at least one session that has started (of session_type if
+    given), in season and round order, each with its sessions and their status.
+    A session stuck in 'processing' (see PROCESSING_STALE_SECONDS) is listed
+    as available.
+    """
+    stale = (datetime.now() - timedelta(seconds=PROCESSING_STALE_SECONDS)).isoformat(timespec='seconds')
+    rows = connect().execute(
+        'SELECT e.year, e.gp, e.name, e.round, e.date, s.session_type, s.date_utc, '
+        "CASE WHEN s.status = 'processing' AND (s.updated_at IS NULL OR s.updated_at < :stale) "
+        "THEN 'available' ELSE s.status END AS status "
+        'FROM events e JOIN sessions s ON s.event_id = e.id '
+        'WHERE (:year IS NULL OR e.year = :year) '
+        'AND (s.date_utc IS NULL OR s.date_utc <= :now) '
+        'AND (:session IS NULL OR EXISTS (SELECT 1 FROM sessions f WHERE f.event_id = e.id '
+        '     AND f.session_type = :session AND (f.date_utc IS NULL OR f.date_utc <= :now))) '
+        'ORDER BY e.year, COALESCE(e.round, 1000), e.id, s.date_utc, s.id',
+        {'year': year, 'session': session_type, 'now': _utc_now(), 'stale': stale}).fetchall()
+
+    races = []
+    for row in rows:
+        if not races or (races[-1]['year'], races[-1]['gp']) != (row['year'], row['gp']):
+            races.append({
+                'year': row['year'],
+                'gp': row['gp'],
+                'name': row['name'],
+                'round': row['round'],
+                'date': row['date'],
+                'sessions': [],
+            })
+        races[-1]['sessions'].append({'session': row['session_type'], 'status': row['status']})
+    return races
@@ -0,0 +1,349 @@
+"""
+Disk budget manager for the processed data cache (data_cache/) and the raw
+FastF1 cache (cache/).
+
+Every cache entry is tracked with its size and last access time. When the
+combined size exceeds the budget, least recently used raw FastF1 entries are
+evicted first (they can be re-downloaded), then processed artifacts.
+Entries that are being read are never evicted:
+- readers in this process pin the path (see cache.pin_entry)
+- readers in other processes hold a shared flock on the file
+- anything accessed within DISK_BUDGET_MIN_IDLE_SECONDS is skipped, which
+  covers FastF1 reading its own pickles
+- processed entries are removed only while holding their cache key's lock
+  (taken without waiting; an entry whose writer holds it is skipped), so a
+  store or artifact being rewritten is never deleted under its writer
+A race artifact is evicted together with what is derived from it (its
+encoded .f1tc and its event index). Shared blobs (data_cache/blobs/) are
+never evicted, since artifacts reference them; each sweep instead removes
+the blobs nothing references.
+
+Configure with environment variables:
+- DISK_BUDGET (e.g. '20G'; unset disables the background sweep)
+- DISK_BUDGET_SWEEP_SECONDS (optional, defaults to 600)
+- DISK_BUDGET_MIN_IDLE_SECONDS (optional, defaults to 600)
+"""
+
+import os
+import re
+import time
+import shutil
+import threading
+
+from .cache import CACHE_DIR, FASTF1_CACHE_DIR, is_entry_pinned, discard_from_memory, try_cache_key_lock
+from .catalog import fill_artifact_hashes, forget_artifact
+from .blob_store import BLOB_DIR, collect_garbage
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DISK_BUDGET = os.getenv('DISK_BUDGET')
+SWEEP_INTERVAL_SECONDS = int(os.getenv('DISK_BUDGET_SWEEP_SECONDS', '600'))
+MIN_IDLE_SECONDS = int(os.getenv('DISK_BUDGET_MIN_IDLE_SECONDS', '600'))
+
+RAW = 'raw'
+PROCESSED = 'processed'
+
+# FastF1 keeps its HTTP cache database open for the lifetime of the process
+NEVER_EVICT_SUFFIXES = ('.sqlite', '.sqlite-journal', '.sqlite-wal', '.sqlite-shm')
+
+# Subdirectory of data_cache/ -> suffix of the cache key lock its writers hold
+ENTRY_LOCK_SUFFIXES = {
+    'telemetry': '',
+    'live': '',
+    'events': '_events',
+    'deltas': '_delta',
+    'laps': '_laps',
+    'speed': '_speed',
+    'renders': '_track_render',
+}
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+_sweep_thread = None
+_sweep_thread_lock = threading.Lock()
+
+def parse_size(text):
+    """Parse a size like '500M', '20G' or '1048576' into bytes"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+def format_size(num_bytes):
+    """Format a byte count for display"""
+    for unit in ('B', 'K', 'M', 'G'):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f}{unit}" if unit != 'B' else f"{num_bytes}B"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}T"
+
+def _file_stats(path):
+    st = os.stat(path)
+    return st.st_size, max(st.st_atime, st.st_mtime)
+
+def _dir_stats(path):
+    size = 0
+    last_access = 0.0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                file_size, file_access = _file_stats(os.path.join(root, name))
+            except OSError:
+                continue
+            size += file_size
+            last_access = max(last_access, file_access)
+    return size, last_access
+
+def _make_entry(path, kind, evictable=True):
+    try:
+        if os.path.isdir(path):
+            size, last_access = _dir_stats(path)
+        else:
+            size, last_access = _file_stats(path)
+    except OSError:
+        return None
+    return {
+        'path': path,
+        'kind': kind,
+        'size': size,
+        'last_access': last_access,
+        'evictable': evictable
+    }
+
+def _scan_processed():
+    """Processed artifacts: top-level files, and each item inside subdirectories"""
+    entries = []
+    if not os.path.isdir(CACHE_DIR):
+        return entries
+    for item in os.scandir(CACHE_DIR):
+        if item.name.startswith('.'):
+            continue
+        if item.is_dir(follow_symlinks=False):
+            evictable = os.path.abspath(item.path) != os.path.abspath(BLOB_DIR)
+            for child in os.scandir(item.path):
+                if not child.name.startswith('.'):
+                    entries.append(_make_entry(child.path, PROCESSED, evictable))
+        else:
+            entries.append(_make_entry(item.path, PROCESSED))
+    return [e for e in entries if e]
+
+def _scan_raw():
+    """Raw FastF1 data: one entry per session directory (the leaf holding pickles)"""
+    entries = []
+    if not os.path.isdir(FASTF1_CACHE_DIR):
+        return entries
+    top = os.path.normpath(FASTF1_CACHE_DIR)
+    for root, dirs, files in os.walk(top):
+        if root == top:
+            for name in files:
+                path = os.path.join(root, name)
+                entries.append(_make_entry(path, RAW, evictable=not name.endswith(NEVER_EVICT_SUFFIXES)))
+            continue
+        if files:
+            entries.append(_make_entry(root, RAW))
+            dirs[:] = []
+    return [e for e in entries if e]
+
+def scan_entries():
+    """List every cache entry with its kind, size and last access time"""
+    return _scan_raw() + _scan_processed()
+
+def disk_usage(entries=None):
+    """Total bytes used by each cache kind"""
+    entries = scan_entries() if entries is None else entries
+    usage = {RAW: 0, PROCESSED: 0}
+    for entry in entries:
+        usage[entry['kind']] += entry['size']
+    usage['total'] = usage[RAW] + usage[PROCESSED]
+    return usage
+
+def eviction_order(entries):
+    """Raw FastF1 data first, then processed artifacts, each least recently used first"""
+    candidates = [e for e in entries if e['evictable']]
+    return sorted(candidates, key=lambda e: (e['kind'] != RAW, e['last_access']))
+
+def _is_processed(path):
+    return os.path.abspath(path).startswith(os.path.abspath(CACHE_DIR) + os.sep)
+
+def _entry_lock_name(path):
+    """The cache key lock that writers of a processed entry hold, or None"""
+    parts = os.path.relpath(path, CACHE_DIR).split(os.sep)
+    if len(parts) == 1:
+        return os.path.splitext(parts[0])[0]
+    suffix = ENTRY_LOCK_SUFFIXES.get(parts[0])
+    if suffix is None or len(parts) != 2:
+        return None
+    stem = parts[1] if os.path.isdir(path) else os.path.splitext(parts[1])[0]
+    if parts[0] == 'speed':
+        # {key}_{segment}m.json
+        stem = stem.rsplit('_', 1)[0]
+    return stem + suffix
+
+def _derived_paths(path):
+    """Artifacts derived from a race artifact, evicted along with it"""
+    directory, name = os.path.split(path)
+    if os.path.abspath(directory) != os.path.abspath(CACHE_DIR) or not name.endswith('.json') or name.endswith('_track.json'):
+        return []
+    cache_key = name[:-len('.json')]
+    return [os.path.join(CACHE_DIR, f"{cache_key}.f1tc"), os.path.join(CACHE_DIR, 'events', name)]
+
+def _delete(path):
+    """
+    Delete a file or directory unless a reader holds it (pinned in this
+    process, or a shared flock on the file). Returns bytes freed, or None if
+    it is in use. Takes the entry's cache key lock when it has one.
+    """
+    if is_entry_pinned(path):
+        return None
+    lock_name = _entry_lock_name(path) if _is_processed(path) else None
+    if lock_name is None:
+        return _delete_unlocked(path)
+    with try_cache_key_lock(lock_name) as locked:
+        return _delete_unlocked(path) if locked else None
+
+def _delete_unlocked(path):
+    if os.path.isdir(path):
+        size, _ = _dir_stats(path)
+        shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(path):
+            return None
+        forget_artifact(path)
+        return size
+    try:
+        with open(path, 'rb') as f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            size = os.fstat(f.fileno()).st_size
+            os.remove(path)
+    except FileNotFoundError:
+        return 0
+    forget_artifact(path)
+    if _is_processed(path) and path.endswith('.json'):
+        discard_from_memory(os.path.basename(path)[:-len('.json')])
+    return size
+
+def _remove_entry(entry):
+    """
+    Delete one entry (and, for a race artifact, what is derived from it)
+    unless a reader or writer holds it. Returns bytes freed, or None if kept.
+    """
+    freed = _delete(entry['path'])
+    if freed is None:
+        return None
+    for path in _derived_paths(entry['path']):
+        if os.path.exists(path):
+            freed += _delete(path) or 0
+    return freed
+
+def remove_stale_temp_files(max_age_seconds=3600):
+    """Remove temp files left behind by writers that crashed mid-write"""
+    removed = 0
+    now = time.time()
+    for root, _, files in os.walk(CACHE_DIR):
+        for name in files:
+            if not (name.startswith('.') and name.endswith('.tmp')):
+                continue
+            path = os.path.join(root, name)
+            try:
+                if now - os.path.getmtime(path) > max_age_seconds:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+    return removed
+
+def sweep(max_bytes, dry_run=False, min_idle_seconds=None):
+    """
+    Evict entries until the combined cache size fits in max_bytes.
+    Returns a summary dict with usage before/after and the evicted entries.
+    """
+    min_idle_seconds = MIN_IDLE_SECONDS if min_idle_seconds is None else min_idle_seconds
+    if not dry_run:
+        remove_stale_temp_files()
+        collect_garbage()
+    entries = scan_entries()
+    usage = disk_usage(entries)
+    total = usage['total']
+    now = time.time()
+    evicted = []
+    skipped = 0
+
+    for entry in eviction_order(entries):
+        if total <= max_bytes:
+            break
+        if now - entry['last_access'] < min_idle_seconds:
+            skipped += 1
+            continue
+        if not os.path.lexists(entry['path']):
+            # Already evicted along with the race artifact it derives from
+            continue
+        freed = entry['size'] if dry_run else _remove_entry(entry)
+        if freed is not None:
+            total -= freed
+            evicted.append(entry)
+        else:
+            skipped += 1
+
+    if not dry_run:
+        # Hashing catalog artifacts is left to the sweep, off the request path
+        fill_artifact_hashes()
+
+    if evicted:
+        action = 'Would evict' if dry_run else 'Evicted'
+        print(f"{action} {len(evicted)} cache entries ({format_size(usage['total'] - total)}), "
+              f"usage {format_size(total)} / budget {format_size(max_bytes)}")
+    return {
+        'budget': max_bytes,
+        'before': usage['total'],
+        'after': total,
+        'evicted': evicted,
+        'skipped': skipped,
+        'dry_run': dry_run
+    }
+
+def _sweep_locked(max_bytes):
+    """Run a sweep unless another process is already sweeping"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    lock_path = os.path.join(CACHE_DIR, '.disk_budget.lock')
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+        return sweep(max_bytes)
+
+def start_background_sweep(max_bytes=None, interval=None):
+    """
+    Start the periodic sweep thread (no-op if no budget is configured). Call
+    it in each serving process (after forking); a file lock lets only one
+    process sweep at a time.
+    """
+    global _sweep_thread
+    if max_bytes is None:
+        if not DISK_BUDGET:
+            return None
+        max_bytes = parse_size(DISK_BUDGET)
+    interval = SWEEP_INTERVAL_SECONDS if interval is None else interval
+
+    with _sweep_thread_lock:
+        if _sweep_thread is not None and _sweep_thread.is_alive():
+            return _sweep_thread
+
+        def run():
+            while True:
+                try:
+                    _sweep_locked(max_bytes)
+                except Exception as e:
+                    print(f"Error during cache sweep: {e}")
+                time.sleep(interval)
+
+        _sweep_thread = threading.Thread(target=run, name='disk-budget-sweep', daemon=True)
+        _sweep_thread.start()
+        return _sweep_thread
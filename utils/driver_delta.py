@@ -0,0 +1,204 @@
+"""
+Time delta between two drivers as a function of distance.
+
+Built from the raw per-driver telemetry in the session's store rather than
+the 1-second race frames: each driver's samples are placed on a common
+distance axis (laps normalised to the track length, so both drivers finish
+every lap at the same point) and np.interp reads the time each driver
+reached every point of a regular grid. The delta is driver b's time minus
+driver a's, so positive values mean b is behind.
+
+reference='race' compares session times (the on-track gap); reference='lap'
+measures each driver from the start of the current lap, so the delta resets
+every lap and ends each lap at the lap time difference.
+
+Each (pair, laps, reference, step) result is computed once and kept as JSON
+under DATA_CACHE_DIR/deltas/{year}_{gp}_{session}/; a swapped pair reuses it
+negated. Results are discarded when the store is rewritten.
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from .cache import CACHE_DIR, atomic_write_json, cache_key_lock, get_cache_key, touch_access
+from .telemetry_store import driver_numbers, get_store_mtime, load_store
+
+DELTA_DIR = os.path.join(CACHE_DIR, 'deltas')
+
+# Grid spacing limits (metres)
+DEFAULT_STEP = 10.0
+MIN_STEP = 1.0
+
+# Results kept decoded in memory
+DELTA_MEMORY_ENTRIES = 64
+
+# result path -> (file mtime, result)
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+def parse_laps(value):
+    """Parse a lap parameter given as 'N' or 'N-M'. Returns (first, last) or None."""
+    if value is None or value == '':
+        return None
+    first, _, last = value.partition('-')
+    first = int(first)
+    last = int(last) if last else first
+    if first < 1 or last < first:
+        raise ValueError("laps must be N or N-M with 1 <= N <= M")
+    return first, last
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _distance_time(store, driver, laps):
+    """
+    (lap position, session seconds) arrays for one driver: lap position is the
+    lap count from the first lap in range (lap 1 without one) plus the fraction
+    of the lap covered
+    """
+    import numpy as np
+
+    tel = store['telemetry'].load(driver, columns=['SessionTime', 'Distance', 'LapNumber'])
+    tel = tel.dropna(subset=['SessionTime', 'Distance', 'LapNumber']).sort_values('SessionTime')
+    if laps is not None:
+        tel = tel[(tel['LapNumber'] >= laps[0]) & (tel['LapNumber'] <= laps[1])]
+    if len(tel) < 2:
+        return None
+
+    lap = tel['LapNumber'].to_numpy(dtype=float)
+    distance = tel['Distance'].to_numpy(dtype=float)
+    # Each lap's own end distance, so both drivers complete every lap at 1.0
+    lap_end = tel.groupby('LapNumber')['Distance'].transform('max').to_numpy(dtype=float)
+    first_lap = laps[0] if laps is not None else 1
+    position = (lap - first_lap) + np.divide(distance, lap_end, out=np.zeros_like(distance), where=lap_end > 0)
+    # Samples must move forward for interpolation
+    position = np.maximum.accumulate(position)
+    seconds = tel['SessionTime'].dt.total_seconds().to_numpy()
+    return position, seconds, float(np.median(tel.groupby('LapNumber')['Distance'].max()))
+
+def _compute(store, a, b, laps, reference, step):
+    import numpy as np
+
+    trace_a = _distance_time(store, a, laps)
+    trace_b = _distance_time(store, b, laps)
+    if trace_a is None or trace_b is None:
+        return None
+    position_a, seconds_a, length_a = trace_a
+    position_b, seconds_b, length_b = trace_b
+    track_length = (length_a + length_b) / 2
+
+    # Only where both drivers have telemetry
+    start = max(position_a[0], position_b[0])
+    end = min(position_a[-1], position_b[-1])
+    if end <= start:
+        return None
+    grid = np.arange(start * track_length, end * track_length, step) / track_length
+    time_a = np.interp(grid, position_a, seconds_a)
+    time_b = np.interp(grid, position_b, seconds_b)
+    if reference == 'lap':
+        # Time each driver crossed the start of the lap each grid point is in
+        lap_start = np.floor(grid)
+        time_a -= np.interp(np.maximum(lap_start, start), position_a, seconds_a)
+        time_b -= np.interp(np.maximum(lap_start, start), position_b, seconds_b)
+
+    first_lap = laps[0] if laps is not None else 1
+    return {
+        'track_length': round(track_length, 1),
+        'first_lap': first_lap,
+        'distance': np.round(grid * track_length, 1).tolist(),
+        'lap': (first_lap + np.floor(grid)).astype(int).tolist(),
+        'delta': np.round(time_b - time_a, 3).tolist(),
+    }
+
+def _result_path(year, gp, session_type, a, b, laps, reference, step):
+    lap_range = f"{laps[0]}-{laps[1]}" if laps else 'all'
+    return os.path.join(DELTA_DIR, get_cache_key(year, gp, session_type),
+                        f"{a}_{b}_{lap_range}_{reference}_{step:g}.json")
+
+def _load_result(path, store_mtime):
+    mtime = _get_mtime(path)
+    with _results_lock:
+        entry = _results.get(path)
+        if entry is not None and entry[0] == mtime and mtime is not None:
+            _results.move_to_end(path)
+            return entry[1]
+    if mtime is None or store_mtime is None or mtime < store_mtime:
+        return None
+    try:
+        with open(path, 'r') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_access(path)
+    _remember(path, mtime, result)
+    return result
+
+def _remember(path, mtime, result):
+    with _results_lock:
+        _results[path] = (mtime, result)
+        _results.move_to_end(path)
+        while len(_results) > DELTA_MEMORY_ENTRIES:
+            _results.popitem(last=False)
+
+def get_driver_delta(year, gp, session_type, driver_a, driver_b, laps=None, reference=None, step=DEFAULT_STEP):
+    """
+    Time delta of driver_b relative to driver_a (numbers or codes) by distance,
+    over laps (first, last) or the whole session. reference defaults to 'lap'
+    when laps are given and 'race' otherwise. Returns None without a store or
+    overlapping telemetry; raises KeyError for an unknown driver.
+    """
+    reference = reference or ('lap' if laps else 'race')
+    if reference not in ('lap', 'race'):
+        raise ValueError("reference must be 'lap' or 'race'")
+    step = max(float(step), MIN_STEP)
+
+    store_mtime = get_store_mtime(year, gp, session_type)
+    numbers = driver_numbers(year, gp, session_type)
+    if numbers is None or store_mtime is None:
+        return None
+    a = numbers.get(str(driver_a).upper())
+    b = numbers.get(str(driver_b).upper())
+    for driver, number in ((driver_a, a), (driver_b, b)):
+        if number is None:
+            raise KeyError(f"No telemetry for driver {driver}")
+
+    # One result per unordered pair: the swapped pair is the same delta negated
+    swapped = int(b) < int(a) if a.isdigit() and b.isdigit() else b < a
+    first, second = (b, a) if swapped else (a, b)
+    path = _result_path(year, gp, session_type, first, second, laps, reference, step)
+
+    result = _load_result(path, store_mtime)
+    if result is None:
+        with cache_key_lock(f"{get_cache_key(year, gp, session_type)}_delta"):
+            result = _load_result(path, store_mtime)
+            if result is None:
+                store = load_store(year, gp, session_type)
+                result = _compute(store, first, second, laps, reference, step) if store is not None else None
+                if result is None:
+                    return None
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    atomic_write_json(path, result)
+                    _remember(path, _get_mtime(path), result)
+                except Exception as e:
+                    print(f"Error saving driver delta: {e}")
+
+    delta = [0.0 - value for value in result['delta']] if swapped else result['delta']
+    return {
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'drivers': [a, b],
+        'laps': list(laps) if laps else None,
+        'reference': reference,
+        'step': step,
+        'track_length': result['track_length'],
+        'distance': result['distance'],
+        'lap': result['lap'],
+        'delta': delta,
+    }
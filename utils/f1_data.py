@@ -1,84 +1,50 @@
-import fastf1
-import pandas as pd
 import json
-from datetime import timedelta
+import math
 import os
-from .cache import load_from_cache, save_to_cache
-
-# Enable FastF1 cache
-CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'cache')
-fastf1.Cache.enable_cache(CACHE_DIR)
-
-# Known 2025 Grand Prix locations (will be updated as season progresses)
-GP_2025 = [
-    'Bahrain', 'Saudi Arabia', 'Australia', 'Japan', 'China',
-    'Miami', 'Emilia Romagna', 'Monaco', 'Canada', 'Spain',
-    'Austria', 'Great Britain', 'Hungary', 'Belgium', 'Netherlands',
-    'Italy', 'Azerbaijan', 'Singapore', 'United States', 'Mexico',
-    'Brazil', 'Qatar', 'Abu Dhabi'
-]
-
-def get_available_races():
-    """Get list of available 2025 races - with caching"""
-    import json
-    from datetime import datetime, timedelta
-    
-    # Cache file for race list
-    cache_path = os.path.join(os.path.dirname(__file__), '..', 'data_cache', 'available_races.json')
-    
-    # Check if cache exists and is valid (30 days - race list doesn't change often)
-    if os.path.exists(cache_path):
-        try:
-            with open(cache_path, 'r') as f:
-                cached = json.load(f)
-                cache_time = datetime.fromisoformat(cached.get('cached_at', '2000-01-01'))
-                # Use cached data if it's less than 30 days old (or if it exists, use it indefinitely for stability)
-                if (datetime.now() - cache_time) < timedelta(days=30):
-                    print(f"Loaded race list from cache ({len(cached.get('races', []))} races)")
-                    return cached.get('races', [])
-                else:
-                    # Cache is old but still exists - use it anyway to avoid API calls
-                    print(f"Using cached race list (may be outdated, {len(cached.get('races', []))} races)")
-                    return cached.get('races', [])
-        except Exception as e:
-            print(f"Error loading race list cache: {e}")
-    
-    # If not cached or cache invalid, fetch races
-    races = []
-    year = 2025
-    
-    for gp in GP_2025:
-        try:
-            session = fastf1.get_session(year, gp, 'R')
-            session.load()
-            if session is not None:
-                races.append({
-                    'year': year,
-                    'gp': gp,
-                    'name': f"{gp} Grand Prix",
-                    'date': str(session.date) if hasattr(session, 'date') else None
-                })
-        except Exception:
-            # Race not available yet, skip
-            continue
-    
-    # Save to cache
-    try:
-        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-        with open(cache_path, 'w') as f:
-            json.dump({
-                'cached_at': datetime.now().isoformat(),
-                'races': races
-            }, f, indent=2)
-        print(f"Saved race list to cache ({len(races)} races)")
-    except Exception as e:
-        print(f"Error saving race list cache: {e}")
-    
-    return races
+import tempfile
+from .cache import (
+    CACHE_DIR as DATA_CACHE_DIR, cache_key_lock,
+    get_cache_key, load_from_cache, open_race_stream, save_race_stream_to_cache
+)
+from . import catalog
+from .fastf1_loader import load_session
+from .race_events import build_event_index, load_event_index, save_event_index
+from .season_laps import record_session_laps
+from .telemetry_store import PARQUET_AVAILABLE, extract_session, load_store, write_store
 
-def get_race_data(year, gp, session_type='R'):
-    """Get processed race telemetry data - optimized version with caching"""
-    # Try to load from cache first
+# fastf1 and pandas are imported inside the processing functions so that
+# serving cached data never pays for them
+
+# Race payload sampling: one frame per interval, each driver's closest
+# telemetry sample if it is within the tolerance
+SAMPLE_INTERVAL_SECONDS = 1
+SAMPLE_TOLERANCE_SECONDS = 2.0
+
+# Telemetry channels in each frame: (payload field, telemetry column)
+SAMPLED_FIELDS = (('x', 'X'), ('y', 'Y'), ('distance', 'Distance'), ('speed', 'Speed'), ('lap', 'LapNumber'))
+
+# Telemetry columns read for sampling
+SAMPLE_COLUMNS = ['SessionTime'] + [column for _, column in SAMPLED_FIELDS]
+
+# Frames read back from the sample arrays at a time
+SAMPLE_BLOCK = 600
+
+def get_available_races(year=None, session_type=None):
+    """
+    List races that have started, from the race catalog (see catalog.py),
+    optionally only one season and/or events with a given session type.
+    Seasons without events (CATALOG_SEASONS, or the requested year) are synced
+    from the FastF1 schedule on first use.
+    """
+    years = catalog.CATALOG_SEASONS if year is None else [year]
+    if catalog.needs_sync(years):
+        # Only one process syncs a season; others wait here and reuse it
+        with cache_key_lock('available_races'):
+            catalog.ensure_seasons(years)
+    return catalog.list_races(year, session_type)
+
+def load_cached_race(year, gp, session_type):
+    """Return cached race data if it is in the current format, otherwise None"""
     cached_data = load_from_cache(year, gp, session_type)
     if cached_data:
         data = cached_data['data']
@@ -101,6 +67,7 @@ def get_race_data(year, gp, session_type='R'):
                 else:
                     print(f"Detected old cache format for {year} {gp} (missing total_laps/lap_times), regenerating...")
                 # Don't return cached data, regenerate it
+                return None
             else:
                 # New format with relative times and new fields, return it
                 print(f"Using cached data for {year} {gp} (first time: '{first_time}')")
@@ -111,315 +78,526 @@ def get_race_data(year, gp, session_type='R'):
         else:
             # Has total_duration but no telemetry or empty, return it anyway
             return data
-    
-    # If not in cache, process the data
+    return None
+
+def get_race_data(year, gp, session_type='R'):
+    """Get processed race telemetry data - optimized version with caching"""
+    # Try to load from cache first
+    data = load_cached_race(year, gp, session_type)
+    if data is not None:
+        return data
+
+    # Only one process regenerates a race; others wait here and then read its result
+    with cache_key_lock(get_cache_key(year, gp, session_type)):
+        data = load_cached_race(year, gp, session_type)
+        if data is not None:
+            return data
+        meta, frames = _process_race_data(year, gp, session_type)
+    # Callers of this function want the whole payload; get_race_stream does not decode it
+    return dict(meta, telemetry=[json.loads(frame) for frame in frames])
+
+def _open_current_race_stream(year, gp, session_type):
+    stream = open_race_stream(year, gp, session_type)
+    if stream is None:
+        return None
+    meta, frames = stream
+    if not all(key in meta for key in ('total_duration', 'total_laps', 'lap_times')):
+        # Old cache format: let get_race_data regenerate it
+        frames.close()
+        return None
+    return stream
+
+def get_race_stream(year, gp, session_type='R'):
+    """
+    Get a race as (metadata, frames) where frames lazily yields each telemetry
+    frame as JSON text, read line by line from the cached artifact. The race
+    is processed (or fetched from S3) first if it is not cached locally.
+    """
+    stream = _open_current_race_stream(year, gp, session_type)
+    if stream is not None:
+        return stream
+
+    with cache_key_lock(get_cache_key(year, gp, session_type)):
+        stream = _open_current_race_stream(year, gp, session_type)
+        if stream is not None:
+            return stream
+        # S3 (warms the local file) or, failing that, process the race
+        data = load_cached_race(year, gp, session_type)
+        if data is None:
+            return _process_race_data(year, gp, session_type)
+    stream = _open_current_race_stream(year, gp, session_type)
+    return stream if stream is not None else _payload_stream(data)
+
+def _payload_stream(data):
+    """A decoded race payload as (metadata, frames as JSON text), for when the cache is not writable"""
+    meta = {k: v for k, v in data.items() if k != 'telemetry'}
+    frames = (json.dumps(frame, separators=(',', ':')) for frame in data.get('telemetry', []))
+    return meta, frames
+
+def _process_race_data(year, gp, session_type):
+    """
+    Build the race payload from the session's telemetry store, save it to
+    cache and return it as a stream (see get_race_stream), so the payload is
+    never decoded on the request path
+    """
+    catalog.set_session_status(year, gp, session_type, 'processing')
     try:
-        session = fastf1.get_session(year, gp, session_type)
-        session.load()
-        
-        # Get all drivers
-        drivers = session.drivers
-        driver_info = {}
-        
-        # Get driver names and team colors
-        for driver in drivers:
-            try:
-                lap = session.laps.pick_driver(driver).iloc[0]
-                driver_info[driver] = {
-                    'name': lap['Driver'],
-                    'team': lap['Team'],
-                    'color': get_team_color(lap['Team'])
-                }
-            except Exception:
-                driver_info[driver] = {
-                    'name': f'Driver {driver}',
-                    'team': 'Unknown',
-                    'color': '#808080'
-                }
-        
-        # Pre-load telemetry for all drivers (much more efficient)
-        driver_telemetry = {}
-        for driver in drivers:
-            try:
-                # Get all telemetry for this driver
-                driver_laps = session.laps.pick_driver(driver)
-                all_tel = []
-                
-                for _, lap in driver_laps.iterrows():
-                    try:
-                        tel = lap.get_telemetry()
-                        if tel is not None and len(tel) > 0:
-                            # Add lap start time to telemetry time
-                            lap_start = lap['LapStartTime']
-                            if 'Time' in tel.columns:
-                                tel = tel.copy()
-                                tel['SessionTime'] = lap_start + pd.to_timedelta(tel['Time'])
-                                tel['LapNumber'] = lap['LapNumber']
-                                all_tel.append(tel)
-                    except Exception:
-                        continue
-                
-                if all_tel:
-                    # Combine all telemetry
-                    driver_telemetry[driver] = pd.concat(all_tel, ignore_index=True)
-                    # Sort by session time
-                    driver_telemetry[driver] = driver_telemetry[driver].sort_values('SessionTime')
-            except Exception:
-                continue
-        
-        if not driver_telemetry:
-            raise Exception("No telemetry data available for any driver")
-        
-        # Find common time range
-        all_times = []
-        for tel in driver_telemetry.values():
-            if 'SessionTime' in tel.columns:
-                all_times.extend(tel['SessionTime'].tolist())
-        
-        if not all_times:
-            raise Exception("No valid time data found")
-        
-        start_time = min(all_times)
-        end_time = max(all_times)
-        
-        # Sample at larger intervals (every 1 second) for better performance
-        telemetry_data = []
-        current_time = start_time
-        interval = timedelta(seconds=1.0)  # 1 second intervals
-        max_duration = end_time - start_time
-        # Remove 1-hour limit - allow full race duration (races can be 1.5-2+ hours)
-        max_samples = int(max_duration.total_seconds())
-        
-        sample_count = 0
-        first_entry_added = False
-        while current_time <= end_time and sample_count < max_samples:
+        source = load_store(year, gp, session_type)
+        if source is None:
+            # First time for this session: extract it from FastF1 (and persist it when possible)
+            session = load_session(year, gp, session_type)
+            if PARQUET_AVAILABLE:
+                source = write_store(year, gp, session_type, session)
+            if source is None:
+                source = extract_session(year, gp, session_type, session)
+
+        # Frames are written to the cache as they are produced, then streamed back
+        if _save_race(year, gp, session_type, source):
+            stream = _open_current_race_stream(year, gp, session_type)
+            if stream is not None:
+                return stream
+
+        # Cache not writable: build the payload in memory instead
+        data = build_race_data(year, gp, session_type, source)
+        catalog.set_session_status(year, gp, session_type, 'processed')
+        return _payload_stream(data)
+
+    except Exception as e:
+        catalog.set_session_status(year, gp, session_type, 'failed', str(e))
+        raise Exception(f"Error fetching race data: {str(e)}")
+
+def rebuild_race_from_store(year, gp, session_type='R'):
+    """Rebuild and re-cache a race from its telemetry store only (no FastF1). Returns False without a store."""
+    with cache_key_lock(get_cache_key(year, gp, session_type)):
+        source = load_store(year, gp, session_type)
+        if source is None:
+            return False
+        return _save_race(year, gp, session_type, source)
+
+def _save_race(year, gp, session_type, source):
+    samples = sample_race(source)
+    meta, frames = stream_race_data(year, gp, session_type, source, samples)
+    if not save_race_stream_to_cache(year, gp, session_type, meta, frames):
+        return False
+    record_session_laps(year, gp, session_type, source.get('laps'), meta)
+    _save_event_index(year, gp, session_type, source, samples, meta['track_length'])
+    return True
+
+def _save_event_index(year, gp, session_type, source, samples, track_length):
+    fields = [field for field, _ in SAMPLED_FIELDS]
+    try:
+        index = build_event_index(
+            samples['drivers'], samples['present'],
+            samples['values'][:, :, fields.index('lap')], samples['values'][:, :, fields.index('distance')],
+            track_length, SAMPLE_INTERVAL_SECONDS, source.get('laps'), source.get('track_status'),
+            source.get('race_control_messages'), samples['start_time'], source['meta'].get('t0_date'),
+            samples['values'][:, :, fields.index('speed')])
+        return save_event_index(year, gp, session_type, index)
+    except Exception as e:
+        print(f"Could not build event index: {e}")
+        return False
+
+def get_event_index(year, gp, session_type='R'):
+    """
+    The race's event index (see race_events.py). Races processed before the
+    index existed get one built from their telemetry store. None without either.
+    """
+    index = load_event_index(year, gp, session_type)
+    if index is not None:
+        return index
+    with cache_key_lock(f"{get_cache_key(year, gp, session_type)}_events"):
+        index = load_event_index(year, gp, session_type)
+        if index is not None:
+            return index
+        source = load_store(year, gp, session_type)
+        if source is None:
+            return None
+        laps = source.get('laps')
+        track_length = _track_length(laps, source['meta']['drivers'], source['telemetry'])
+        _save_event_index(year, gp, session_type, source, sample_race(source), track_length)
+    return load_event_index(year, gp, session_type)
+
+def build_race_data(year, gp, session_type, source):
+    """Build the full race payload in memory (see stream_race_data)"""
+    meta, frames = stream_race_data(year, gp, session_type, source)
+    result = dict(meta)
+    result['telemetry'] = list(frames)
+    return result
+
+def _pick_driver(laps, driver):
+    """Rows of a laps table for one driver number"""
+    if laps is None or 'DriverNumber' not in laps.columns:
+        raise KeyError(driver)
+    return laps[laps['DriverNumber'] == driver]
+
+def _load_driver_columns(telemetry, driver, columns):
+    """Read only some columns of one driver's telemetry (store or in-memory frames)"""
+    if hasattr(telemetry, 'load'):
+        return telemetry.load(driver, columns=columns)
+    tel = telemetry[driver]
+    return tel[[c for c in columns if c in tel.columns]]
+
+def _time_bounds(telemetry):
+    """Earliest and latest SessionTime over all drivers, reading one driver at a time"""
+    start_time = end_time = None
+    for driver in telemetry:
+        tel = _load_driver_columns(telemetry, driver, ['SessionTime'])
+        if 'SessionTime' not in tel.columns:
+            continue
+        times = tel['SessionTime'].dropna()
+        if len(times) == 0:
+            continue
+        first, last = times.min(), times.max()
+        start_time = first if start_time is None else min(start_time, first)
+        end_time = last if end_time is None else max(end_time, last)
+    return start_time, end_time
+
+def _spill_array(shape, dtype):
+    """A zero-filled array backed by an anonymous temp file in the data cache"""
+    import numpy as np
+
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+    with tempfile.TemporaryFile(dir=DATA_CACHE_DIR) as f:
+        # The mapping keeps its own reference; the file is gone once it is dropped
+        return np.memmap(f, dtype=dtype, mode='w+', shape=shape)
+
+def sample_grid(start_time, first_sample, end_sample):
+    """Sample times (int64 ns) for sample indexes first_sample <= k < end_sample"""
+    import numpy as np
+
+    step = SAMPLE_INTERVAL_SECONDS * 10**9
+    return start_time.value + np.arange(first_sample, end_sample, dtype=np.int64) * step
+
+def _sample_driver(tel, grid):
+    """
+    For each grid time (int64 ns), the driver's closest telemetry sample if it
+    is within SAMPLE_TOLERANCE_SECONDS. Returns (present mask, values per SAMPLED_FIELDS).
+    """
+    import numpy as np
+
+    values = np.full((len(grid), len(SAMPLED_FIELDS)), np.nan)
+    tel = tel[tel['SessionTime'].notna()]
+    times = tel['SessionTime'].to_numpy(dtype='timedelta64[ns]').astype(np.int64)
+    if len(times) == 0:
+        return np.zeros(len(grid), dtype=bool), values
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+
+    # Neighbours on either side of each grid time; ties go to the earlier sample
+    right = np.searchsorted(times, grid, side='left')
+    left = np.clip(right - 1, 0, len(times) - 1)
+    right = np.clip(right, 0, len(times) - 1)
+    nearest = np.where(np.abs(grid - times[left]) <= np.abs(times[right] - grid), left, right)
+    present = np.abs(times[nearest] - grid) <= int(SAMPLE_TOLERANCE_SECONDS * 1e9)
+
+    rows = order[nearest]
+    for i, (_, column) in enumerate(SAMPLED_FIELDS):
+        if column in tel.columns:
+            values[:, i] = tel[column].to_numpy(dtype=float, na_value=np.nan)[rows]
+    return present, values
+
+def _format_duration(total_seconds):
+    """Format seconds as H:MM:SS (no "days" prefix)"""
+    total_seconds = int(total_seconds)
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+def _iter_frames(drivers, present, values, first_sample=0):
+    """
+    Yield telemetry frames from the per-driver sample arrays, a block at a time.
+    first_sample is the race-wide index of the arrays' first sample.
+    """
+    import numpy as np
+
+    n_samples = present.shape[1]
+    fields = [field for field, _ in SAMPLED_FIELDS]
+    for block_start in range(0, n_samples, SAMPLE_BLOCK):
+        block_end = min(block_start + SAMPLE_BLOCK, n_samples)
+        block_present = np.array(present[:, block_start:block_end])
+        block_values = np.array(values[:, block_start:block_end]).tolist()
+
+        for offset in range(block_end - block_start):
+            sample_count = first_sample + block_start + offset
             driver_positions = {}
-            
-            for driver, tel in driver_telemetry.items():
-                try:
-                    # Find closest time point in this driver's telemetry
-                    if 'SessionTime' in tel.columns:
-                        time_diffs = (tel['SessionTime'] - current_time).abs()
-                        closest_idx = time_diffs.idxmin()
-                        closest_tel = tel.loc[closest_idx]
-                        
-                        # Only include if within 2 seconds
-                        time_diff = abs((closest_tel['SessionTime'] - current_time).total_seconds())
-                        if time_diff <= 2.0:
-                            driver_positions[driver] = {
-                                'x': float(closest_tel['X']) if 'X' in closest_tel and pd.notna(closest_tel['X']) else None,
-                                'y': float(closest_tel['Y']) if 'Y' in closest_tel and pd.notna(closest_tel['Y']) else None,
-                                'distance': float(closest_tel['Distance']) if 'Distance' in closest_tel and pd.notna(closest_tel['Distance']) else None,
-                                'speed': float(closest_tel['Speed']) if 'Speed' in closest_tel and pd.notna(closest_tel['Speed']) else None,
-                                'lap': int(closest_tel['LapNumber']) if 'LapNumber' in closest_tel and pd.notna(closest_tel['LapNumber']) else None
-                            }
-                except Exception:
-                    pass
-            
+            for i, driver in enumerate(drivers):
+                if not block_present[i, offset]:
+                    continue
+                entry = {}
+                for field, value in zip(fields, block_values[i][offset]):
+                    if math.isnan(value):
+                        entry[field] = None
+                    else:
+                        entry[field] = int(value) if field == 'lap' else float(value)
+                driver_positions[driver] = entry
+
             # Always add first entry at 0:00:00, even if no driver positions (to ensure race starts at 0)
             # For subsequent entries, only add if we have driver positions
             if sample_count == 0 or driver_positions:
-                # Calculate relative time from race start (for display as 00:00:00)
-                # Always set first entry to exactly timedelta(0) to ensure it starts at 0:00:00
-                if sample_count == 0:
-                    relative_time = timedelta(0)
-                else:
-                    relative_time = current_time - start_time
-                
-                # Format time consistently: convert to total seconds and format as H:MM:SS
-                # This ensures all times use the same format (no "days" prefix inconsistency)
-                total_seconds = int(relative_time.total_seconds())
-                hours = total_seconds // 3600
-                minutes = (total_seconds % 3600) // 60
-                seconds = total_seconds % 60
-                time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
-                
-                telemetry_data.append({
-                    'time': time_str,
-                    'drivers': driver_positions if driver_positions else {}
-                })
-                first_entry_added = True
-                
+                time_str = _format_duration(sample_count * SAMPLE_INTERVAL_SECONDS)
                 # Debug: log first few entries
                 if sample_count < 3:
                     print(f"  Entry {sample_count}: time='{time_str}', drivers={len(driver_positions)}")
-            
-            current_time += interval
-            sample_count += 1
-        
-        # Calculate total duration for display
-        total_duration = end_time - start_time
-        # Format total duration consistently as H:MM:SS
-        total_seconds = int(total_duration.total_seconds())
-        total_hours = total_seconds // 3600
-        total_minutes = (total_seconds % 3600) // 60
-        total_secs = total_seconds % 60
-        total_duration_str = f"{total_hours}:{total_minutes:02d}:{total_secs:02d}"
-        
-        # Calculate track length from lap data
-        track_length = None
+                yield {
+                    'time': time_str,
+                    'drivers': driver_positions
+                }
+
+def _driver_info(laps, drivers):
+    """Driver names, teams and colors from the laps table"""
+    driver_info = {}
+
+    for driver in drivers:
         try:
-            # Get track length from the first driver's first lap
-            if len(drivers) > 0:
-                driver = drivers[0]
-                driver_laps = session.laps.pick_driver(driver)
-                if len(driver_laps) > 0:
-                    first_lap = driver_laps.iloc[0]
-                    # Try to get track length from lap distance
-                    if 'LapDistance' in first_lap:
-                        track_length = float(first_lap['LapDistance'])
-                    # Alternative: calculate from telemetry distance range in first lap
-                    elif len(driver_telemetry[driver]) > 0:
-                        first_lap_tel = driver_telemetry[driver][driver_telemetry[driver]['LapNumber'] == first_lap['LapNumber']]
-                        if len(first_lap_tel) > 0 and 'Distance' in first_lap_tel.columns:
-                            distances = first_lap_tel['Distance'].dropna()
-                            if len(distances) > 0:
-                                # Track length is the maximum distance in the first lap
-                                track_length = float(distances.max())
-        except Exception as e:
-            print(f"Could not calculate track length: {e}")
+            lap = _pick_driver(laps, driver).iloc[0]
+            driver_info[driver] = {
+                'name': lap['Driver'],
+                'team': lap['Team'],
+                'color': get_team_color(lap['Team'])
+            }
+        except Exception:
+            driver_info[driver] = {
+                'name': f'Driver {driver}',
+                'team': 'Unknown',
+                'color': '#808080'
+            }
+    return driver_info
+
+def _track_length(laps, drivers, telemetry):
+    """Track length from the first driver's first lap, or None"""
+    track_length = None
+    try:
+        # Get track length from the first driver's first lap
+        if len(drivers) > 0:
+            driver = drivers[0]
+            driver_laps = _pick_driver(laps, driver)
+            if len(driver_laps) > 0:
+                first_lap = driver_laps.iloc[0]
+                # Try to get track length from lap distance
+                if 'LapDistance' in first_lap:
+                    track_length = float(first_lap['LapDistance'])
+                # Alternative: calculate from telemetry distance range in first lap
+                else:
+                    driver_tel = _load_driver_columns(telemetry, driver, ['LapNumber', 'Distance'])
+                    first_lap_tel = driver_tel[driver_tel['LapNumber'] == first_lap['LapNumber']]
+                    if len(first_lap_tel) > 0 and 'Distance' in first_lap_tel.columns:
+                        distances = first_lap_tel['Distance'].dropna()
+                        if len(distances) > 0:
+                            # Track length is the maximum distance in the first lap
+                            track_length = float(distances.max())
+    except Exception as e:
+        print(f"Could not calculate track length: {e}")
+    return track_length
+
+def _lap_summaries(laps, drivers):
+    """(total laps, lap times and tire compounds by driver and lap number)"""
+    import pandas as pd
+
+    # Get total number of laps (from the maximum lap number completed)
+    total_laps = 0
+    lap_times = {}  # Store lap times for fastest lap calculation
+    tire_compounds = {}  # Store tire compounds per driver per lap
+    try:
+        all_laps = laps
+        if all_laps is not None and len(all_laps) > 0:
+            total_laps = int(all_laps['LapNumber'].max())
         
-        # Get total number of laps (from the maximum lap number completed)
-        total_laps = 0
-        lap_times = {}  # Store lap times for fastest lap calculation
-        tire_compounds = {}  # Store tire compounds per driver per lap
-        try:
-            all_laps = session.laps
-            if len(all_laps) > 0:
-                total_laps = int(all_laps['LapNumber'].max())
-            
-            # Get lap times and tire compounds for each driver
-            for driver in drivers:
-                try:
-                    driver_laps = session.laps.pick_driver(driver)
-                    driver_lap_times = {}
-                    driver_tire_compounds = {}
-                    for _, lap in driver_laps.iterrows():
-                        lap_num = int(lap['LapNumber'])
-                        # Get lap time if available
-                        if 'LapTime' in lap and pd.notna(lap['LapTime']):
-                            lap_time = lap['LapTime']
-                            # Convert to total seconds
-                            if isinstance(lap_time, pd.Timedelta):
-                                lap_time_seconds = lap_time.total_seconds()
-                            else:
-                                lap_time_seconds = float(lap_time)
-                            driver_lap_times[lap_num] = lap_time_seconds
-                        
-                        # Get tire compound if available
-                        if 'Compound' in lap and pd.notna(lap['Compound']):
-                            compound = str(lap['Compound']).strip()
-                            if compound:
-                                driver_tire_compounds[lap_num] = compound
+        # Get lap times and tire compounds for each driver
+        for driver in drivers:
+            try:
+                driver_laps = _pick_driver(laps, driver)
+                driver_lap_times = {}
+                driver_tire_compounds = {}
+                for _, lap in driver_laps.iterrows():
+                    lap_num = int(lap['LapNumber'])
+                    # Get lap time if available
+                    if 'LapTime' in lap and pd.notna(lap['LapTime']):
+                        lap_time = lap['LapTime']
+                        # Convert to total seconds
+                        if isinstance(lap_time, pd.Timedelta):
+                            lap_time_seconds = lap_time.total_seconds()
+                        else:
+                            lap_time_seconds = float(lap_time)
+                        driver_lap_times[lap_num] = lap_time_seconds
                     
-                    if driver_lap_times:
-                        lap_times[driver] = driver_lap_times
-                    if driver_tire_compounds:
-                        tire_compounds[driver] = driver_tire_compounds
-                except Exception:
-                    continue
-        except Exception as e:
-            print(f"Could not calculate total laps or lap times: {e}")
-        
-        # Extract track status and race control messages
-        track_status_data = []
-        race_control_messages = []
-        
-        try:
-            # Get track status (SC, VSC, flags, etc.)
-            if hasattr(session, 'track_status') and session.track_status is not None:
-                track_status = session.track_status
-                if len(track_status) > 0:
-                    for _, row in track_status.iterrows():
-                        # Calculate relative time from race start
-                        status_time = row.get('Time', None)
-                        if status_time is not None and pd.notna(status_time):
-                            try:
-                                # Convert to relative time
-                                if isinstance(status_time, pd.Timestamp):
-                                    relative_time = status_time - start_time
-                                else:
-                                    relative_time = pd.to_timedelta(status_time) - start_time
+                    # Get tire compound if available
+                    if 'Compound' in lap and pd.notna(lap['Compound']):
+                        compound = str(lap['Compound']).strip()
+                        if compound:
+                            driver_tire_compounds[lap_num] = compound
+                
+                if driver_lap_times:
+                    lap_times[driver] = driver_lap_times
+                if driver_tire_compounds:
+                    tire_compounds[driver] = driver_tire_compounds
+            except Exception:
+                continue
+    except Exception as e:
+        print(f"Could not calculate total laps or lap times: {e}")
+    return total_laps, lap_times, tire_compounds
+
+def _relative_time(value, start_time, t0_date=None):
+    """A session time (Timedelta) or wall-clock time (Timestamp, needs t0_date) relative to race start"""
+    import pandas as pd
+
+    if isinstance(value, pd.Timestamp):
+        if t0_date is None:
+            raise ValueError("wall-clock time without the session's t0_date")
+        return value - pd.Timestamp(t0_date) - start_time
+    return pd.to_timedelta(value) - start_time
+
+def _session_events(track_status, rc_messages, start_time, t0_date=None):
+    """Track status changes and race control messages, timed relative to race start"""
+    import pandas as pd
+
+    # Extract track status and race control messages
+    track_status_data = []
+    race_control_messages = []
+    
+    try:
+        # Get track status (SC, VSC, flags, etc.)
+        if track_status is not None:
+            if len(track_status) > 0:
+                for _, row in track_status.iterrows():
+                    # Calculate relative time from race start
+                    status_time = row.get('Time', None)
+                    if status_time is not None and pd.notna(status_time):
+                        try:
+                            # Convert to relative time
+                            relative_time = _relative_time(status_time, start_time, t0_date)
+                            
+                            # Format time as H:MM:SS
+                            total_seconds = int(relative_time.total_seconds())
+                            if total_seconds >= 0:  # Only include times after race start
+                                hours = total_seconds // 3600
+                                minutes = (total_seconds % 3600) // 60
+                                seconds = total_seconds % 60
+                                time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
                                 
-                                # Format time as H:MM:SS
-                                total_seconds = int(relative_time.total_seconds())
-                                if total_seconds >= 0:  # Only include times after race start
-                                    hours = total_seconds // 3600
-                                    minutes = (total_seconds % 3600) // 60
-                                    seconds = total_seconds % 60
-                                    time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
-                                    
-                                    status_val = row.get('Status', '')
-                                    message = row.get('Message', '')
-                                    
-                                    track_status_data.append({
-                                        'time': time_str,
-                                        'status': str(status_val) if pd.notna(status_val) else '',
-                                        'message': str(message) if pd.notna(message) else ''
-                                    })
-                            except Exception:
-                                continue
-            
-            # Get race control messages
-            if hasattr(session, 'race_control_messages') and session.race_control_messages is not None:
-                rc_messages = session.race_control_messages
-                if len(rc_messages) > 0:
-                    for _, row in rc_messages.iterrows():
-                        # Calculate relative time from race start
-                        msg_time = row.get('Time', None)
-                        if msg_time is not None and pd.notna(msg_time):
-                            try:
-                                # Convert to relative time
-                                if isinstance(msg_time, pd.Timestamp):
-                                    relative_time = msg_time - start_time
-                                else:
-                                    relative_time = pd.to_timedelta(msg_time) - start_time
+                                status_val = row.get('Status', '')
+                                message = row.get('Message', '')
                                 
-                                # Format time as H:MM:SS
-                                total_seconds = int(relative_time.total_seconds())
-                                if total_seconds >= 0:  # Only include times after race start
-                                    hours = total_seconds // 3600
-                                    minutes = (total_seconds % 3600) // 60
-                                    seconds = total_seconds % 60
-                                    time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
-                                    
-                                    category = row.get('Category', '')
-                                    message = row.get('Message', '')
-                                    
-                                    race_control_messages.append({
-                                        'time': time_str,
-                                        'category': str(category) if pd.notna(category) else '',
-                                        'message': str(message) if pd.notna(message) else ''
-                                    })
-                            except Exception:
-                                continue
-        except Exception as e:
-            print(f"Could not extract track status or race control messages: {e}")
-        
-        result = {
-            'year': year,
-            'gp': gp,
-            'session': session_type,
-            'drivers': driver_info,
-            'telemetry': telemetry_data,
-            'start_time': str(start_time),
-            'end_time': str(end_time),
-            'total_duration': total_duration_str,  # For display as total time (H:MM:SS format)
-            'track_length': track_length,  # Track length in meters
-            'total_laps': total_laps,  # Total number of laps in the race
-            'lap_times': lap_times,  # Lap times by driver and lap number
-            'tire_compounds': tire_compounds,  # Tire compounds by driver and lap number
-            'track_status': track_status_data,  # Track status changes (SC, VSC, flags)
-            'race_control_messages': race_control_messages  # Race control messages
-        }
+                                track_status_data.append({
+                                    'time': time_str,
+                                    'status': str(status_val) if pd.notna(status_val) else '',
+                                    'message': str(message) if pd.notna(message) else ''
+                                })
+                        except Exception:
+                            continue
         
-        # Save to cache for future use
-        save_to_cache(year, gp, session_type, result)
-        
-        return result
-    
+        # Get race control messages
+        if rc_messages is not None:
+            if len(rc_messages) > 0:
+                for _, row in rc_messages.iterrows():
+                    # Calculate relative time from race start
+                    msg_time = row.get('Time', None)
+                    if msg_time is not None and pd.notna(msg_time):
+                        try:
+                            # Convert to relative time
+                            relative_time = _relative_time(msg_time, start_time, t0_date)
+                            
+                            # Format time as H:MM:SS
+                            total_seconds = int(relative_time.total_seconds())
+                            if total_seconds >= 0:  # Only include times after race start
+                                hours = total_seconds // 3600
+                                minutes = (total_seconds % 3600) // 60
+                                seconds = total_seconds % 60
+                                time_str = f"{hours}:{minutes:02d}:{seconds:02d}"
+                                
+                                category = row.get('Category', '')
+                                message = row.get('Message', '')
+                                
+                                race_control_messages.append({
+                                    'time': time_str,
+                                    'category': str(category) if pd.notna(category) else '',
+                                    'message': str(message) if pd.notna(message) else ''
+                                })
+                        except Exception:
+                            continue
     except Exception as e:
-        raise Exception(f"Error fetching race data: {str(e)}")
+        print(f"Could not extract track status or race control messages: {e}")
+    return track_status_data, race_control_messages
+
+def build_race_meta(year, gp, session_type, drivers, laps, track_status, rc_messages,
+                    start_time, end_time, track_length, t0_date=None):
+    """Every race payload key except 'telemetry'"""
+    total_laps, lap_times, tire_compounds = _lap_summaries(laps, drivers)
+    track_status_data, race_control_messages = _session_events(track_status, rc_messages, start_time, t0_date)
+    return {
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'drivers': _driver_info(laps, drivers),
+        'start_time': str(start_time),
+        'end_time': str(end_time),
+        'total_duration': _format_duration((end_time - start_time).total_seconds()),  # For display as total time (H:MM:SS format)
+        'track_length': track_length,  # Track length in meters
+        'total_laps': total_laps,  # Total number of laps in the race
+        'lap_times': lap_times,  # Lap times by driver and lap number
+        'tire_compounds': tire_compounds,  # Tire compounds by driver and lap number
+        'track_status': track_status_data,  # Track status changes (SC, VSC, flags)
+        'race_control_messages': race_control_messages  # Race control messages
+    }
+
+def sample_race(source):
+    """
+    Resample every driver's telemetry onto the race's SAMPLE_INTERVAL_SECONDS
+    grid. Drivers are read one at a time into disk-backed arrays, so peak
+    memory is about one driver's telemetry regardless of race length.
+
+    Returns a dict with start_time and end_time (session times), drivers (in
+    array order), present (drivers x samples) and values (drivers x samples x
+    SAMPLED_FIELDS).
+    """
+    import numpy as np
+
+    telemetry = source['telemetry']
+    if len(telemetry) == 0:
+        raise Exception("No telemetry data available for any driver")
+
+    # Find common time range from each driver's extrema
+    start_time, end_time = _time_bounds(telemetry)
+    if start_time is None:
+        raise Exception("No valid time data found")
+
+    # Sample every SAMPLE_INTERVAL_SECONDS over the full race duration
+    max_samples = int((end_time - start_time).total_seconds() / SAMPLE_INTERVAL_SECONDS)
+    grid = sample_grid(start_time, 0, max_samples)
+
+    telemetry_drivers = list(telemetry)
+    present = _spill_array((len(telemetry_drivers), max_samples), bool)
+    values = _spill_array((len(telemetry_drivers), max_samples, len(SAMPLED_FIELDS)), np.float64)
+    for i, driver in enumerate(telemetry_drivers):
+        try:
+            present[i], values[i] = _sample_driver(_load_driver_columns(telemetry, driver, SAMPLE_COLUMNS), grid)
+        except Exception as e:
+            print(f"Could not sample telemetry for driver {driver}: {e}")
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'drivers': telemetry_drivers,
+        'present': present,
+        'values': values,
+    }
+
+def stream_race_data(year, gp, session_type, source, samples=None):
+    """
+    Build a race from extracted session data (see telemetry_store.load_store).
+
+    Returns (meta, frames): meta holds every payload key except 'telemetry',
+    frames lazily yields the telemetry frames in time order. samples are the
+    arrays from sample_race(), resampled here if not given.
+    """
+    samples = sample_race(source) if samples is None else samples
+    laps = source.get('laps')
+    drivers = source['meta']['drivers']
+    meta = build_race_meta(year, gp, session_type, drivers, laps, source.get('track_status'),
+                           source.get('race_control_messages'), samples['start_time'], samples['end_time'],
+                           _track_length(laps, drivers, source['telemetry']), source['meta'].get('t0_date'))
+    return meta, _iter_frames(samples['drivers'], samples['present'], samples['values'])
 
 def get_team_color(team_name):
     """Get team color based on team name"""
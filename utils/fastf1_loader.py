@@ -0,0 +1,34 @@
+"""
+Deferred FastF1 initialization.
+
+Importing fastf1 pulls in pandas, numpy, matplotlib helpers and more, which
+costs seconds and hundreds of MB. Workers that only serve cached data never
+need it, so it is imported (and its cache enabled) on first use instead of
+at module import time.
+"""
+
+import os
+import threading
+
+from .cache import FASTF1_CACHE_DIR
+
+_fastf1 = None
+_fastf1_lock = threading.Lock()
+
+def get_fastf1():
+    """Import fastf1 and enable its cache on first call; returns the module"""
+    global _fastf1
+    if _fastf1 is None:
+        with _fastf1_lock:
+            if _fastf1 is None:
+                import fastf1
+                os.makedirs(FASTF1_CACHE_DIR, exist_ok=True)
+                fastf1.Cache.enable_cache(FASTF1_CACHE_DIR)
+                _fastf1 = fastf1
+    return _fastf1
+
+def load_session(year, gp, session_type='R'):
+    """Get and load a FastF1 session"""
+    session = get_fastf1().get_session(year, gp, session_type)
+    session.load()
+    return session
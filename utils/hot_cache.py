@@ -0,0 +1,269 @@
+"""
+Pre-encoded response bodies for the hottest cached races.
+
+The production server (wsgi.py) calls preload_hot_races() in the master
+process before forking workers. Each race is stored as a single immutable
+bytes object of its JSON payload, so workers share those pages
+copy-on-write and serve them without re-serializing. Decoded dicts would
+not share well: touching every object updates its reference count and
+copies the page.
+
+Compact telemetry blobs (see telemetry_codec.py) are encoded on first
+request and kept next to the JSON artifact as {key}.f1tc.
+
+Each worker also prewarms the most popular races (see popularity.py) in a
+background thread after it starts, and again whenever a new Grand Prix
+appears in the race list: races are fetched from S3 or processed into the
+local tier, and encoded into memory while they fit in PREWARM_MEMORY_BUDGET.
+Requests are served meanwhile; nothing waits for the prewarm.
+
+Configure with environment variables:
+- PRELOAD_HOT_RACES: races encoded in the master before forking (defaults to 0)
+- PREWARM_RACES: popular races prewarmed by each worker (defaults to 0, disabled)
+- PREWARM_MEMORY_BUDGET: encoded bodies kept per worker (defaults to 256M)
+- PREWARM_CHECK_SECONDS: how often to look for new Grand Prix (defaults to 900)
+"""
+
+import os
+import json
+import time
+import threading
+
+from .cache import (
+    CACHE_DIR, atomic_write_bytes, get_cache_key, get_cache_path, discard_from_memory, parse_cache_key
+)
+from .catalog import record_artifact
+from .disk_budget import parse_size
+from .f1_data import get_available_races, get_race_data, get_race_stream, load_cached_race
+from .popularity import top_races
+from .telemetry_codec import encode_race as encode_compact_race
+from .track_maps import get_track_coordinates
+
+PRELOAD_HOT_RACES = int(os.getenv('PRELOAD_HOT_RACES', '0'))
+PREWARM_RACES = int(os.getenv('PREWARM_RACES', '0'))
+PREWARM_MEMORY_BUDGET = parse_size(os.getenv('PREWARM_MEMORY_BUDGET', '256M'))
+PREWARM_CHECK_SECONDS = int(os.getenv('PREWARM_CHECK_SECONDS', '900'))
+
+# Files in CACHE_DIR that are not race payloads
+NON_RACE_SESSIONS = ('track',)
+
+# cache key -> (local file mtime, encoded JSON body)
+_encoded = {}
+_encoded_lock = threading.Lock()
+
+# cache key -> (compact file mtime, compact blob)
+_compact = {}
+
+_prewarm_thread = None
+_prewarm_thread_lock = threading.Lock()
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def list_cached_races():
+    """Cached race keys as (year, gp, session_type), most recently accessed first"""
+    races = []
+    if not os.path.isdir(CACHE_DIR):
+        return races
+    for filename in os.listdir(CACHE_DIR):
+        if not filename.endswith('.json'):
+            continue
+        parsed = parse_cache_key(filename[:-len('.json')])
+        if not parsed or parsed[2] in NON_RACE_SESSIONS:
+            continue
+        try:
+            st = os.stat(os.path.join(CACHE_DIR, filename))
+        except OSError:
+            continue
+        races.append((max(st.st_atime, st.st_mtime), parsed))
+    races.sort(key=lambda item: item[0], reverse=True)
+    return [race for _, race in races]
+
+def encode_race(year, gp, session_type='R'):
+    """Load a cached race and keep its encoded JSON body. Returns the size or 0."""
+    data = load_cached_race(year, gp, session_type)
+    if data is None:
+        return 0
+    cache_key = get_cache_key(year, gp, session_type)
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    with _encoded_lock:
+        _encoded[cache_key] = (_get_mtime(get_cache_path(year, gp, session_type)), body)
+    # The decoded copy in the memory tier is no longer needed
+    discard_from_memory(cache_key)
+    return len(body)
+
+def hot_races(limit):
+    """Races to keep warm: the most popular first, then the most recently accessed cached races"""
+    races = []
+    for race in top_races(limit) + list_cached_races():
+        if len(races) >= limit:
+            break
+        if race not in races:
+            races.append(race)
+    return races
+
+def encoded_bytes():
+    """Total size of the encoded bodies held by this process"""
+    with _encoded_lock:
+        return sum(len(body) for _, body in _encoded.values())
+
+def preload_hot_races(limit=None):
+    """Encode the hottest cached races. Returns the number loaded."""
+    limit = PRELOAD_HOT_RACES if limit is None else limit
+    loaded = 0
+    total_bytes = 0
+    for year, gp, session_type in hot_races(max(limit, 0)):
+        if not os.path.exists(get_cache_path(year, gp, session_type)):
+            continue
+        try:
+            size = encode_race(year, gp, session_type)
+        except Exception as e:
+            print(f"Error preloading {year} {gp} {session_type}: {e}")
+            continue
+        if size:
+            loaded += 1
+            total_bytes += size
+    if loaded:
+        print(f"Preloaded {loaded} hot races ({total_bytes / 1024 / 1024:.1f} MB)")
+    return loaded
+
+def get_encoded_race(year, gp, session_type='R'):
+    """Return the pre-encoded JSON body for a race, or None if not preloaded"""
+    cache_key = get_cache_key(year, gp, session_type)
+    entry = _encoded.get(cache_key)
+    if entry is None:
+        return None
+    mtime, body = entry
+    if _get_mtime(get_cache_path(year, gp, session_type)) != mtime:
+        # Regenerated (or evicted) since preload; let the normal path reload it
+        with _encoded_lock:
+            _encoded.pop(cache_key, None)
+        return None
+    return body
+
+def get_compact_path(year, gp, session_type='R'):
+    """Get the file path of a race's compact telemetry blob"""
+    return os.path.join(CACHE_DIR, f"{get_cache_key(year, gp, session_type)}.f1tc")
+
+def get_compact_race(year, gp, session_type='R'):
+    """Return the compact telemetry blob for a race, encoding it on first use"""
+    cache_key = get_cache_key(year, gp, session_type)
+    compact_path = get_compact_path(year, gp, session_type)
+    compact_mtime = _get_mtime(compact_path)
+    json_mtime = _get_mtime(get_cache_path(year, gp, session_type))
+
+    # The blob is current if it was written after the JSON artifact it encodes
+    if compact_mtime is not None and (json_mtime is None or compact_mtime >= json_mtime):
+        entry = _compact.get(cache_key)
+        if entry is not None and entry[0] == compact_mtime:
+            return entry[1]
+        try:
+            with open(compact_path, 'rb') as f:
+                blob = f.read()
+            _compact[cache_key] = (compact_mtime, blob)
+            return blob
+        except OSError:
+            pass
+
+    blob = encode_compact_race(get_race_data(year, gp, session_type))
+    try:
+        atomic_write_bytes(compact_path, blob)
+        _compact[cache_key] = (_get_mtime(compact_path), blob)
+        record_artifact(year, gp, session_type, 'compact', compact_path)
+    except Exception as e:
+        print(f"Error saving compact telemetry: {e}")
+    return blob
+
+def prewarm_race(year, gp, session_type='R', memory_budget=None):
+    """
+    Make sure a race is in the local tier (fetching it from S3 or processing it
+    if needed) along with its track, then encode it into memory if it fits in
+    memory_budget. Returns True if the race is held encoded in memory.
+    """
+    memory_budget = PREWARM_MEMORY_BUDGET if memory_budget is None else memory_budget
+    cache_path = get_cache_path(year, gp, session_type)
+    _, frames = get_race_stream(year, gp, session_type)
+    close = getattr(frames, 'close', None)
+    if close:
+        close()
+    try:
+        get_track_coordinates(year, gp)
+    except Exception as e:
+        print(f"Error prewarming track for {year} {gp}: {e}")
+
+    entry = _encoded.get(get_cache_key(year, gp, session_type))
+    if entry is not None and entry[0] == _get_mtime(cache_path):
+        return True
+    # The artifact file is about the size of its encoded body
+    try:
+        size = os.path.getsize(cache_path)
+    except OSError:
+        return False
+    if encoded_bytes() + size > memory_budget:
+        return False
+    return encode_race(year, gp, session_type) > 0
+
+def prewarm_races(limit=None, memory_budget=None, first=()):
+    """Prewarm the races in first, then the most popular ones. Returns the number held in memory."""
+    limit = PREWARM_RACES if limit is None else limit
+    races = list(first)
+    for race in hot_races(max(limit, 0)):
+        if race not in races:
+            races.append(race)
+
+    in_memory = 0
+    for year, gp, session_type in races:
+        try:
+            if prewarm_race(year, gp, session_type, memory_budget):
+                in_memory += 1
+        except Exception as e:
+            print(f"Error prewarming {year} {gp} {session_type}: {e}")
+    if races:
+        print(f"Prewarmed {len(races)} races ({in_memory} in memory, "
+              f"{encoded_bytes() / 1024 / 1024:.1f} MB encoded)")
+    return in_memory
+
+def _race_list_keys():
+    try:
+        return {(race['year'], race['gp']) for race in get_available_races()}
+    except Exception as e:
+        print(f"Error checking race list: {e}")
+        return None
+
+def start_background_prewarm(limit=None, interval=None):
+    """
+    Prewarm popular races in a background thread, then keep checking the race
+    list and prewarm each new Grand Prix as soon as it appears. No-op when
+    PREWARM_RACES is 0. Call it in each serving process (after forking).
+    """
+    global _prewarm_thread
+    limit = PREWARM_RACES if limit is None else limit
+    interval = PREWARM_CHECK_SECONDS if interval is None else interval
+    if limit <= 0:
+        return None
+
+    with _prewarm_thread_lock:
+        if _prewarm_thread is not None and _prewarm_thread.is_alive():
+            return _prewarm_thread
+
+        def run():
+            known = _race_list_keys()
+            prewarm_races(limit)
+            while True:
+                time.sleep(interval)
+                current = _race_list_keys()
+                if current is None:
+                    continue
+                if known is not None:
+                    new = sorted(current - known)
+                    if new:
+                        print(f"New races available: {', '.join(f'{year} {gp}' for year, gp in new)}")
+                        prewarm_races(limit, first=[(year, gp, 'R') for year, gp in new])
+                known = current
+
+        _prewarm_thread = threading.Thread(target=run, name='prewarm', daemon=True)
+        _prewarm_thread.start()
+        return _prewarm_thread
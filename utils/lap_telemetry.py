@@ -0,0 +1,158 @@
+"""
+Full-rate telemetry of single laps, with the channels the race frames drop.
+
+The race payload keeps x, y, distance, speed and lap at one sample per
+second. Detailed views (throttle and brake traces, gear maps, ...) instead
+open one driver's lap at a time and get every sample FastF1 recorded for it,
+read from the session's telemetry store.
+
+A lap is extracted on first request and kept as a compressed .npz, one array
+per channel in the narrowest dtype that holds it, under
+DATA_CACHE_DIR/laps/{year}_{gp}_{session}/{driver}/{lap}.npz. Later requests
+read only the channels they ask for. Files older than the store are rebuilt.
+The race payload is not affected: views pay only for the laps they open.
+"""
+
+import io
+import os
+
+from .cache import CACHE_DIR, atomic_write_bytes, cache_key_lock, get_cache_key, touch_access
+from .telemetry_store import driver_numbers, get_store_mtime, load_store
+
+LAP_DIR = os.path.join(CACHE_DIR, 'laps')
+
+# Channel -> (store column, stored dtype, decimals in responses)
+CHANNELS = {
+    'time': ('Time', 'float32', 3),
+    'distance': ('Distance', 'float32', 1),
+    'speed': ('Speed', 'float32', 1),
+    'throttle': ('Throttle', 'float32', 1),
+    'brake': ('Brake', 'uint8', None),
+    'gear': ('nGear', 'int8', None),
+    'rpm': ('RPM', 'float32', 0),
+    'drs': ('DRS', 'uint8', None),
+    'x': ('X', 'float32', 1),
+    'y': ('Y', 'float32', 1),
+    'z': ('Z', 'float32', 1),
+}
+
+DEFAULT_CHANNELS = ('time', 'distance', 'speed', 'throttle', 'brake', 'gear', 'rpm', 'drs')
+
+# Session seconds of the lap's first sample, kept next to the channels
+_START = 'session_time'
+
+def parse_channels(value):
+    """Parse a comma-separated channel list (default channels when empty)"""
+    channels = [name for name in (value or '').split(',') if name] or list(DEFAULT_CHANNELS)
+    unknown = [name for name in channels if name not in CHANNELS]
+    if unknown:
+        raise ValueError(f"Unknown channel: {', '.join(unknown)}")
+    return channels
+
+def get_lap_path(year, gp, session_type, driver, lap):
+    """Get the file path of one driver's cached lap"""
+    return os.path.join(LAP_DIR, get_cache_key(year, gp, session_type), str(driver), f"{int(lap)}.npz")
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _extract_lap(store, driver, lap):
+    """Every channel of one lap from the store as arrays, or None if the lap has no telemetry"""
+    import numpy as np
+
+    columns = ['SessionTime', 'LapNumber'] + [column for column, _, _ in CHANNELS.values()]
+    tel = store['telemetry'].load(driver, columns=columns)
+    tel = tel[(tel['LapNumber'] == lap) & tel['SessionTime'].notna()].sort_values('SessionTime')
+    if len(tel) == 0:
+        return None
+
+    session_time = tel['SessionTime'].dt.total_seconds().to_numpy()
+    arrays = {_START: np.array(session_time[0])}
+    for name, (column, dtype, _) in CHANNELS.items():
+        if column == 'Time' and column not in tel.columns:
+            values = session_time - session_time[0]
+        elif column == 'Time':
+            values = (tel[column] - tel[column].iloc[0]).dt.total_seconds().to_numpy()
+        elif column in tel.columns:
+            values = tel[column].to_numpy(dtype=float, na_value=np.nan)
+        else:
+            continue
+        if np.dtype(dtype).kind != 'f':
+            values = np.nan_to_num(values)
+        arrays[name] = values.astype(dtype)
+    return arrays
+
+def _write_lap(path, arrays):
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write_bytes(path, buffer.getvalue())
+
+def _read_lap(path, channels):
+    """(session time, {channel: array}) for the channels in the cached file, or None"""
+    import numpy as np
+
+    try:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in channels if name in data.files}
+            start = float(data[_START])
+    except (OSError, ValueError, KeyError):
+        return None
+    touch_access(path)
+    return start, arrays
+
+def get_lap_telemetry(year, gp, session_type, driver, lap, channels=DEFAULT_CHANNELS):
+    """
+    One driver's lap (number or code) at full rate, as {'session_time' (seconds
+    of the first sample), 'samples', 'channels': {name: [values]}}. Channels
+    the session did not record are left out. Returns None without a store or
+    telemetry for the lap; raises KeyError for an unknown driver.
+    """
+    import numpy as np
+
+    numbers = driver_numbers(year, gp, session_type)
+    store_mtime = get_store_mtime(year, gp, session_type)
+    if numbers is None or store_mtime is None:
+        return None
+    number = numbers.get(str(driver).upper())
+    if number is None:
+        raise KeyError(f"No telemetry for driver {driver}")
+
+    path = get_lap_path(year, gp, session_type, number, lap)
+    mtime = _get_mtime(path)
+    if mtime is None or mtime < store_mtime:
+        with cache_key_lock(f"{get_cache_key(year, gp, session_type)}_laps"):
+            mtime = _get_mtime(path)
+            if mtime is None or mtime < store_mtime:
+                store = load_store(year, gp, session_type)
+                arrays = _extract_lap(store, number, lap) if store is not None else None
+                if arrays is None:
+                    return None
+                _write_lap(path, arrays)
+
+    result = _read_lap(path, channels)
+    if result is None:
+        return None
+    start, arrays = result
+    values = {}
+    for name in channels:
+        if name not in arrays:
+            continue
+        decimals = CHANNELS[name][2]
+        column = np.round(arrays[name].astype(float), decimals) if decimals is not None else arrays[name]
+        values[name] = [None if v != v else v for v in column.tolist()]
+    return {
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'driver': number,
+        'lap': int(lap),
+        'session_time': round(start, 3),
+        'samples': len(next(iter(arrays.values()))) if arrays else 0,
+        'channels': values,
+    }
@@ -0,0 +1,494 @@
+"""
+Incremental processing for sessions that are still running.
+
+A runner (run_live.py) polls a feed every few seconds and calls
+update_live_session(), which appends the telemetry frames that became final
+since the last checkpoint and refreshes the metadata (laps, track status,
+messages). A frame at time t is final once the feed covers
+t + SAMPLE_TOLERANCE_SECONDS, so the frames are exactly those the full
+pipeline produces for the same data.
+
+Live artifact, one directory per session under DATA_CACHE_DIR/live:
+
+    {year}_{gp}_{session}/
+        frames.ndjson      one telemetry frame per line, append-only
+        frames.idx         byte offset of each line (little-endian int64)
+        checkpoint.json    payload metadata and counters, replaced atomically
+                           after every append
+
+Readers only trust what checkpoint.json records, so a crash mid-append is
+harmless: the next update truncates both files back to the checkpoint.
+Once the feed reports the session finished, finalize_live_session() writes
+the regular race artifact and its event index, so /api/race, /events,
+/state and /battles serve it like any other race.
+
+A feed provides:
+    refresh()                       fetch whatever is new (called once per poll)
+    drivers(), telemetry_drivers()  every driver / drivers with telemetry
+    available_until()               session time (pd.Timedelta) covered so far
+    finished()                      no more data will arrive
+    telemetry(driver, since, until, columns)
+                                    rows with since < SessionTime <= until
+    table(name, until)              laps / track_status / race_control_messages
+                                    rows known at session time until
+    t0_date                         wall-clock time of session time zero, used
+                                    to place race control messages
+
+ReplayFeed replays a recorded session (a telemetry store) at accelerated
+speed, for rehearsals and offline testing. LiveTimingFeed follows a FastF1
+live timing recording that is still being written.
+"""
+
+import os
+import abc
+import json
+import time
+import shutil
+import struct
+from datetime import datetime
+
+from .cache import CACHE_DIR, atomic_write_json, cache_key_lock, get_cache_key, save_race_stream_to_cache, touch_access
+from .f1_data import (
+    SAMPLE_BLOCK, SAMPLE_COLUMNS, SAMPLE_INTERVAL_SECONDS, SAMPLE_TOLERANCE_SECONDS, SAMPLED_FIELDS,
+    _iter_frames, _sample_driver, _save_event_index, _track_length, build_race_meta, sample_grid
+)
+from .race_stream import parse_time
+from .season_laps import record_session_laps
+from .telemetry_store import SESSION_TABLES, extract_driver_telemetry, load_store
+
+LIVE_DIR = os.path.join(CACHE_DIR, 'live')
+CHECKPOINT_FORMAT = 1
+
+_OFFSET = struct.Struct('<q')
+
+def get_live_path(year, gp, session_type='R'):
+    """Get the directory holding a session's live artifact"""
+    return os.path.join(LIVE_DIR, get_cache_key(year, gp, session_type))
+
+def load_checkpoint(year, gp, session_type='R'):
+    """The last checkpoint of a live session, or None"""
+    try:
+        with open(os.path.join(get_live_path(year, gp, session_type), 'checkpoint.json'), 'r') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('format') == CHECKPOINT_FORMAT else None
+
+class SessionFeed(abc.ABC):
+    """Feed over session data held in memory; subclasses decide how much of it is available"""
+
+    def __init__(self, drivers, telemetry, tables, t0_date=None):
+        import pandas as pd
+
+        self._drivers = list(drivers)
+        self._telemetry = telemetry
+        self._tables = tables
+        self._t0 = pd.Timestamp(t0_date) if t0_date else None
+
+    @property
+    def t0_date(self):
+        """Wall-clock time of session time zero (pd.Timestamp), or None if unknown"""
+        return self._t0
+
+    def refresh(self):
+        pass
+
+    def drivers(self):
+        return self._drivers
+
+    def telemetry_drivers(self):
+        return list(self._telemetry)
+
+    @abc.abstractmethod
+    def available_until(self):
+        """Session time (pd.Timedelta) covered so far"""
+
+    @abc.abstractmethod
+    def finished(self):
+        """True once no more data will arrive"""
+
+    def telemetry(self, driver, since, until, columns):
+        tel = self._telemetry.get(driver)
+        if tel is None:
+            return None
+        times = tel['SessionTime']
+        mask = times <= until
+        if since is not None:
+            mask &= times > since
+        return tel.loc[mask, [c for c in columns if c in tel.columns]]
+
+    def table(self, name, until):
+        import pandas as pd
+
+        table = self._tables.get(name)
+        if table is None or self.finished():
+            return table
+        if 'Time' not in table.columns:
+            return table.iloc[:0]
+        times = table['Time']
+        if pd.api.types.is_datetime64_any_dtype(times):
+            # Race control messages carry wall-clock times
+            if self._t0 is None:
+                return table.iloc[:0]
+            times = times - self._t0
+        return table[times <= until]
+
+class ReplayFeed(SessionFeed):
+    """Replays a recorded session from its telemetry store, speed times faster than real time"""
+
+    def __init__(self, year, gp, session_type='R', speed=1.0, start_offset=0.0, resume=True, clock=time.monotonic):
+        import pandas as pd
+
+        store = load_store(year, gp, session_type)
+        if store is None:
+            raise ValueError(f"No telemetry store for {year} {gp} {session_type}")
+        telemetry = {}
+        for driver in store['telemetry']:
+            tel = store['telemetry'].load(driver, columns=SAMPLE_COLUMNS)
+            telemetry[driver] = tel[tel['SessionTime'].notna()]
+        super().__init__(store['meta']['drivers'], telemetry,
+                         {name: store[name] for name in SESSION_TABLES}, store['meta'].get('t0_date'))
+
+        times = [tel['SessionTime'] for tel in telemetry.values() if len(tel)]
+        self.origin = min(t.min() for t in times)
+        self.last = max(t.max() for t in times)
+        self.speed = speed
+        self.start_offset = pd.Timedelta(seconds=start_offset)
+        # Pick up where an earlier run's checkpoint left off
+        checkpoint = load_checkpoint(year, gp, session_type) if resume else None
+        if checkpoint and checkpoint.get('available_until') is not None:
+            self.start_offset = max(self.start_offset, pd.Timedelta(checkpoint['available_until']) - self.origin)
+        self.clock = clock
+        self.started = clock()
+
+    def available_until(self):
+        import pandas as pd
+
+        elapsed = pd.Timedelta(seconds=(self.clock() - self.started) * self.speed)
+        return min(self.origin + self.start_offset + elapsed, self.last)
+
+    def finished(self):
+        return self.available_until() >= self.last
+
+class LiveTimingFeed(SessionFeed):
+    """
+    Follows a FastF1 live timing recording (`python -m fastf1.livetiming save FILE`)
+    that is still being written. Each refresh reloads the session from the
+    recording, so poll every 30 seconds or more. The last lag_seconds are held
+    back because late-arriving data may still fill them in.
+    """
+
+    def __init__(self, year, gp, session_type, livedata_path, lag_seconds=10.0):
+        super().__init__([], {}, {})
+        self.year = year
+        self.gp = gp
+        self.session_type = session_type
+        self.livedata_path = livedata_path
+        self.lag_seconds = lag_seconds
+        self._until = None
+        self._finished = False
+
+    def refresh(self):
+        import pandas as pd
+        from fastf1.livetiming.data import LiveTimingData
+        from .fastf1_loader import get_fastf1
+        from .telemetry_store import _session_t0_date, _session_tables
+
+        session = get_fastf1().get_session(self.year, self.gp, self.session_type)
+        session.load(livedata=LiveTimingData(self.livedata_path))
+
+        telemetry = {}
+        for driver in session.drivers:
+            try:
+                tel = extract_driver_telemetry(session, driver)
+            except Exception:
+                continue
+            if tel is not None:
+                telemetry[str(driver)] = tel[[c for c in SAMPLE_COLUMNS if c in tel.columns]]
+        super().__init__(session.drivers, telemetry, _session_tables(session), _session_t0_date(session))
+
+        status = getattr(session, 'session_status', None)
+        self._finished = status is not None and len(status) > 0 and \
+            status['Status'].isin(['Finished', 'Finalised', 'Ends']).any()
+        latest = [tel['SessionTime'].max() for tel in telemetry.values() if len(tel)]
+        if latest:
+            lag = pd.Timedelta(0) if self._finished else pd.Timedelta(seconds=self.lag_seconds)
+            self._until = max(latest) - lag
+
+    def available_until(self):
+        import pandas as pd
+        return self._until if self._until is not None else pd.Timedelta(0)
+
+    def finished(self):
+        return self._finished
+
+class _FeedTelemetry:
+    """Adapter so f1_data helpers can read a driver's telemetry from a feed"""
+
+    def __init__(self, feed, until):
+        self.feed = feed
+        self.until = until
+
+    def load(self, driver, columns=None):
+        return self.feed.telemetry(driver, None, self.until, columns or SAMPLE_COLUMNS)
+
+def _truncate_to_checkpoint(live_path, checkpoint):
+    """Drop anything appended after the last checkpoint (e.g. by a crashed update)"""
+    for name, size in (('frames.ndjson', checkpoint['frames_bytes']),
+                       ('frames.idx', checkpoint['frames'] * _OFFSET.size)):
+        path = os.path.join(live_path, name)
+        with open(path, 'ab') as f:
+            if f.tell() != size:
+                f.truncate(size)
+
+def _append_frames(live_path, checkpoint, frames):
+    """Append frames to frames.ndjson and their offsets to frames.idx, then fsync both"""
+    offset = checkpoint['frames_bytes']
+    count = 0
+    with open(os.path.join(live_path, 'frames.ndjson'), 'ab') as data, \
+            open(os.path.join(live_path, 'frames.idx'), 'ab') as index:
+        for frame in frames:
+            line = (json.dumps(frame, separators=(',', ':')) + '\n').encode('utf-8')
+            data.write(line)
+            index.write(_OFFSET.pack(offset))
+            offset += len(line)
+            count += 1
+        for f in (data, index):
+            f.flush()
+            os.fsync(f.fileno())
+    checkpoint['frames'] += count
+    checkpoint['frames_bytes'] = offset
+    return count
+
+def _time_extrema(feed, drivers, since, until):
+    """Earliest and latest SessionTime in (since, until] over all drivers"""
+    first = last = None
+    for driver in drivers:
+        tel = feed.telemetry(driver, since, until, ['SessionTime'])
+        if tel is None or len(tel) == 0:
+            continue
+        times = tel['SessionTime'].dropna()
+        if len(times) == 0:
+            continue
+        first = times.min() if first is None else min(first, times.min())
+        last = times.max() if last is None else max(last, times.max())
+    return first, last
+
+def update_live_session(year, gp, session_type, feed):
+    """
+    Process whatever the feed has made available since the last checkpoint.
+    Returns the number of frames appended.
+    """
+    import numpy as np
+    import pandas as pd
+
+    live_path = get_live_path(year, gp, session_type)
+    os.makedirs(live_path, exist_ok=True)
+    checkpoint = load_checkpoint(year, gp, session_type) or {
+        'format': CHECKPOINT_FORMAT, 'samples': 0, 'frames': 0, 'frames_bytes': 0,
+        'start_time': None, 'end_time': None, 'track_length': None, 'finished': False, 'meta': None
+    }
+    _truncate_to_checkpoint(live_path, checkpoint)
+
+    feed.refresh()
+    # Check finished first: if it is, available_until is the end of the session
+    finished = feed.finished()
+    until = feed.available_until()
+    drivers = [str(d) for d in feed.drivers()]
+    telemetry_drivers = feed.telemetry_drivers()
+
+    # Race start is fixed by the first data seen; the end grows with the feed
+    start_time = pd.Timedelta(checkpoint['start_time']) if checkpoint['start_time'] is not None else None
+    end_time = pd.Timedelta(checkpoint['end_time']) if checkpoint['end_time'] is not None else None
+    first, last = _time_extrema(feed, telemetry_drivers, end_time, until)
+    if start_time is None:
+        start_time = first
+    if last is not None:
+        end_time = last if end_time is None else max(end_time, last)
+    if start_time is None:
+        print(f"Live {year} {gp} {session_type}: no telemetry yet")
+        return 0
+
+    # Frames up to the current end are final once the feed covers their tolerance window
+    step = SAMPLE_INTERVAL_SECONDS
+    tolerance = pd.Timedelta(seconds=SAMPLE_TOLERANCE_SECONDS)
+    end_sample = int((end_time - start_time).total_seconds() / step)
+    if not finished:
+        ready = int(((until - tolerance) - start_time).total_seconds() // step) + 1
+        end_sample = min(end_sample, max(ready, 0))
+
+    appended = 0
+    for chunk_start in range(checkpoint['samples'], end_sample, SAMPLE_BLOCK):
+        chunk_end = min(chunk_start + SAMPLE_BLOCK, end_sample)
+        grid = sample_grid(start_time, chunk_start, chunk_end)
+        # Every row within the tolerance of the chunk's sample times
+        since = pd.Timedelta(int(grid[0]), unit='ns') - tolerance - pd.Timedelta(1, unit='ns')
+        upto = min(until, pd.Timedelta(int(grid[-1]), unit='ns') + tolerance)
+
+        present = np.zeros((len(telemetry_drivers), len(grid)), dtype=bool)
+        values = np.full((len(telemetry_drivers), len(grid), len(SAMPLE_COLUMNS) - 1), np.nan)
+        for i, driver in enumerate(telemetry_drivers):
+            tel = feed.telemetry(driver, since, upto, SAMPLE_COLUMNS)
+            if tel is not None and len(tel) > 0:
+                present[i], values[i] = _sample_driver(tel, grid)
+        appended += _append_frames(live_path, checkpoint,
+                                   _iter_frames(telemetry_drivers, present, values, first_sample=chunk_start))
+        checkpoint['samples'] = chunk_end
+
+    track_length = checkpoint['track_length']
+    if track_length is None or finished:
+        laps = feed.table('laps', until)
+        if laps is not None and len(laps) > 0:
+            track_length = _track_length(laps, drivers, _FeedTelemetry(feed, until))
+
+    meta = build_race_meta(year, gp, session_type, drivers, feed.table('laps', until),
+                           feed.table('track_status', until), feed.table('race_control_messages', until),
+                           start_time, end_time, track_length, feed.t0_date)
+    checkpoint.update({
+        'start_time': start_time.value,
+        'end_time': end_time.value,
+        'track_length': track_length,
+        'finished': finished and checkpoint['samples'] >= end_sample,
+        'available_until': until.value,
+        'session_time': (until - start_time).total_seconds(),
+        'updated_at': datetime.now().isoformat(),
+        'meta': meta,
+    })
+    atomic_write_json(os.path.join(live_path, 'checkpoint.json'), checkpoint)
+    return appended
+
+def _iter_frame_lines(path, offset, end):
+    """Yield frame lines (without newline) from byte offset up to end"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.rstrip(b'\n').decode('utf-8')
+
+def read_live_session(year, gp, session_type='R', since=0):
+    """
+    Current state of a live session: (metadata, frames from index since) where
+    metadata includes a 'live' entry with the total frame count and whether the
+    session has finished. Returns None if there is no live session.
+    """
+    checkpoint = load_checkpoint(year, gp, session_type)
+    if checkpoint is None or checkpoint.get('meta') is None:
+        return None
+    live_path = get_live_path(year, gp, session_type)
+    touch_access(os.path.join(live_path, 'checkpoint.json'))
+
+    total = checkpoint['frames']
+    since = min(max(since, 0), total)
+    offset = checkpoint['frames_bytes']
+    if since < total:
+        with open(os.path.join(live_path, 'frames.idx'), 'rb') as f:
+            f.seek(since * _OFFSET.size)
+            offset = _OFFSET.unpack(f.read(_OFFSET.size))[0]
+
+    meta = dict(checkpoint['meta'])
+    meta['live'] = {
+        'finished': checkpoint['finished'],
+        'frames': total,
+        'since': since,
+        'session_time': checkpoint.get('session_time'),
+        'updated_at': checkpoint.get('updated_at'),
+    }
+    frames = _iter_frame_lines(os.path.join(live_path, 'frames.ndjson'), offset, checkpoint['frames_bytes'])
+    return meta, frames
+
+def _samples_from_frames(frames_path, checkpoint, drivers):
+    """
+    Rebuild the per-driver sample arrays (see f1_data.sample_race) from the
+    final frames. Frames are keyed by their own time, so samples without any
+    driver (not written as frames) stay absent.
+    """
+    import numpy as np
+    import pandas as pd
+
+    fields = [field for field, _ in SAMPLED_FIELDS]
+    drivers = list(drivers)
+    rows = {driver: i for i, driver in enumerate(drivers)}
+    n_samples = checkpoint['samples']
+    present = np.zeros((len(drivers), n_samples), dtype=bool)
+    values = np.full((len(drivers), n_samples, len(fields)), np.nan)
+    for line in _iter_frame_lines(frames_path, 0, checkpoint['frames_bytes']):
+        frame = json.loads(line)
+        k = int(round(parse_time(frame['time']) / SAMPLE_INTERVAL_SECONDS))
+        if not 0 <= k < n_samples:
+            continue
+        for driver, entry in frame['drivers'].items():
+            i = rows.get(driver)
+            if i is None:
+                continue
+            present[i, k] = True
+            values[i, k] = [np.nan if entry.get(field) is None else entry[field] for field in fields]
+    return {
+        'start_time': pd.Timedelta(checkpoint['start_time']),
+        'drivers': drivers,
+        'present': present,
+        'values': values,
+    }
+
+def _save_live_event_index(year, gp, session_type, checkpoint, feed=None):
+    """
+    Build the event index of a finished live session from its frames. Pit
+    stops, tyres, flags and messages come from the feed's tables, so without
+    a feed the index has positions, overtakes and battles only.
+    """
+    frames_path = os.path.join(get_live_path(year, gp, session_type), 'frames.ndjson')
+    drivers = feed.telemetry_drivers() if feed is not None else checkpoint['meta'].get('drivers', {})
+    samples = _samples_from_frames(frames_path, checkpoint, [str(d) for d in drivers])
+    until = feed.available_until() if feed is not None else None
+    source = {
+        'meta': {'t0_date': feed.t0_date if feed is not None else None},
+        'laps': feed.table('laps', until) if feed is not None else None,
+        'track_status': feed.table('track_status', until) if feed is not None else None,
+        'race_control_messages': feed.table('race_control_messages', until) if feed is not None else None,
+    }
+    return _save_event_index(year, gp, session_type, source, samples, checkpoint['track_length'])
+
+def finalize_live_session(year, gp, session_type='R', feed=None):
+    """
+    Write a finished live session as the regular race artifact and its event
+    index (see _save_live_event_index). Returns True on success.
+    """
+    checkpoint = load_checkpoint(year, gp, session_type)
+    if checkpoint is None or not checkpoint.get('finished'):
+        return False
+    frames_path = os.path.join(get_live_path(year, gp, session_type), 'frames.ndjson')
+    frames = (json.loads(line) for line in _iter_frame_lines(frames_path, 0, checkpoint['frames_bytes']))
+    with cache_key_lock(get_cache_key(year, gp, session_type)):
+        if not save_race_stream_to_cache(year, gp, session_type, checkpoint['meta'], frames):
+            return False
+    record_session_laps(year, gp, session_type, meta=checkpoint['meta'])
+    with cache_key_lock(f"{get_cache_key(year, gp, session_type)}_events"):
+        if not _save_live_event_index(year, gp, session_type, checkpoint, feed):
+            print(f"Live {year} {gp} {session_type}: no event index written")
+    return True
+
+def remove_live_session(year, gp, session_type='R'):
+    """Delete a session's live artifact. Returns True if one was removed."""
+    live_path = get_live_path(year, gp, session_type)
+    if not os.path.isdir(live_path):
+        return False
+    shutil.rmtree(live_path, ignore_errors=True)
+    return not os.path.exists(live_path)
+
+def run_live_session(year, gp, session_type, feed, poll_seconds=5.0):
+    """Poll the feed until the session finishes, then write the race artifact"""
+    while True:
+        started = time.monotonic()
+        appended = update_live_session(year, gp, session_type, feed)
+        checkpoint = load_checkpoint(year, gp, session_type) or {}
+        print(f"Live {year} {gp} {session_type}: +{appended} frames "
+              f"({checkpoint.get('frames', 0)} total, session time {checkpoint.get('session_time') or 0:.0f}s)")
+        if checkpoint.get('finished'):
+            break
+        time.sleep(max(poll_seconds - (time.monotonic() - started), 0))
+
+    if finalize_live_session(year, gp, session_type, feed):
+        print(f"✓ Session finished; saved {year} {gp} {session_type} as a regular race")
+        return True
+    return False
@@ -0,0 +1,380 @@
+"""
+Server-pushed race playback for watch-along screens and low-power clients.
+
+GET /api/playback/<year>/<gp>/<session> opens a Server-Sent Events stream
+that pushes telemetry frames at the requested speed; POST
+/api/playback/<viewer> seeks, changes speed or pauses that stream without
+reconnecting.
+
+Viewers share work through channels. A channel plays one race at one speed
+from one epoch (the wall-clock time at which race time 0 is shown). A single
+thread per channel picks the current frame, formats its event once and hands
+the same string to every viewer on the channel. Epochs are rounded to the
+frame step, so viewers asking for the same race, offset and speed land on
+the same channel and the frame work is done once. Seeking or changing speed
+moves a viewer to the channel for its new epoch; paused viewers share a
+channel per frame.
+
+Sharing saves CPU, not threads. Under gthread workers every open stream still
+holds a server thread for as long as it is watched. Streams are therefore
+admitted through the 'playback' lane (see admission.py), sized from the
+worker's threads; further viewers get 503 with Retry-After instead of
+starving other requests. A stream that has reached the end of the race is
+closed after PLAYBACK_END_LINGER_SECONDS unless the viewer seeks back, so a
+finished viewer does not keep its slot.
+
+Playback state is kept in a small file per viewer under
+DATA_CACHE_DIR/.playback, so the control request may reach any worker
+process; the viewer's stream picks the change up within
+PLAYBACK_POLL_SECONDS.
+
+Configure with PLAYBACK_MAX_SPEED (defaults to 64) and PLAYBACK_MAX_RACES
+(races kept in memory for playback, defaults to 4).
+"""
+
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+from collections import OrderedDict, deque
+
+from .cache import CACHE_DIR, atomic_write_json, get_cache_key, get_cache_path
+from .f1_data import SAMPLE_INTERVAL_SECONDS, get_race_stream
+from .race_stream import frame_seconds
+
+PLAYBACK_DIR = os.path.join(CACHE_DIR, '.playback')
+PLAYBACK_MAX_SPEED = float(os.getenv('PLAYBACK_MAX_SPEED', '64'))
+PLAYBACK_MAX_RACES = int(os.getenv('PLAYBACK_MAX_RACES', '4'))
+
+# How often a stream checks its control file, and sends a comment to keep proxies from timing out
+PLAYBACK_POLL_SECONDS = 0.5
+PLAYBACK_KEEPALIVE_SECONDS = 15
+
+# A stream stays open this long after the 'end' event for the viewer to seek back
+PLAYBACK_END_LINGER_SECONDS = 30
+
+# Frames queued for a viewer that cannot keep up; older ones are dropped
+PLAYBACK_BUFFER_FRAMES = 32
+
+# State files of streams that stopped refreshing them (a crashed worker) are removed after this long
+PLAYBACK_STALE_SECONDS = 3600
+_last_cleanup = 0.0
+
+# cache key -> (artifact mtime, metadata, frame lines, frame times in seconds)
+_races = OrderedDict()
+_races_lock = threading.Lock()
+
+# channel key -> Channel
+_channels = {}
+_channels_lock = threading.Lock()
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def _is_end(event):
+    return event.startswith('event: end\n')
+
+def _frame_event(index, frame):
+    return f"id: {index}\nevent: frame\ndata: {frame}\n\n"
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _load_race(year, gp, session_type):
+    """
+    Metadata, frame lines and frame times of a race, shared by
+    every channel playing it. Samples without drivers have no frame, so frame
+    indexes and race times are mapped through the times (see frame_at).
+    """
+    cache_key = get_cache_key(year, gp, session_type)
+    mtime = _get_mtime(get_cache_path(year, gp, session_type))
+    with _races_lock:
+        race = _races.get(cache_key)
+        if race is not None and race[0] == mtime:
+            _races.move_to_end(cache_key)
+            return race[1], race[2], race[3]
+
+    meta, frames = get_race_stream(year, gp, session_type)
+    frames = list(frames)
+    times = [frame_seconds(frame) for frame in frames]
+    with _races_lock:
+        _races[cache_key] = (_get_mtime(get_cache_path(year, gp, session_type)), meta, frames, times)
+        _races.move_to_end(cache_key)
+        # Channels already playing an evicted race keep their own reference
+        while len(_races) > max(PLAYBACK_MAX_RACES, 1):
+            _races.popitem(last=False)
+    return meta, frames, times
+
+def frame_at(times, position):
+    """Index of the frame shown at race time position, or len(times) once past the last frame"""
+    if not times or position >= times[-1] + SAMPLE_INTERVAL_SECONDS:
+        return len(times)
+    return max(bisect.bisect_right(times, position) - 1, 0)
+
+def _state_path(viewer_id):
+    return os.path.join(PLAYBACK_DIR, f"{viewer_id}.json")
+
+def _load_state(viewer_id):
+    try:
+        with open(_state_path(viewer_id), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_state(state):
+    os.makedirs(PLAYBACK_DIR, exist_ok=True)
+    atomic_write_json(_state_path(state['viewer']), state)
+
+def _remove_state(viewer_id):
+    try:
+        os.remove(_state_path(viewer_id))
+    except OSError:
+        pass
+
+def _refresh_state(viewer_id):
+    """Mark a state file as in use; only the access time changes, so streams do not see a control change"""
+    path = _state_path(viewer_id)
+    try:
+        os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+    except OSError:
+        pass
+
+def remove_stale_states(max_age_seconds=PLAYBACK_STALE_SECONDS):
+    """Remove state files no open stream has refreshed recently. Returns the number removed."""
+    removed = 0
+    now = time.time()
+    try:
+        names = os.listdir(PLAYBACK_DIR)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(PLAYBACK_DIR, name)
+        try:
+            if now - os.stat(path).st_atime > max_age_seconds:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+def _check_speed(speed):
+    if not 0 < speed <= PLAYBACK_MAX_SPEED:
+        raise ValueError(f"speed must be greater than 0 and at most {PLAYBACK_MAX_SPEED:g}")
+    return float(speed)
+
+def position_at(state, now):
+    """Race time (seconds) a viewer is at"""
+    if state['paused']:
+        return state['position']
+    return state['position'] + (now - state['anchor']) * state['speed']
+
+def _public_state(state, now):
+    return {
+        'viewer': state['viewer'],
+        'speed': state['speed'],
+        'paused': state['paused'],
+        'position': round(position_at(state, now), 3),
+    }
+
+class Channel:
+    """Plays one race from one epoch at one speed to every subscribed viewer"""
+
+    def __init__(self, key, frames, times, speed, epoch, frame=0):
+        self.key = key
+        self.frames = frames
+        self.times = times
+        self.speed = speed
+        self.epoch = epoch
+        self.frame = frame
+        self.viewers = set()
+        self.last_event = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"playback-{key}", daemon=True)
+
+    def _publish(self, event):
+        self.last_event = event
+        with _channels_lock:
+            viewers = list(self.viewers)
+        for viewer in viewers:
+            viewer.push(event)
+
+    def _end(self):
+        self._publish(_event('end', {'frames': len(self.frames)}))
+
+    def _run(self):
+        if self.speed == 0:
+            # Paused: show the frame once
+            if self.frame < len(self.frames):
+                self._publish(_frame_event(self.frame, self.frames[self.frame]))
+            else:
+                self._end()
+            return
+
+        last = -1
+        while not self.stopped.is_set():
+            index = frame_at(self.times, (time.time() - self.epoch) * self.speed)
+            if index >= len(self.frames):
+                self._end()
+                return
+            if index > last:
+                # A late tick skips straight to the current frame
+                self._publish(_frame_event(index, self.frames[index]))
+                last = index
+            following = self.times[index + 1] if index + 1 < len(self.times) else self.times[-1] + SAMPLE_INTERVAL_SECONDS
+            self.stopped.wait(max(self.epoch + following / self.speed - time.time(), 0.001))
+
+class Viewer:
+    """One open playback stream: events queued for it by its channel"""
+
+    def __init__(self, viewer_id):
+        self.id = viewer_id
+        self.channel = None
+        self.events = deque(maxlen=PLAYBACK_BUFFER_FRAMES)
+        self.ready = threading.Event()
+
+    def push(self, event):
+        self.events.append(event)
+        self.ready.set()
+
+def _channel_for(cache_key, frames, times, state, now):
+    """Key and constructor arguments of the channel a viewer belongs on"""
+    position = max(position_at(state, now), 0.0)
+    if state['paused']:
+        frame = frame_at(times, position)
+        return (cache_key, 0, frame), (frames, times, 0, None, frame)
+    # Viewers whose epochs fall in the same frame step see the same frames at the same time
+    step = SAMPLE_INTERVAL_SECONDS / state['speed']
+    slot = round((now - position / state['speed']) / step)
+    return (cache_key, state['speed'], slot), (frames, times, state['speed'], slot * step)
+
+def _subscribe(viewer, cache_key, frames, times, state):
+    key, args = _channel_for(cache_key, frames, times, state, time.time())
+    with _channels_lock:
+        channel = _channels.get(key)
+        created = channel is None
+        if created:
+            channel = Channel(key, *args)
+            _channels[key] = channel
+        channel.viewers.add(viewer)
+        viewer.channel = channel
+        last_event = channel.last_event
+    if created:
+        channel.thread.start()
+    elif last_event is not None:
+        # Show the current frame right away instead of waiting for the next tick
+        viewer.push(last_event)
+
+def _unsubscribe(viewer):
+    channel = viewer.channel
+    if channel is None:
+        return
+    with _channels_lock:
+        channel.viewers.discard(viewer)
+        if not channel.viewers and _channels.get(channel.key) is channel:
+            del _channels[channel.key]
+            channel.stopped.set()
+    viewer.channel = None
+    viewer.events.clear()
+
+def channel_stats():
+    """Open channels and viewers in this process"""
+    with _channels_lock:
+        return {'channels': len(_channels), 'viewers': sum(len(c.viewers) for c in _channels.values())}
+
+def _iter_events(viewer_id, cache_key, meta, frames, times):
+    viewer = Viewer(viewer_id)
+    try:
+        state = _load_state(viewer_id)
+        playback = dict(_public_state(state, time.time()), frames=len(frames))
+        yield _event('meta', dict(meta, playback=playback))
+
+        _subscribe(viewer, cache_key, frames, times, state)
+        state_mtime = _get_mtime(_state_path(viewer_id))
+        last_sent = last_refresh = time.monotonic()
+        ended = None
+        while True:
+            viewer.ready.wait(PLAYBACK_POLL_SECONDS)
+            viewer.ready.clear()
+            while viewer.events:
+                event = viewer.events.popleft()
+                yield event
+                last_sent = time.monotonic()
+                ended = last_sent if _is_end(event) else None
+
+            # Seek / speed / pause requests may have been handled by another worker
+            mtime = _get_mtime(_state_path(viewer_id))
+            if mtime != state_mtime:
+                state_mtime = mtime
+                state = _load_state(viewer_id)
+                if state is None:
+                    return
+                _unsubscribe(viewer)
+                yield _event('state', _public_state(state, time.time()))
+                _subscribe(viewer, cache_key, frames, times, state)
+                last_sent = time.monotonic()
+                ended = None
+
+            if ended is not None and time.monotonic() - ended >= PLAYBACK_END_LINGER_SECONDS:
+                return
+
+            if time.monotonic() - last_sent >= PLAYBACK_KEEPALIVE_SECONDS:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            if time.monotonic() - last_refresh >= PLAYBACK_KEEPALIVE_SECONDS:
+                _refresh_state(viewer_id)
+                last_refresh = time.monotonic()
+    finally:
+        _unsubscribe(viewer)
+        _remove_state(viewer_id)
+
+def open_playback(year, gp, session_type='R', start=None, speed=1.0, last_event_id=None):
+    """
+    Start playing a race for a new viewer. Returns (viewer id, SSE event generator).
+    The first event is 'meta' (race metadata plus a 'playback' entry with the
+    viewer id), then 'frame' events (id = frame index), 'state' after every
+    control change and 'end' when the race is over; the stream closes
+    PLAYBACK_END_LINGER_SECONDS after 'end' unless the viewer seeks. Without start, a
+    last_event_id (frame index) resumes at the frame after it.
+    """
+    global _last_cleanup
+    speed = _check_speed(speed)
+    meta, frames, times = _load_race(year, gp, session_type)
+    if start is None and last_event_id is not None:
+        resume = last_event_id + 1
+        start = times[resume] if resume < len(times) else (times[-1] + SAMPLE_INTERVAL_SECONDS if times else 0.0)
+    if time.monotonic() - _last_cleanup > PLAYBACK_STALE_SECONDS / 4:
+        _last_cleanup = time.monotonic()
+        remove_stale_states()
+    viewer_id = uuid.uuid4().hex
+    _save_state({
+        'viewer': viewer_id,
+        'speed': speed,
+        'paused': False,
+        'position': max(start or 0.0, 0.0),
+        'anchor': time.time(),
+    })
+    return viewer_id, _iter_events(viewer_id, get_cache_key(year, gp, session_type), meta, frames, times)
+
+def control_playback(viewer_id, seek=None, speed=None, paused=None):
+    """
+    Seek (race seconds), change speed or pause/resume an open stream.
+    Returns the new state, or None if the viewer is unknown.
+    """
+    state = _load_state(viewer_id)
+    if state is None:
+        return None
+    now = time.time()
+    position = position_at(state, now) if seek is None else seek
+    if speed is not None:
+        state['speed'] = _check_speed(speed)
+    if paused is not None:
+        state['paused'] = bool(paused)
+    state['position'] = max(position, 0.0)
+    state['anchor'] = now
+    _save_state(state)
+    return _public_state(state, now)
@@ -0,0 +1,116 @@
+"""
+Per-race access frequency, persisted across restarts.
+
+Race requests call record_access(). Counts are buffered in memory and merged
+into DATA_CACHE_DIR/.popularity.json every POPULARITY_FLUSH_SECONDS (and at
+exit) under a file lock, so every worker on a node feeds one ranking. Scores
+decay with a half-life of POPULARITY_HALF_LIFE_DAYS, so a race that was
+popular last season gives way to this weekend's.
+
+hot_cache.py prewarms the top_races() after a restart.
+
+Configure with environment variables:
+- POPULARITY_FLUSH_SECONDS (optional, defaults to 60)
+- POPULARITY_HALF_LIFE_DAYS (optional, defaults to 7)
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from collections import Counter
+
+from .cache import CACHE_DIR, atomic_write_json, get_cache_key
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Hidden, so the disk budget sweep and manage_cache.py clear leave it alone
+POPULARITY_PATH = os.path.join(CACHE_DIR, '.popularity.json')
+FLUSH_SECONDS = int(os.getenv('POPULARITY_FLUSH_SECONDS', '60'))
+HALF_LIFE_SECONDS = float(os.getenv('POPULARITY_HALF_LIFE_DAYS', '7')) * 86400
+
+# cache key -> (year, gp, session_type) and accesses not yet written
+_pending = Counter()
+_races = {}
+_pending_lock = threading.Lock()
+
+# Flush thread of this process (restarted after a fork)
+_flush_thread = None
+_flush_pid = None
+
+def _decayed(score, since, now):
+    return score * 0.5 ** (max(now - since, 0) / HALF_LIFE_SECONDS)
+
+def _read():
+    try:
+        with open(POPULARITY_PATH, 'r') as f:
+            return json.load(f).get('races', {})
+    except (OSError, ValueError):
+        return {}
+
+def flush():
+    """Merge buffered accesses into the popularity file. Returns the number of races updated."""
+    with _pending_lock:
+        pending = dict(_pending)
+        races = dict(_races)
+        _pending.clear()
+    if not pending:
+        return 0
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    now = time.time()
+    try:
+        with open(os.path.join(CACHE_DIR, '.popularity.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            entries = _read()
+            for cache_key, count in pending.items():
+                year, gp, session_type = races[cache_key]
+                entry = entries.get(cache_key) or {'year': year, 'gp': gp, 'session': session_type,
+                                                   'score': 0.0, 'count': 0, 'updated': now}
+                entry['score'] = _decayed(entry['score'], entry['updated'], now) + count
+                entry['count'] += count
+                entry['updated'] = now
+                entries[cache_key] = entry
+            atomic_write_json(POPULARITY_PATH, {'races': entries})
+    except Exception as e:
+        # Keep the counts for the next flush
+        print(f"Error saving race popularity: {e}")
+        with _pending_lock:
+            _pending.update(pending)
+        return 0
+    return len(pending)
+
+def _start_flush_thread():
+    global _flush_thread, _flush_pid
+
+    def run():
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            flush()
+
+    _flush_pid = os.getpid()
+    _flush_thread = threading.Thread(target=run, name='popularity-flush', daemon=True)
+    _flush_thread.start()
+
+def record_access(year, gp, session_type='R'):
+    """Count one request for a race"""
+    cache_key = get_cache_key(year, gp, session_type)
+    with _pending_lock:
+        _pending[cache_key] += 1
+        _races[cache_key] = (year, gp, session_type)
+        # Workers are forked: start a flush thread in each process that records accesses
+        if _flush_pid != os.getpid():
+            _start_flush_thread()
+
+def top_races(limit=10):
+    """Most popular races as (year, gp, session_type), by decayed access count"""
+    now = time.time()
+    entries = sorted(_read().values(), key=lambda e: _decayed(e['score'], e['updated'], now), reverse=True)
+    return [(e['year'], e['gp'], e['session']) for e in entries[:max(limit, 0)]]
+
+atexit.register(flush)
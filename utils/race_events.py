@@ -0,0 +1,484 @@
+"""
+Typed, time-sorted index of race events.
+
+Built once while a race is processed, from the resampled telemetry arrays
+and the session tables, and saved as DATA_CACHE_DIR/events/{key}.json. Every
+event has 't' (seconds from race start, like the frame times) and 'type':
+
+    position   a driver's race position changed (driver, from, to)
+    overtake   an on-track pass (driver, passed, position); passes of or by a
+               car in the pit lane, or of a car that has stopped, are left out
+    pit_in     pit lane entry (driver, lap)
+    pit_out    pit lane exit (driver, lap)
+    status     track status change (status, message)
+    message    race control message (category, message, flag, driver)
+
+Positions come from race progress ((lap - 1) * track length + lap distance).
+Each pair of drivers only changes order once the new order has held for
+POSITION_HOLD_SECONDS, so lap-boundary glitches and side-by-side moments do
+not produce events.
+
+find_events() answers "next / previous event from time t" by binary search
+over per-type and per-driver time lists kept in memory.
+
+The index also keeps each driver's position, lap, tyre and pit lane state as
+change-point timelines (sorted times and the value from each time on), so
+race_state() rebuilds the whole race at any instant with one binary search
+per driver and value, without frames.
+
+Battles (cars running close together, see battles.py) are detected from the
+same arrays and kept in the index too.
+"""
+
+import os
+import json
+import bisect
+import heapq
+import threading
+from collections import OrderedDict
+
+from .battles import detect_battles
+from .cache import CACHE_DIR, atomic_write_json, get_cache_key, touch_access
+from .catalog import record_artifact
+
+EVENTS_DIR = os.path.join(CACHE_DIR, 'events')
+INDEX_FORMAT = 3
+
+EVENT_TYPES = ('position', 'overtake', 'pit_in', 'pit_out', 'status', 'message')
+
+# A new order between two cars must hold this long to count
+POSITION_HOLD_SECONDS = 3
+
+# Passes within this long after a pit exit are left out of overtakes
+PIT_EXIT_MARGIN_SECONDS = 10
+
+# Track status codes of a neutralized race (SC, red flag, VSC deployed and ending)
+NEUTRAL_STATUSES = ('4', '5', '6', '7')
+
+# Indexes kept prepared in memory
+EVENT_INDEX_MEMORY_ENTRIES = 16
+
+# cache key -> (index file mtime, prepared index)
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_index_path(year, gp, session_type='R'):
+    """Get the file path of a race's event index"""
+    return os.path.join(EVENTS_DIR, f"{get_cache_key(year, gp, session_type)}.json")
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _relative_seconds(times, start_time, t0_date):
+    """Seconds from race start for a column of session (timedelta) or wall-clock (datetime) times"""
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(times):
+        if t0_date is None:
+            return None
+        times = times - pd.Timestamp(t0_date)
+    return (pd.to_timedelta(times) - start_time).dt.total_seconds()
+
+def _ffill(values):
+    """Forward-fill NaNs along the sample axis"""
+    import numpy as np
+
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+def _debounce(ahead, hold):
+    """Suppress changes of a boolean series that last fewer than hold samples"""
+    import numpy as np
+
+    changes = np.flatnonzero(ahead[1:] != ahead[:-1]) + 1
+    if len(changes) == 0:
+        return ahead
+    result = ahead.copy()
+    bounds = np.concatenate(([0], changes, [len(ahead)]))
+    stable = ahead[0]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        value = ahead[start]
+        # A short run at the very end still counts: the race is over
+        if value != stable and (end - start >= hold or end == len(ahead)):
+            stable = value
+        result[start:end] = stable
+    return result
+
+def _race_positions(present, lap, distance, track_length, hold):
+    """
+    (positions, ahead) where positions[driver, sample] is the race position
+    and ahead maps each driver pair (i, j), i < j, to a boolean series that is
+    True while i is ahead of j, both debounced by hold samples
+    """
+    import numpy as np
+
+    n_drivers, n_samples = present.shape
+    progress = (lap - 1) * track_length + distance
+    progress[~present] = np.nan
+    # A car that stops keeps its last position on track
+    progress = _ffill(progress)
+    progress = np.where(np.isnan(progress), -np.inf, progress)
+
+    ahead = {}
+    behind_count = np.zeros((n_drivers, n_samples), dtype=np.int32)
+    for i in range(n_drivers):
+        for j in range(i + 1, n_drivers):
+            pair = _debounce(progress[i] > progress[j], hold)
+            ahead[(i, j)] = pair
+            behind_count[j] += pair
+            behind_count[i] += ~pair
+
+    # Cars that are not transitively ordered yet are split by progress
+    order = np.lexsort((-progress, behind_count), axis=0)
+    positions = np.empty((n_drivers, n_samples), dtype=np.int32)
+    np.put_along_axis(positions, order, np.arange(1, n_drivers + 1, dtype=np.int32)[:, None], axis=0)
+    return positions, ahead
+
+def _pit_events(laps, start_time):
+    """pit_in / pit_out events and each driver's pit lane intervals (seconds)"""
+    import numpy as np
+
+    events = []
+    windows = {}
+    if laps is None or 'DriverNumber' not in laps.columns:
+        return events, windows
+    for column, event_type in (('PitInTime', 'pit_in'), ('PitOutTime', 'pit_out')):
+        if column not in laps.columns:
+            continue
+        rows = laps[laps[column].notna()]
+        seconds = _relative_seconds(rows[column], start_time, None)
+        for driver, lap, t in zip(rows['DriverNumber'].astype(str), rows['LapNumber'], seconds):
+            if t >= 0:
+                events.append({'t': round(float(t), 3), 'type': event_type, 'driver': driver,
+                               'lap': int(lap) if not np.isnan(lap) else None})
+
+    for event in sorted(events, key=lambda e: e['t']):
+        intervals = windows.setdefault(event['driver'], [])
+        if event['type'] == 'pit_in':
+            intervals.append([event['t'], None])
+        elif intervals and intervals[-1][1] is None:
+            intervals[-1][1] = event['t']
+    return events, windows
+
+def _in_pit(windows, driver, t):
+    for entry, exit_ in windows.get(driver, []):
+        if entry <= t <= (exit_ if exit_ is not None else entry + 60) + PIT_EXIT_MARGIN_SECONDS:
+            return True
+    return False
+
+def _changes(times, values):
+    """Change points of a value series: ([times], [values]) where the value changes, NaNs skipped"""
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return [[], []]
+    values = values[valid]
+    keep = np.concatenate(([True], values[1:] != values[:-1]))
+    return [np.round(np.asarray(times)[valid][keep], 3).tolist(), values[keep].astype(int).tolist()]
+
+def _tyre_timeline(laps, driver, start_time):
+    """A driver's [compound, tyre age in laps] from the start of each lap"""
+    import numpy as np
+    import pandas as pd
+
+    if laps is None or 'LapStartTime' not in laps.columns or 'Compound' not in laps.columns:
+        return [[], []]
+    rows = laps[(laps['DriverNumber'].astype(str) == driver) & laps['LapStartTime'].notna()]
+    rows = rows.sort_values('LapNumber')
+    seconds = np.maximum(_relative_seconds(rows['LapStartTime'], start_time, None).to_numpy(), 0.0)
+    life = rows['TyreLife'] if 'TyreLife' in rows.columns else pd.Series(np.nan, index=rows.index)
+    times, values = [], []
+    for t, compound, age in zip(seconds, rows['Compound'], pd.to_numeric(life, errors='coerce')):
+        compound = str(compound).strip() if pd.notna(compound) else ''
+        if not compound:
+            continue
+        value = [compound, int(age) if pd.notna(age) else None]
+        if times and t <= times[-1]:
+            values[-1] = value
+        elif not values or values[-1] != value:
+            times.append(round(float(t), 3))
+            values.append(value)
+    return [times, values]
+
+def _pit_timeline(windows, driver):
+    """True from each pit lane entry, False from each exit"""
+    times, values = [], []
+    for entry, exit_ in windows.get(driver, []):
+        times.append(entry)
+        values.append(True)
+        if exit_ is not None:
+            times.append(exit_)
+            values.append(False)
+    return [times, values]
+
+def _timelines(drivers, present, lap, positions, interval, laps, pit_windows, start_time):
+    """Per-driver change-point timelines of position, lap, tyre and pit lane state"""
+    import numpy as np
+
+    times = np.arange(positions.shape[1]) * interval
+    lap = np.where(present, lap, np.nan)
+    timelines = {}
+    for i, driver in enumerate(drivers):
+        timelines[driver] = {
+            'position': _changes(times, positions[i]),
+            'lap': _changes(times, np.fmax.accumulate(lap[i])),
+            'tyre': _tyre_timeline(laps, driver, start_time),
+            'in_pit': _pit_timeline(pit_windows, driver),
+        }
+    return timelines
+
+def _pit_mask(drivers, windows, n_samples, interval):
+    """(drivers x samples) mask of samples spent in the pit lane"""
+    import numpy as np
+
+    mask = np.zeros((len(drivers), n_samples), dtype=bool)
+    for i, driver in enumerate(drivers):
+        for entry, exit_ in windows.get(driver, []):
+            last = exit_ if exit_ is not None else entry + 60
+            mask[i, int(entry // interval):int(last // interval) + 1] = True
+    return mask
+
+def _neutral_mask(events, n_samples, interval):
+    """Samples under SC, VSC or a red flag, from the status events"""
+    import numpy as np
+
+    mask = np.zeros(n_samples, dtype=bool)
+    statuses = [e for e in events if e['type'] == 'status']
+    for event, following in zip(statuses, statuses[1:] + [None]):
+        if event['status'] in NEUTRAL_STATUSES:
+            end = following['t'] if following else n_samples * interval
+            mask[int(event['t'] // interval):int(end // interval)] = True
+    return mask
+
+def _table_events(track_status, rc_messages, start_time, t0_date):
+    """status and message events from the session tables"""
+    import pandas as pd
+
+    def text(row, column):
+        value = row.get(column)
+        return str(value) if value is not None and pd.notna(value) else ''
+
+    events = []
+    for table, event_type in ((track_status, 'status'), (rc_messages, 'message')):
+        if table is None or len(table) == 0 or 'Time' not in table.columns:
+            continue
+        table = table[table['Time'].notna()]
+        seconds = _relative_seconds(table['Time'], start_time, t0_date)
+        if seconds is None:
+            continue
+        for t, (_, row) in zip(seconds, table.iterrows()):
+            if t < 0:
+                continue
+            if event_type == 'status':
+                event = {'status': text(row, 'Status'), 'message': text(row, 'Message')}
+            else:
+                event = {'category': text(row, 'Category'), 'message': text(row, 'Message'),
+                         'flag': text(row, 'Flag') or None, 'driver': text(row, 'RacingNumber') or None}
+            events.append(dict({'t': round(float(t), 3), 'type': event_type}, **event))
+    return events
+
+def build_event_index(drivers, present, lap, distance, track_length, interval, laps, track_status,
+                      rc_messages, start_time, t0_date=None, speed=None):
+    """
+    Build a race's event index. present, lap, distance and speed are (drivers
+    x samples) arrays on the race's sample grid (see f1_data.sample_race);
+    battles are only detected with speed.
+    """
+    import numpy as np
+
+    present = np.array(present, dtype=bool)
+    lap = np.array(lap, dtype=float)
+    distance = np.array(distance, dtype=float)
+    if not track_length:
+        track_length = float(np.nanmax(distance)) if np.any(~np.isnan(distance)) else 1.0
+
+    hold = max(int(round(POSITION_HOLD_SECONDS / interval)), 1)
+    positions, ahead = _race_positions(present, lap, distance, track_length, hold)
+    pit_events, pit_windows = _pit_events(laps, start_time)
+
+    events = []
+    changed_driver, changed_sample = np.nonzero(positions[:, 1:] != positions[:, :-1])
+    for i, k in zip(changed_driver, changed_sample + 1):
+        events.append({'t': round(float(k * interval), 3), 'type': 'position', 'driver': drivers[i],
+                       'from': int(positions[i, k - 1]), 'to': int(positions[i, k])})
+
+    for (i, j), pair in ahead.items():
+        for k in np.flatnonzero(pair[1:] != pair[:-1]) + 1:
+            driver, passed = (i, j) if pair[k] else (j, i)
+            t = float(k * interval)
+            if not present[passed, k] or not present[driver, k]:
+                continue
+            if _in_pit(pit_windows, drivers[driver], t) or _in_pit(pit_windows, drivers[passed], t):
+                continue
+            events.append({'t': round(t, 3), 'type': 'overtake', 'driver': drivers[driver],
+                           'passed': drivers[passed], 'position': int(positions[driver, k])})
+
+    events.extend(pit_events)
+    events.extend(_table_events(track_status, rc_messages, start_time, t0_date))
+    timelines = _timelines(drivers, present, lap, positions, interval, laps, pit_windows, start_time)
+
+    battles = []
+    if speed is not None:
+        n_samples = present.shape[1]
+        progress = np.where(present, (lap - 1) * track_length + distance, np.nan)
+        battles = detect_battles(drivers, progress, np.array(speed, dtype=float), positions, lap, interval,
+                                 track_length, _pit_mask(drivers, pit_windows, n_samples, interval),
+                                 _neutral_mask(events, n_samples, interval))
+    events.sort(key=lambda e: (e['t'], EVENT_TYPES.index(e['type'])))
+    return {
+        'format': INDEX_FORMAT,
+        'interval': interval,
+        'duration': round(positions.shape[1] * interval, 3),
+        'drivers': list(drivers),
+        'start_order': [drivers[i] for i in np.argsort(positions[:, 0], kind='stable')] if positions.shape[1] else [],
+        'events': events,
+        'timelines': timelines,
+        'battles': battles,
+    }
+
+def save_event_index(year, gp, session_type, index):
+    """Write a race's event index. Returns True on success."""
+    path = get_index_path(year, gp, session_type)
+    index = dict(index, year=year, gp=gp, session=session_type)
+    try:
+        os.makedirs(EVENTS_DIR, exist_ok=True)
+        atomic_write_json(path, index)
+    except Exception as e:
+        print(f"Error saving event index: {e}")
+        return False
+    record_artifact(year, gp, session_type, 'events', path)
+    return True
+
+def _prepare(index):
+    """Per-type and per-driver time lists for binary search"""
+    by_type = {}
+    by_driver = {}
+    for event in index['events']:
+        by_type.setdefault(event['type'], []).append(event)
+        for key in ('driver', 'passed'):
+            if event.get(key):
+                by_driver.setdefault(event[key], []).append(event)
+    index['by_type'] = {name: ([e['t'] for e in events], events) for name, events in by_type.items()}
+    index['by_driver'] = {name: ([e['t'] for e in events], events) for name, events in by_driver.items()}
+    index['battle_starts'] = [b['start'] for b in index['battles']]
+    return index
+
+def load_event_index(year, gp, session_type='R'):
+    """A race's prepared event index (shared, do not modify), or None if missing or outdated"""
+    cache_key = get_cache_key(year, gp, session_type)
+    path = get_index_path(year, gp, session_type)
+    mtime = _get_mtime(path)
+    if mtime is None:
+        return None
+    with _indexes_lock:
+        entry = _indexes.get(cache_key)
+        if entry is not None and entry[0] == mtime:
+            _indexes.move_to_end(cache_key)
+            return entry[1]
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading event index: {e}")
+        return None
+    if index.get('format') != INDEX_FORMAT:
+        return None
+    touch_access(path)
+    index = _prepare(index)
+    with _indexes_lock:
+        _indexes[cache_key] = (mtime, index)
+        _indexes.move_to_end(cache_key)
+        while len(_indexes) > EVENT_INDEX_MEMORY_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
+
+def _after(series, t, limit):
+    times, events = series
+    start = bisect.bisect_right(times, t)
+    return events[start:start + limit]
+
+def _before(series, t, limit):
+    times, events = series
+    end = bisect.bisect_left(times, t)
+    return events[max(end - limit, 0):end][::-1]
+
+def find_events(index, t, direction='next', types=None, driver=None, limit=1):
+    """
+    Up to limit events strictly after (direction='next') or before ('prev')
+    race time t, nearest first, optionally only some types and/or events
+    involving a driver.
+    """
+    if direction not in ('next', 'prev'):
+        raise ValueError("direction must be 'next' or 'prev'")
+    types = list(types or EVENT_TYPES)
+    unknown = [name for name in types if name not in EVENT_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown event type: {', '.join(unknown)}")
+    take = _after if direction == 'next' else _before
+
+    if driver is not None:
+        series = index['by_driver'].get(str(driver))
+        if series is None:
+            return []
+        # Scan outwards from t until enough events of the wanted types are found
+        count = max(limit, 16)
+        while True:
+            batch = take(series, t, count)
+            found = [e for e in batch if e['type'] in types]
+            if len(found) >= limit or len(batch) < count:
+                return found[:limit]
+            count *= 2
+
+    candidates = [take(index['by_type'][name], t, limit) for name in types if name in index['by_type']]
+    if direction == 'next':
+        merged = heapq.merge(*candidates, key=lambda e: e['t'])
+    else:
+        merged = heapq.merge(*candidates, key=lambda e: -e['t'])
+    return [event for _, event in zip(range(limit), merged)]
+
+def _value_at(series, t):
+    """The value of a change-point timeline at time t, or None before its first change"""
+    times, values = series
+    k = bisect.bisect_right(times, t) - 1
+    return values[k] if k >= 0 else None
+
+def _event_at(index, event_type, t):
+    """The last event of a type at or before t"""
+    series = index['by_type'].get(event_type)
+    return _value_at(series, t) if series else None
+
+def race_state(index, t):
+    """
+    The state of the race at race time t (clamped to the race): every
+    driver's position, lap, tyre and pit lane state, the running order, the
+    track status and the last race control message.
+    """
+    t = min(max(float(t), 0.0), index['duration'])
+    drivers = []
+    for driver in index['drivers']:
+        timeline = index['timelines'][driver]
+        tyre = _value_at(timeline['tyre'], t)
+        drivers.append({
+            'driver': driver,
+            'position': _value_at(timeline['position'], t),
+            'lap': _value_at(timeline['lap'], t),
+            'compound': tyre[0] if tyre else None,
+            'tyre_age': tyre[1] if tyre else None,
+            'in_pit': bool(_value_at(timeline['in_pit'], t)),
+        })
+    drivers.sort(key=lambda d: d['position'] if d['position'] is not None else len(drivers) + 1)
+    status = _event_at(index, 'status', t)
+    return {
+        't': t,
+        'order': [d['driver'] for d in drivers],
+        'drivers': drivers,
+        'track_status': {'t': status['t'], 'status': status['status'], 'message': status['message']} if status else None,
+        'last_message': _event_at(index, 'message', t),
+    }
@@ -0,0 +1,86 @@
+"""
+Streaming encodings of a race payload for HTTP responses.
+
+get_race_stream() yields telemetry frames as JSON text straight from the
+cache file; these generators wrap them as one JSON document or as NDJSON,
+optionally limited to a time window, in chunks of about CHUNK_SIZE bytes.
+Nothing here decodes the full payload, so memory per request stays small
+and the first bytes go out before the rest of the file has been read.
+"""
+
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+def parse_time(value):
+    """Parse a time parameter given as seconds or H:MM:SS. Returns seconds or None."""
+    if value is None or value == '':
+        return None
+    if ':' in value:
+        parts = [float(p) for p in value.split(':')]
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + part
+        return seconds
+    return float(value)
+
+def frame_seconds(frame_text):
+    """Race time of a frame in seconds, read from its leading "time" key"""
+    prefix = '{"time":"'
+    if frame_text.startswith(prefix):
+        end = frame_text.index('"', len(prefix))
+        return parse_time(frame_text[len(prefix):end])
+    return parse_time(json.loads(frame_text).get('time'))
+
+def window_frames(frames, start=None, end=None):
+    """Frames with start <= time <= end (seconds); stops reading after end"""
+    if start is None and end is None:
+        yield from frames
+        return
+    try:
+        for frame in frames:
+            seconds = frame_seconds(frame)
+            if start is not None and seconds < start:
+                continue
+            if end is not None and seconds > end:
+                break
+            yield frame
+    finally:
+        # Frames are in time order: release the cache file as soon as we are past the window
+        close = getattr(frames, 'close', None)
+        if close:
+            close()
+
+def _chunks(parts):
+    """Join small strings into CHUNK_SIZE-sized byte chunks"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+def iter_json(meta, frames):
+    """The race as one JSON document: metadata keys first, then the telemetry array"""
+    def parts():
+        head = json.dumps(meta, separators=(',', ':'))[:-1]
+        yield head + (',' if meta else '') + '"telemetry":['
+        first = True
+        for frame in frames:
+            yield frame if first else ',' + frame
+            first = False
+        yield ']}'
+    return _chunks(parts())
+
+def iter_ndjson(meta, frames):
+    """The race as NDJSON: the metadata object on the first line, then one frame per line"""
+    def parts():
+        yield json.dumps(meta, separators=(',', ':')) + '\n'
+        for frame in frames:
+            yield frame + '\n'
+    return _chunks(parts())
@@ -6,29 +6,64 @@ To use, set environment variables:
 - AWS_SECRET_ACCESS_KEY
 - S3_BUCKET_NAME (optional, defaults to 'f1-timing-cache')
 - AWS_REGION (optional, defaults to 'us-east-1')
+- S3_ENDPOINT_URL (optional, e.g. http://localhost:9000 for MinIO or a moto server)
+- S3_MAX_POOL_CONNECTIONS (optional, defaults to 20)
+
+Objects are stored as gzip-compressed compact JSON (Content-Encoding: gzip).
+Objects written by older versions (plain indented JSON) are still readable.
+Shared blobs (see blob_store.py) are stored under blobs/{hash}.json. They
+never change, so each is uploaded once and never revalidated.
 """
 
 import os
 import json
+import gzip
+import shutil
+import tempfile
+import threading
+import importlib.util
 from datetime import datetime, timedelta
 
-# Try to import boto3, but don't fail if not available
-try:
-    import boto3
-    from botocore.exceptions import ClientError
-    S3_AVAILABLE = True
-except ImportError:
-    S3_AVAILABLE = False
-    boto3 = None
+# boto3 is optional and slow to import; check for it without importing it.
+# It is only imported when the first S3 client is created.
+S3_AVAILABLE = importlib.util.find_spec('boto3') is not None
 
 S3_BUCKET = os.getenv('S3_BUCKET_NAME', 'f1-timing-cache')
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '20'))
+
+# boto3 clients are thread-safe and hold a urllib3 connection pool, so a single
+# client is shared by every request in the process instead of one per call
+_s3_client = None
+_s3_client_lock = threading.Lock()
 
 def get_s3_client():
-    """Get S3 client if available"""
+    """Get the shared S3 client if available (created once per process)"""
+    global _s3_client
     if not S3_AVAILABLE:
         return None
-    return boto3.client('s3', region_name=AWS_REGION)
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+                _s3_client = boto3.client(
+                    's3',
+                    region_name=AWS_REGION,
+                    endpoint_url=S3_ENDPOINT_URL,
+                    config=Config(
+                        max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                        retries={'max_attempts': 3, 'mode': 'standard'}
+                    )
+                )
+    return _s3_client
+
+def reset_s3_client():
+    """Drop the shared client (e.g. after fork or when switching endpoints in tests)"""
+    global _s3_client
+    with _s3_client_lock:
+        _s3_client = None
 
 def get_s3_key(year, gp, session_type='R', data_type='race'):
     """Generate S3 key for cached data"""
@@ -38,68 +73,189 @@ def get_s3_key(year, gp, session_type='R', data_type='race'):
         return f"tracks/{year}/{gp}.json"
     return None
 
-def load_from_s3(year, gp, session_type='R', data_type='race'):
-    """Load data from S3 cache"""
-    if not S3_AVAILABLE:
-        return None
-    
+def get_blob_s3_key(digest):
+    """Generate S3 key for a shared blob"""
+    return f"blobs/{digest}.json"
+
+def encode_cache_object(cache_data):
+    """Serialize a cache wrapper to gzip-compressed compact JSON"""
+    body = json.dumps(cache_data, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(body, compresslevel=6)
+
+def decode_cache_object(body, content_encoding=None):
+    """Deserialize an S3 object body (gzip or legacy plain JSON)"""
+    # Legacy objects were uploaded uncompressed; sniff the gzip magic as well
+    # in case an intermediary dropped the Content-Encoding header
+    if content_encoding == 'gzip' or body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    return json.loads(body.decode('utf-8'))
+
+def fetch_from_s3(year, gp, session_type='R', data_type='race', etag=None):
+    """
+    Fetch a cache wrapper from S3, optionally as a conditional GET.
+
+    Returns a tuple (status, cache_data, etag) where status is one of:
+    - 'hit': cache_data is the full wrapper and etag identifies the object
+    - 'not_modified': the object still matches the given etag (no body sent)
+    - 'miss': not found, expired, or S3 unavailable
+    """
     s3_client = get_s3_client()
     if not s3_client:
-        return None
-    
+        return 'miss', None, None
+    from botocore.exceptions import ClientError
+
+    key = get_s3_key(year, gp, session_type, data_type)
+    if not key:
+        return 'miss', None, None
+
     try:
-        key = get_s3_key(year, gp, session_type, data_type)
-        if not key:
-            return None
-        
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=key)
-        data = json.loads(response['Body'].read().decode('utf-8'))
-        
+        params = {'Bucket': S3_BUCKET, 'Key': key}
+        if etag:
+            params['IfNoneMatch'] = etag
+        response = s3_client.get_object(**params)
+        data = decode_cache_object(response['Body'].read(), response.get('ContentEncoding'))
+
         # Check if cache is still valid (30 days)
         cached_at = datetime.fromisoformat(data.get('cached_at', ''))
         if (datetime.now() - cached_at) < timedelta(days=30):
             print(f"Loaded {data_type} data from S3: {year} {gp}")
-            return data['data']
+            return 'hit', data, response.get('ETag')
     except ClientError as e:
-        if e.response['Error']['Code'] != 'NoSuchKey':
+        code = e.response.get('Error', {}).get('Code')
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if code == '304' or status == 304:
+            return 'not_modified', None, etag
+        if code not in ('NoSuchKey', '404'):
             print(f"Error loading from S3: {e}")
     except Exception as e:
         print(f"Error loading from S3: {e}")
-    
+
+    return 'miss', None, None
+
+def load_from_s3(year, gp, session_type='R', data_type='race'):
+    """Load data from S3 cache"""
+    status, cache_data, _ = fetch_from_s3(year, gp, session_type, data_type)
+    if status == 'hit':
+        return cache_data['data']
     return None
 
+def put_to_s3(year, gp, session_type, cache_data, data_type='race'):
+    """Upload a prepared cache wrapper to S3. Returns the new ETag or None."""
+    s3_client = get_s3_client()
+    if not s3_client:
+        return None
+
+    try:
+        key = get_s3_key(year, gp, session_type, data_type)
+        if not key:
+            return None
+
+        response = s3_client.put_object(
+            Bucket=S3_BUCKET,
+            Key=key,
+            Body=encode_cache_object(cache_data),
+            ContentType='application/json',
+            ContentEncoding='gzip'
+        )
+
+        print(f"Saved {data_type} data to S3: {year} {gp}")
+        return response.get('ETag')
+    except Exception as e:
+        print(f"Error saving to S3: {e}")
+        return None
+
+def put_file_to_s3(year, gp, session_type, fileobj, data_type='race'):
+    """
+    Upload a cache wrapper that is already serialized as JSON in a binary file
+    object. The body is gzipped through a spooled temp file so large artifacts
+    are never held in memory. Returns the new ETag or None.
+    """
+    s3_client = get_s3_client()
+    if not s3_client:
+        return None
+
+    try:
+        key = get_s3_key(year, gp, session_type, data_type)
+        if not key:
+            return None
+
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as body:
+            with gzip.GzipFile(fileobj=body, mode='wb', compresslevel=6) as gz:
+                shutil.copyfileobj(fileobj, gz, 1024 * 1024)
+            body.seek(0)
+            response = s3_client.put_object(
+                Bucket=S3_BUCKET,
+                Key=key,
+                Body=body,
+                ContentType='application/json',
+                ContentEncoding='gzip'
+            )
+
+        print(f"Saved {data_type} data to S3: {year} {gp}")
+        return response.get('ETag')
+    except Exception as e:
+        print(f"Error saving to S3: {e}")
+        return None
+
 def save_to_s3(year, gp, session_type, data, data_type='race'):
     """Save data to S3 cache"""
-    if not S3_AVAILABLE:
-        return False
-    
+    cache_data = {
+        'cached_at': datetime.now().isoformat(),
+        'year': year,
+        'gp': gp,
+        'session': session_type if data_type == 'race' else None,
+        'data': data
+    }
+    return put_to_s3(year, gp, session_type, cache_data, data_type) is not None
+
+def fetch_blob_from_s3(digest):
+    """Fetch a shared blob's JSON bytes from S3, or None"""
+    s3_client = get_s3_client()
+    if not s3_client:
+        return None
+    from botocore.exceptions import ClientError
+
+    try:
+        response = s3_client.get_object(Bucket=S3_BUCKET, Key=get_blob_s3_key(digest))
+        body = response['Body'].read()
+        if response.get('ContentEncoding') == 'gzip' or body[:2] == b'\x1f\x8b':
+            body = gzip.decompress(body)
+        return body
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            print(f"Error loading blob from S3: {e}")
+    except Exception as e:
+        print(f"Error loading blob from S3: {e}")
+    return None
+
+def put_blob_to_s3(digest, body):
+    """Upload a shared blob's JSON bytes unless S3 already has it. Returns True if S3 holds it."""
     s3_client = get_s3_client()
     if not s3_client:
         return False
-    
+    from botocore.exceptions import ClientError
+
+    key = get_blob_s3_key(digest)
     try:
-        key = get_s3_key(year, gp, session_type, data_type)
-        if not key:
+        s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404', 'NotFound'):
+            print(f"Error checking blob in S3: {e}")
             return False
-        
-        cache_data = {
-            'cached_at': datetime.now().isoformat(),
-            'year': year,
-            'gp': gp,
-            'session': session_type if data_type == 'race' else None,
-            'data': data
-        }
-        
+    except Exception as e:
+        print(f"Error checking blob in S3: {e}")
+        return False
+
+    try:
         s3_client.put_object(
             Bucket=S3_BUCKET,
             Key=key,
-            Body=json.dumps(cache_data, indent=2),
-            ContentType='application/json'
+            Body=gzip.compress(body, compresslevel=6),
+            ContentType='application/json',
+            ContentEncoding='gzip'
         )
-        
-        print(f"Saved {data_type} data to S3: {year} {gp}")
         return True
     except Exception as e:
-        print(f"Error saving to S3: {e}")
+        print(f"Error saving blob to S3: {e}")
         return False
-
@@ -0,0 +1,288 @@
+"""
+Season-wide lap table for cross-race analytics.
+
+Every processed session adds its laps to one columnar table per season,
+DATA_CACHE_DIR/.season/{year}_laps.parquet, with one row per driver lap:
+
+    event, session, driver, driver_number, team, lap, lap_time (seconds),
+    compound, tyre_life, stint, status
+
+status is 'green' for a representative lap, otherwise 'pit_in', 'pit_out',
+'deleted', 'neutralized' (SC, VSC or red flag during the lap) or
+'inaccurate'; laps added from a race artifact rather than a telemetry store
+have no status ('unknown').
+
+season_pace() and tyre_degradation() aggregate the table with vectorized
+group-bys instead of walking every race's lap_times, and the table is kept
+in memory per season until its file changes. The table is hidden from the
+disk budget sweep: races whose stores and artifacts are evicted stay in it.
+`python manage_cache.py season-laps --year 2025` rebuilds it from the stores
+and race artifacts already in the cache. Requires pyarrow.
+"""
+
+import io
+import os
+import threading
+
+from .cache import CACHE_DIR, atomic_write_bytes, cache_key_lock, open_race_stream
+from .telemetry_store import PARQUET_AVAILABLE, load_store
+
+SEASON_DIR = os.path.join(CACHE_DIR, '.season')
+
+COLUMNS = ['event', 'session', 'driver', 'driver_number', 'team', 'lap', 'lap_time',
+           'compound', 'tyre_life', 'stint', 'status']
+
+# Laps that count towards pace and degradation ('unknown' = no status recorded)
+CLEAN_STATUSES = ('green', 'unknown')
+
+# season -> (table file mtime, table)
+_tables = {}
+_tables_lock = threading.Lock()
+
+def get_table_path(year):
+    """Get the file path of a season's lap table"""
+    return os.path.join(SEASON_DIR, f"{year}_laps.parquet")
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _flag(laps, column, default):
+    """A boolean lap column; stores keep mixed bool/None columns as strings"""
+    import pandas as pd
+
+    if column not in laps.columns:
+        return pd.Series(default, index=laps.index)
+    values = laps[column]
+    if values.dtype == 'string' or values.dtype == object:
+        return values.astype('string').str.lower().map({'true': True, 'false': False}).fillna(default).astype(bool)
+    return values.fillna(default).astype(bool)
+
+def lap_rows(gp, session_type, laps):
+    """Season table rows for one session's laps table (FastF1 columns), or None"""
+    import numpy as np
+    import pandas as pd
+
+    if laps is None or len(laps) == 0 or 'LapNumber' not in laps.columns:
+        return None
+    laps = laps[laps['LapNumber'].notna()]
+
+    def column(name):
+        return laps[name] if name in laps.columns else pd.Series(None, index=laps.index, dtype=object)
+
+    track_status = column('TrackStatus').astype('string').fillna('')
+    status = np.select(
+        [
+            column('PitInTime').notna().to_numpy(),
+            column('PitOutTime').notna().to_numpy(),
+            _flag(laps, 'Deleted', False).to_numpy(),
+            track_status.str.contains('[4567]', regex=True).to_numpy(dtype=bool),
+            ~_flag(laps, 'IsAccurate', True).to_numpy(),
+        ],
+        ['pit_in', 'pit_out', 'deleted', 'neutralized', 'inaccurate'],
+        default='green',
+    )
+    return pd.DataFrame({
+        'event': gp,
+        'session': session_type,
+        'driver': column('Driver').astype('string'),
+        'driver_number': column('DriverNumber').astype('string'),
+        'team': column('Team').astype('string'),
+        'lap': laps['LapNumber'].astype('int16'),
+        'lap_time': pd.to_timedelta(column('LapTime')).dt.total_seconds(),
+        'compound': column('Compound').astype('string').str.strip().replace('', pd.NA),
+        'tyre_life': pd.to_numeric(column('TyreLife'), errors='coerce'),
+        'stint': pd.to_numeric(column('Stint'), errors='coerce'),
+        'status': status,
+    })[COLUMNS]
+
+def meta_rows(gp, session_type, meta):
+    """Season table rows from a race payload's metadata (lap_times / tire_compounds)"""
+    import pandas as pd
+
+    rows = []
+    compounds = meta.get('tire_compounds') or {}
+    for number, times in (meta.get('lap_times') or {}).items():
+        info = (meta.get('drivers') or {}).get(number, {})
+        for lap, lap_time in times.items():
+            rows.append((gp, session_type, info.get('name'), str(number), info.get('team'), int(lap),
+                         lap_time, compounds.get(number, {}).get(str(lap)), None, None, 'unknown'))
+    if not rows:
+        return None
+    table = pd.DataFrame(rows, columns=COLUMNS)
+    for name in ('driver', 'driver_number', 'team', 'compound'):
+        table[name] = table[name].astype('string')
+    table['lap'] = table['lap'].astype('int16')
+    table['lap_time'] = pd.to_numeric(table['lap_time'], errors='coerce')
+    table['tyre_life'] = table['tyre_life'].astype('float64')
+    table['stint'] = table['stint'].astype('float64')
+    return table
+
+def _read_table(path):
+    import pandas as pd
+
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return None
+
+def _write_table(path, table):
+    os.makedirs(SEASON_DIR, exist_ok=True)
+    buffer = io.BytesIO()
+    table.to_parquet(buffer, index=False)
+    atomic_write_bytes(path, buffer.getvalue())
+
+def record_session_laps(year, gp, session_type, laps=None, meta=None):
+    """
+    Replace one session's rows in its season table, from its laps table or,
+    without one, from its race metadata. Returns True on success.
+    """
+    if not PARQUET_AVAILABLE:
+        return False
+    import pandas as pd
+
+    path = get_table_path(year)
+    try:
+        rows = lap_rows(gp, session_type, laps)
+        if rows is None and meta is not None:
+            rows = meta_rows(gp, session_type, meta)
+        if rows is None:
+            return False
+        # Sessions of a season may be processed by several workers at once
+        with cache_key_lock(f"{year}_season_laps"):
+            table = _read_table(path)
+            if table is not None:
+                keep = ~((table['event'] == gp) & (table['session'] == session_type))
+                rows = pd.concat([table[keep], rows], ignore_index=True)
+            _write_table(path, rows)
+    except Exception as e:
+        print(f"Error updating season lap table: {e}")
+        return False
+    return True
+
+def load_season_laps(year):
+    """A season's lap table (shared, do not modify), or None if there is none"""
+    if not PARQUET_AVAILABLE:
+        return None
+    path = get_table_path(year)
+    mtime = _get_mtime(path)
+    with _tables_lock:
+        entry = _tables.get(year)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+    if mtime is None:
+        return None
+    table = _read_table(path)
+    if table is not None:
+        for name in ('event', 'session', 'driver', 'team', 'compound', 'status'):
+            table[name] = table[name].astype('category')
+    with _tables_lock:
+        _tables[year] = (mtime, table)
+    return table
+
+def rebuild_season_laps(year, races):
+    """
+    Rebuild a season's table from the cache for (gp, session_type) pairs:
+    from the telemetry store when there is one, else the race artifact.
+    Returns the number of sessions added.
+    """
+    import pandas as pd
+
+    tables = []
+    for gp, session_type in races:
+        store = load_store(year, gp, session_type)
+        rows = lap_rows(gp, session_type, store.get('laps')) if store is not None else None
+        if rows is None:
+            stream = open_race_stream(year, gp, session_type)
+            if stream is not None:
+                meta, frames = stream
+                frames.close()
+                rows = meta_rows(gp, session_type, meta)
+        if rows is not None:
+            tables.append(rows)
+    if not tables:
+        return 0
+    with cache_key_lock(f"{year}_season_laps"):
+        _write_table(get_table_path(year), pd.concat(tables, ignore_index=True))
+    return len(tables)
+
+def _clean_laps(table, session_type, driver=None, event=None, compound=None):
+    mask = (table['session'] == session_type) & table['status'].isin(CLEAN_STATUSES) & table['lap_time'].notna()
+    # Opening laps are slowed by the start
+    mask &= table['lap'] > 1
+    if driver:
+        mask &= (table['driver'] == driver) | (table['driver_number'] == driver)
+    if event:
+        mask &= table['event'] == event
+    if compound:
+        mask &= table['compound'] == compound
+    return table[mask]
+
+def _event_order(table, events):
+    """Sort key putting events in the given (season) order, unknown ones last by name"""
+    rank = {gp: i for i, gp in enumerate(events or [])}
+    return table['event'].astype(str).map(lambda gp: (rank.get(gp, len(rank)), gp))
+
+def season_pace(year, session_type='R', driver=None, events=None):
+    """
+    Median pace of every driver at every event of a season, over clean laps.
+    events gives the season order. Returns a list of dicts, or None without a table.
+    """
+    table = load_season_laps(year)
+    if table is None:
+        return None
+    laps = _clean_laps(table, session_type, driver=driver)
+    pace = (laps.groupby(['event', 'driver'], observed=True)
+                .agg(team=('team', 'first'), laps=('lap_time', 'size'), median=('lap_time', 'median'),
+                     best=('lap_time', 'min'), mean=('lap_time', 'mean'))
+                .reset_index())
+    pace['order'] = _event_order(pace, events)
+    pace = pace.sort_values(['order', 'median']).drop(columns='order')
+    for name in ('median', 'best', 'mean'):
+        pace[name] = pace[name].round(3)
+    return _records(pace)
+
+def tyre_degradation(year, session_type='R', compound=None, event=None, by_event=False, events=None):
+    """
+    Lap-time loss per lap of tyre age, by compound (and event with by_event).
+
+    The slope is fitted within each stint (lap times and tyre life centred on
+    the stint means), so differences in pace between drivers, cars and tracks
+    do not leak into it. No fuel correction is applied, so slopes understate
+    wear by the fuel burned per lap. Returns a list of dicts, or None without a table.
+    """
+    table = load_season_laps(year)
+    if table is None:
+        return None
+    laps = _clean_laps(table, session_type, event=event, compound=compound)
+    laps = laps[laps['compound'].notna() & laps['tyre_life'].notna()]
+    stint = laps.groupby(['event', 'driver', 'stint'], observed=True)
+    x = laps['tyre_life'] - stint['tyre_life'].transform('mean')
+    y = laps['lap_time'] - stint['lap_time'].transform('mean')
+
+    keys = ['event', 'compound'] if by_event else ['compound']
+    sums = (laps[keys].assign(xy=x * y, xx=x * x, lap_time=laps['lap_time'],
+                              stint_key=laps['event'].astype(str) + '/' + laps['driver'].astype(str)
+                              + '/' + laps['stint'].astype(str))
+                .groupby(keys, observed=True)
+                .agg(laps=('lap_time', 'size'), stints=('stint_key', 'nunique'), xy=('xy', 'sum'),
+                     xx=('xx', 'sum'), mean=('lap_time', 'mean'))
+                .reset_index())
+    sums = sums[sums['xx'] > 0]
+    sums['slope'] = (sums['xy'] / sums['xx']).round(4)
+    sums['mean'] = sums['mean'].round(3)
+    result = sums.drop(columns=['xy', 'xx'])
+    if by_event:
+        result['order'] = _event_order(result, events)
+        result = result.sort_values(['order', 'compound']).drop(columns='order')
+    return _records(result)
+
+def _records(frame):
+    """Plain JSON-serializable rows"""
+    import pandas as pd
+
+    frame = frame.astype(object).where(pd.notna(frame), None)
+    return [{k: (v.item() if hasattr(v, 'item') else v) for k, v in row.items()}
+            for row in frame.to_dict('records')]
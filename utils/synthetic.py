@@ -0,0 +1,240 @@
+"""
+Synthetic race data for offline benchmarks and load tests.
+
+Generates payloads with the same shape as get_race_data() and
+get_track_coordinates(), and writes them into the configured data cache
+(set DATA_CACHE_DIR before importing to target a scratch directory).
+make_session_store() writes a telemetry store instead, so the processing
+pipeline itself can be exercised. No network or FastF1 access is needed.
+"""
+
+import math
+import random
+
+from .cache import save_to_cache, save_track_to_cache
+from .catalog import add_event
+
+DRIVER_CODES = [
+    'VER', 'PER', 'HAM', 'RUS', 'LEC', 'SAI', 'NOR', 'PIA', 'ALO', 'STR',
+    'GAS', 'OCO', 'ALB', 'SAR', 'TSU', 'RIC', 'BOT', 'ZHO', 'MAG', 'HUL'
+]
+TEAMS = [
+    'Red Bull Racing', 'Mercedes', 'Ferrari', 'McLaren', 'Aston Martin',
+    'Alpine', 'Williams', 'AlphaTauri', 'Alfa Romeo', 'Haas'
+]
+DRIVER_NUMBERS = [
+    '1', '11', '44', '63', '16', '55', '4', '81', '14', '18',
+    '10', '31', '23', '2', '22', '3', '77', '24', '20', '27'
+]
+COMPOUNDS = ['SOFT', 'MEDIUM', 'HARD']
+
+def format_seconds(total_seconds):
+    """Format seconds as H:MM:SS (same format as the race pipeline)"""
+    total_seconds = int(total_seconds)
+    return f"{total_seconds // 3600}:{(total_seconds % 3600) // 60:02d}:{total_seconds % 60:02d}"
+
+def make_track_points(num_points=400, size=2000.0, seed=0):
+    """A closed, wobbly loop in track coordinates (metres)"""
+    rng = random.Random(seed)
+    harmonics = [(k, rng.uniform(0.02, 0.12), rng.uniform(0, 2 * math.pi)) for k in range(2, 6)]
+    points = []
+    for i in range(num_points):
+        angle = 2 * math.pi * i / num_points
+        radius = 1.0 + sum(a * math.sin(k * angle + p) for k, a, p in harmonics)
+        points.append({
+            'x': size * radius * math.cos(angle),
+            'y': 0.6 * size * radius * math.sin(angle)
+        })
+    return points
+
+def _point_at(points, fraction):
+    position = (fraction % 1.0) * len(points)
+    i = int(position)
+    t = position - i
+    a = points[i % len(points)]
+    b = points[(i + 1) % len(points)]
+    return a['x'] + (b['x'] - a['x']) * t, a['y'] + (b['y'] - a['y']) * t
+
+def make_race(year=2025, gp='Synthetic', session_type='R', num_drivers=20,
+              duration_seconds=5400, track_length=5000.0, seed=0):
+    """Build a race payload with the same structure as get_race_data()"""
+    rng = random.Random(seed)
+    points = make_track_points(seed=seed)
+    drivers = DRIVER_CODES[:num_drivers]
+    pace = {d: rng.uniform(58.0, 62.0) for d in drivers}  # mean speed in m/s
+    grid_offset = {d: -8.0 * i for i, d in enumerate(drivers)}
+
+    telemetry = []
+    progress = dict(grid_offset)
+    for second in range(duration_seconds):
+        frame = {}
+        for driver in drivers:
+            speed = pace[driver] * (0.75 + 0.5 * abs(math.sin(progress[driver] / 400.0)))
+            progress[driver] += speed
+            race_distance = max(progress[driver], 0.0)
+            x, y = _point_at(points, race_distance / track_length)
+            frame[driver] = {
+                'x': x,
+                'y': y,
+                'distance': race_distance % track_length,
+                'speed': speed * 3.6,
+                'lap': int(race_distance // track_length) + 1
+            }
+        telemetry.append({'time': format_seconds(second), 'drivers': frame})
+
+    total_laps = max(f['lap'] for f in telemetry[-1]['drivers'].values())
+    lap_times = {}
+    tire_compounds = {}
+    for driver in drivers:
+        lap_time = track_length / pace[driver]
+        lap_times[driver] = {lap: round(lap_time + rng.uniform(-1.5, 1.5), 3) for lap in range(1, total_laps + 1)}
+        stint_change = rng.randint(total_laps // 3, 2 * total_laps // 3)
+        opening, closing = rng.sample(COMPOUNDS, 2)
+        tire_compounds[driver] = {lap: opening if lap < stint_change else closing for lap in range(1, total_laps + 1)}
+
+    return {
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'drivers': {
+            d: {'name': d, 'team': TEAMS[i // 2 % len(TEAMS)], 'color': '#808080'}
+            for i, d in enumerate(drivers)
+        },
+        'telemetry': telemetry,
+        'start_time': '0 days 01:00:00',
+        'end_time': f"0 days {format_seconds(3600 + duration_seconds)}",
+        'total_duration': format_seconds(duration_seconds),
+        'track_length': track_length,
+        'total_laps': total_laps,
+        'lap_times': lap_times,
+        'tire_compounds': tire_compounds,
+        'track_status': [
+            {'time': format_seconds(0), 'status': '1', 'message': 'AllClear'},
+            {'time': format_seconds(duration_seconds // 3), 'status': '4', 'message': 'SCDeployed'},
+            {'time': format_seconds(duration_seconds // 3 + 240), 'status': '1', 'message': 'AllClear'}
+        ],
+        'race_control_messages': [
+            {'time': format_seconds(duration_seconds // 3), 'category': 'SafetyCar', 'message': 'SAFETY CAR DEPLOYED'},
+            {'time': format_seconds(duration_seconds // 3 + 230), 'category': 'SafetyCar', 'message': 'SAFETY CAR IN THIS LAP'}
+        ]
+    }
+
+def _simulate_session(num_drivers, duration_seconds, hz, seed):
+    """Simulate every driver's progress: (session seconds, race distance and speed in m/s per driver)"""
+    import numpy as np
+
+    rng = random.Random(seed)
+    pace = np.array([rng.uniform(58.0, 62.0) for _ in range(num_drivers)])
+    progress = np.array([-8.0 * i for i in range(num_drivers)])
+    steps = int(duration_seconds * hz)
+    distance = np.empty((steps, num_drivers))
+    speed = np.empty((steps, num_drivers))
+    for step in range(steps):
+        speed[step] = pace * (0.75 + 0.5 * np.abs(np.sin(progress / 400.0)))
+        progress = progress + speed[step] / hz
+        distance[step] = np.maximum(progress, 0.0)
+    return 3600.0 + np.arange(steps) / hz, distance, speed
+
+def make_session_store(year=2025, gp='Synthetic', session_type='R', num_drivers=20,
+                       duration_seconds=5400, track_length=5000.0, hz=4, seed=0):
+    """
+    Write a telemetry store (see telemetry_store.py) for a simulated session,
+    with FastF1-like per-driver telemetry at hz samples per second and a laps
+    table. Returns the store as load_store() would.
+    """
+    import numpy as np
+    import pandas as pd
+    from .telemetry_store import save_store
+
+    rng = random.Random(seed)
+    points = make_track_points(seed=seed)
+    track_x = np.array([p['x'] for p in points] + [points[0]['x']])
+    track_y = np.array([p['y'] for p in points] + [points[0]['y']])
+    track_fraction = np.linspace(0.0, 1.0, len(track_x))
+    drivers = DRIVER_NUMBERS[:num_drivers]
+
+    seconds, race_distance, speed = _simulate_session(num_drivers, duration_seconds, hz, seed)
+    session_time = pd.to_timedelta(seconds, unit='s')
+    lap_number = (race_distance // track_length).astype(int) + 1
+    sample_index = np.arange(len(seconds))
+
+    # Laps start wherever a driver's lap number changes
+    lap_rows = []
+    lap_start_index = {}
+    for i, driver in enumerate(drivers):
+        starts = np.flatnonzero(np.diff(lap_number[:, i], prepend=0))
+        lap_start_index[driver] = starts[np.searchsorted(starts, sample_index, 'right') - 1]
+        stint_change = rng.randint(len(starts) // 3, max(2 * len(starts) // 3, 1))
+        opening, closing = rng.sample(COMPOUNDS, 2)
+        for n, start in enumerate(starts):
+            lap_start = session_time[start]
+            lap_end = session_time[starts[n + 1]] if n + 1 < len(starts) else pd.NaT
+            stint = 1 if n < stint_change else 2
+            lap_rows.append({
+                'Driver': DRIVER_CODES[i],
+                'DriverNumber': driver,
+                'Team': TEAMS[i // 2 % len(TEAMS)],
+                'LapNumber': float(lap_number[start, i]),
+                'LapStartTime': lap_start,
+                'Time': lap_end,
+                'LapTime': lap_end - lap_start,
+                'Stint': float(stint),
+                'Compound': opening if stint == 1 else closing,
+                'TyreLife': float(n + 1 if stint == 1 else n + 1 - stint_change),
+                'PitInTime': lap_end if n + 1 == stint_change else pd.NaT,
+                'PitOutTime': lap_start if n == stint_change else pd.NaT,
+            })
+
+    def driver_frames():
+        for i, driver in enumerate(drivers):
+            lap_distance = race_distance[:, i] % track_length
+            kmh = speed[:, i] * 3.6
+            yield driver, pd.DataFrame({
+                'SessionTime': session_time,
+                'Time': session_time - session_time[lap_start_index[driver]],
+                'X': np.interp(lap_distance / track_length, track_fraction, track_x),
+                'Y': np.interp(lap_distance / track_length, track_fraction, track_y),
+                'Z': np.zeros(len(seconds)),
+                'Distance': lap_distance,
+                'Speed': kmh,
+                'RPM': 7000.0 + 50.0 * (kmh % 80.0),
+                'nGear': np.clip((kmh // 45).astype(int) + 1, 1, 8),
+                'Throttle': np.clip(kmh / 3.2, 0.0, 100.0),
+                'Brake': np.diff(kmh, prepend=kmh[0]) < -0.5,
+                'DRS': np.zeros(len(seconds), dtype=int),
+                'LapNumber': lap_number[:, i].astype(float),
+            })
+
+    event_time = 3600 + duration_seconds // 3
+    session_start = pd.Timestamp(f"{year}-01-01 13:00")
+    tables = {
+        'laps': pd.DataFrame(lap_rows),
+        'track_status': pd.DataFrame({
+            'Time': pd.to_timedelta([3600, event_time, event_time + 240], unit='s'),
+            'Status': ['1', '4', '1'],
+            'Message': ['AllClear', 'SCDeployed', 'AllClear'],
+        }),
+        'race_control_messages': pd.DataFrame({
+            'Time': session_start + pd.to_timedelta([event_time, event_time + 230], unit='s'),
+            'Category': ['SafetyCar', 'SafetyCar'],
+            'Message': ['SAFETY CAR DEPLOYED', 'SAFETY CAR IN THIS LAP'],
+        }),
+    }
+    return save_store(year, gp, session_type, drivers, driver_frames(), tables,
+                      date=str(session_start), t0_date=str(session_start))
+
+def make_track(seed=0):
+    """Build a track payload with the same structure as get_track_coordinates()"""
+    from .track_maps import normalize_coordinates
+    return normalize_coordinates(make_track_points(seed=seed))
+
+def populate_cache(num_races=4, year=2025, num_drivers=20, duration_seconds=5400):
+    """Write synthetic races and tracks into the data cache and register them in the catalog"""
+    races = []
+    for i in range(num_races):
+        gp = f"Synthetic {i + 1}"
+        save_to_cache(year, gp, 'R', make_race(year, gp, 'R', num_drivers, duration_seconds, seed=i))
+        save_track_to_cache(year, gp, make_track(seed=i))
+        add_event(year, gp)
+        races.append({'year': year, 'gp': gp, 'name': f"{gp} Grand Prix", 'date': None})
+    return races
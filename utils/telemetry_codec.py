@@ -0,0 +1,202 @@
+"""
+Compact binary encoding for race telemetry.
+
+The JSON payload repeats every key and sends full-precision floats for every
+driver every second. This codec quantizes each field to the resolution the
+UI needs, delta-encodes it per driver and per field, stores each column in
+the narrowest integer type that fits, and deflates the result.
+
+Layout (all integers little-endian):
+
+    magic      4 bytes   b'F1TC'
+    version    uint8     1
+    flags      uint8     bit 0: body is zlib-compressed
+    reserved   uint16
+    header_len uint32
+    header     JSON (utf-8), header_len bytes
+    body       column data, addressed by header['columns'][i]['offset']
+
+Header:
+    n_samples  number of telemetry frames
+    drivers    driver numbers, in column order
+    fields     {field: {'scale': s}}; stored value = round(value * scale)
+    columns    [{'driver', 'field', 'kind', 'dtype', 'offset', 'count', 'base'}]
+               columns[0] is the frame time in seconds since race start,
+               followed by each driver's columns
+               kind 'bitmap': np.packbits over n_samples ('present' field:
+               the driver has an entry in that frame; other fields: the
+               value is not null)
+               kind 'delta': count integers, the first is 0, the value at
+               position i is base + cumsum(deltas)[i], one per set bit of the
+               field's bitmap
+    meta       every other key of the race payload (drivers, lap_times, ...)
+
+decode_race() is the reference decoder; frontend/src/services/telemetryCodec.js
+implements the same format for the browser.
+"""
+
+import json
+import struct
+import zlib
+
+MAGIC = b'F1TC'
+VERSION = 1
+FLAG_ZLIB = 1
+MIME_TYPE = 'application/vnd.f1-timing.telemetry'
+
+# Quantization per field: 10 -> 0.1 units (10 cm for positions)
+FIELD_SCALES = {
+    'x': 10,
+    'y': 10,
+    'distance': 10,
+    'speed': 10,
+    'lap': 1,
+}
+
+_PREFIX = struct.Struct('<4sBBHI')
+_DTYPES = ('i1', 'i2', 'i4', 'i8')
+
+def _parse_time(text):
+    hours, minutes, seconds = text.split(':')
+    return int(hours) * 3600 + int(minutes) * 60 + int(float(seconds))
+
+def _format_time(total_seconds):
+    total_seconds = int(total_seconds)
+    return f"{total_seconds // 3600}:{(total_seconds % 3600) // 60:02d}:{total_seconds % 60:02d}"
+
+def _narrowest_dtype(np, values):
+    if len(values) == 0:
+        return 'i1'
+    low, high = int(values.min()), int(values.max())
+    for dtype in _DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'i8'
+
+def _delta_column(np, quantized):
+    """Split quantized values into (base, deltas) with deltas[0] == 0"""
+    if len(quantized) == 0:
+        return 0, quantized
+    deltas = np.diff(quantized, prepend=quantized[0])
+    return int(quantized[0]), deltas
+
+def encode_race(data, compress=True):
+    """Encode a race payload (as returned by get_race_data) into bytes"""
+    import numpy as np
+
+    telemetry = data.get('telemetry') or []
+    n_samples = len(telemetry)
+    drivers = sorted({d for frame in telemetry for d in frame.get('drivers', {})})
+
+    chunks = []
+    columns = []
+    offset = 0
+
+    def add_column(descriptor, array):
+        nonlocal offset
+        raw = np.ascontiguousarray(array, dtype='<' + descriptor['dtype']).tobytes()
+        descriptor['offset'] = offset
+        columns.append(descriptor)
+        chunks.append(raw)
+        offset += len(raw)
+
+    times = np.array([_parse_time(frame.get('time', '0:00:00')) for frame in telemetry], dtype=np.int64)
+    time_base, time_deltas = _delta_column(np, times)
+    time_column = {'field': 'time', 'kind': 'delta', 'dtype': _narrowest_dtype(np, time_deltas),
+                   'count': n_samples, 'base': time_base}
+    add_column(time_column, time_deltas)
+
+    for driver in drivers:
+        present = np.zeros(n_samples, dtype=bool)
+        values = {field: np.full(n_samples, np.nan) for field in FIELD_SCALES}
+        for i, frame in enumerate(telemetry):
+            entry = frame.get('drivers', {}).get(driver)
+            if entry is None:
+                continue
+            present[i] = True
+            for field in FIELD_SCALES:
+                value = entry.get(field)
+                if value is not None:
+                    values[field][i] = value
+
+        add_column({'driver': driver, 'field': 'present', 'kind': 'bitmap', 'dtype': 'u1',
+                    'count': n_samples, 'base': 0}, np.packbits(present))
+        for field, scale in FIELD_SCALES.items():
+            valid = ~np.isnan(values[field])
+            quantized = np.rint(values[field][valid] * scale).astype(np.int64)
+            base, deltas = _delta_column(np, quantized)
+            add_column({'driver': driver, 'field': field, 'kind': 'bitmap', 'dtype': 'u1',
+                        'count': n_samples, 'base': 0}, np.packbits(valid))
+            add_column({'driver': driver, 'field': field, 'kind': 'delta',
+                        'dtype': _narrowest_dtype(np, deltas), 'count': int(valid.sum()), 'base': base},
+                       deltas)
+
+    header = {
+        'n_samples': n_samples,
+        'drivers': drivers,
+        'fields': {field: {'scale': scale} for field, scale in FIELD_SCALES.items()},
+        'columns': columns,
+        'meta': {k: v for k, v in data.items() if k != 'telemetry'},
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    body = b''.join(chunks)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return _PREFIX.pack(MAGIC, VERSION, flags, 0, len(header_bytes)) + header_bytes + body
+
+def decode_race(blob):
+    """Reference decoder: rebuild the race payload (values rounded to the codec resolution)"""
+    import numpy as np
+
+    magic, version, flags, _, header_len = _PREFIX.unpack_from(blob, 0)
+    if magic != MAGIC:
+        raise ValueError("Not an F1TC telemetry blob")
+    if version != VERSION:
+        raise ValueError(f"Unsupported F1TC version: {version}")
+    start = _PREFIX.size
+    header = json.loads(blob[start:start + header_len].decode('utf-8'))
+    body = blob[start + header_len:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    n_samples = header['n_samples']
+    scales = {field: spec['scale'] for field, spec in header['fields'].items()}
+
+    def read(column):
+        if column['kind'] == 'bitmap':
+            raw = np.frombuffer(body, dtype=np.uint8, count=(column['count'] + 7) // 8, offset=column['offset'])
+            return np.unpackbits(raw, count=column['count']).astype(bool)
+        dtype = np.dtype(column['dtype']).newbyteorder('<')
+        deltas = np.frombuffer(body, dtype=dtype, count=column['count'], offset=column['offset'])
+        return column['base'] + np.cumsum(deltas, dtype=np.int64)
+
+    columns = header['columns']
+    times = read(columns[0])
+    frames = [{'time': _format_time(t), 'drivers': {}} for t in times]
+
+    # Columns per driver: present bitmap, then (bitmap, deltas) for each field
+    i = 1
+    while i < len(columns):
+        driver = columns[i]['driver']
+        present = read(columns[i])
+        i += 1
+        decoded = {}
+        while i < len(columns) and columns[i]['driver'] == driver:
+            field = columns[i]['field']
+            valid = read(columns[i])
+            values = read(columns[i + 1])
+            full = [None] * n_samples
+            scale = scales[field]
+            for index, value in zip(np.flatnonzero(valid), values):
+                full[index] = int(value) if scale == 1 else int(value) / scale
+            decoded[field] = full
+            i += 2
+        for index in np.flatnonzero(present):
+            frames[index]['drivers'][driver] = {field: decoded[field][index] for field in decoded}
+
+    result = dict(header['meta'])
+    result['telemetry'] = frames
+    return result
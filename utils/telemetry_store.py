@@ -0,0 +1,324 @@
+"""
+Persisted per-driver session telemetry.
+
+Loading a session from FastF1 and merging every lap's get_telemetry() is by
+far the slowest part of processing a race. The merged result is stored once
+per session as Parquet so that later stages (resampling, lap summaries,
+track status, ...) can be rebuilt from disk in seconds without FastF1 or
+the network.
+
+Layout, one directory per session under DATA_CACHE_DIR/telemetry:
+
+    {year}_{gp}_{session}/
+        meta.json                   format, drivers, telemetry drivers, event date,
+                                    t0_date (wall-clock time of SessionTime 0)
+        drivers/{number}.parquet    merged telemetry sorted by SessionTime
+                                    (every get_telemetry() column plus LapNumber)
+        laps.parquet                session.laps
+        track_status.parquet        session.track_status
+        race_control_messages.parquet
+
+A store is written into a hidden temp directory and renamed into place, so
+readers only ever see complete stores. Requires pyarrow; without it the
+pipeline keeps the extracted tables in memory for a single run instead.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import importlib.util
+from collections.abc import Mapping
+from datetime import datetime
+
+from .cache import CACHE_DIR, atomic_write_json, get_cache_key, pin_entry, touch_access
+from .catalog import forget_artifact, record_artifact
+
+STORE_DIR = os.path.join(CACHE_DIR, 'telemetry')
+STORE_FORMAT = 1
+
+# pyarrow is only needed when a store is read or written
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+# Session tables kept next to the per-driver telemetry
+SESSION_TABLES = ('laps', 'track_status', 'race_control_messages')
+
+# (store path, meta.json mtime) -> driver number by code and number
+_driver_numbers = {}
+_driver_numbers_lock = threading.Lock()
+
+def get_store_path(year, gp, session_type='R'):
+    """Get the directory holding a session's telemetry store"""
+    return os.path.join(STORE_DIR, get_cache_key(year, gp, session_type))
+
+def store_exists(year, gp, session_type='R'):
+    """Check whether a complete store exists for a session"""
+    return os.path.exists(os.path.join(get_store_path(year, gp, session_type), 'meta.json'))
+
+def _plain_frame(frame):
+    """Copy a FastF1 frame into a plain DataFrame Parquet can store"""
+    import pandas as pd
+
+    frame = pd.DataFrame(frame).reset_index(drop=True)
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            # Mixed str/None/NaN columns (e.g. DriverAhead) become nullable strings
+            frame[column] = frame[column].astype('string')
+    return frame
+
+def extract_driver_telemetry(session, driver):
+    """Merge one driver's per-lap telemetry into a frame sorted by SessionTime, or None"""
+    import pandas as pd
+
+    driver_laps = session.laps.pick_driver(driver)
+    all_tel = []
+    for _, lap in driver_laps.iterrows():
+        try:
+            tel = lap.get_telemetry()
+            if tel is not None and len(tel) > 0:
+                # Add lap start time to telemetry time
+                lap_start = lap['LapStartTime']
+                if 'Time' in tel.columns:
+                    tel = tel.copy()
+                    tel['SessionTime'] = lap_start + pd.to_timedelta(tel['Time'])
+                    tel['LapNumber'] = lap['LapNumber']
+                    all_tel.append(tel)
+        except Exception:
+            continue
+
+    if not all_tel:
+        return None
+    return pd.concat(all_tel, ignore_index=True).sort_values('SessionTime')
+
+def _session_tables(session):
+    """The non-telemetry session tables as plain frames (None when missing)"""
+    tables = {}
+    for name in SESSION_TABLES:
+        try:
+            table = getattr(session, name, None)
+        except Exception:
+            table = None
+        tables[name] = _plain_frame(table) if table is not None else None
+    return tables
+
+def _session_meta(year, gp, session_type, drivers, telemetry_drivers, date=None, t0_date=None):
+    return {
+        'format': STORE_FORMAT,
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'drivers': [str(d) for d in drivers],
+        'telemetry_drivers': telemetry_drivers,
+        'date': date,
+        't0_date': t0_date,
+        'written_at': datetime.now().isoformat(),
+    }
+
+def _session_date(session):
+    return str(session.date) if hasattr(session, 'date') else None
+
+def _session_t0_date(session):
+    try:
+        t0_date = session.t0_date
+    except Exception:
+        return None
+    return str(t0_date) if t0_date is not None else None
+
+def _iter_driver_telemetry(session):
+    """Yield (driver, merged telemetry) one driver at a time"""
+    for driver in session.drivers:
+        try:
+            tel = extract_driver_telemetry(session, driver)
+        except Exception:
+            continue
+        if tel is not None:
+            yield str(driver), tel
+
+def extract_session(year, gp, session_type, session):
+    """Extract a loaded session into memory, in the same shape as load_store()"""
+    telemetry = dict(_iter_driver_telemetry(session))
+    source = _session_tables(session)
+    source['meta'] = _session_meta(year, gp, session_type, session.drivers, list(telemetry),
+                                   _session_date(session), _session_t0_date(session))
+    source['telemetry'] = telemetry
+    return source
+
+def save_store(year, gp, session_type, drivers, driver_frames, tables, date=None, t0_date=None):
+    """
+    Persist a telemetry store. driver_frames yields (driver, frame) pairs and is
+    consumed one driver at a time; tables maps SESSION_TABLES names to frames.
+    Returns the store as load_store() would.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    store_path = get_store_path(year, gp, session_type)
+    temp_path = tempfile.mkdtemp(prefix=f".{os.path.basename(store_path)}.", suffix='.tmp', dir=STORE_DIR)
+    try:
+        os.makedirs(os.path.join(temp_path, 'drivers'))
+        written = []
+        for driver, tel in driver_frames:
+            _plain_frame(tel).to_parquet(os.path.join(temp_path, 'drivers', f"{driver}.parquet"), index=False)
+            written.append(driver)
+            del tel
+
+        for name, table in tables.items():
+            if table is not None:
+                _plain_frame(table).to_parquet(os.path.join(temp_path, f"{name}.parquet"), index=False)
+
+        # meta.json last: its presence marks the store as complete
+        atomic_write_json(os.path.join(temp_path, 'meta.json'),
+                          _session_meta(year, gp, session_type, drivers, written, date, t0_date))
+
+        # Swap the finished store in; an older store is moved aside first
+        old_path = None
+        if os.path.exists(store_path):
+            old_path = tempfile.mkdtemp(prefix=f".{os.path.basename(store_path)}.", suffix='.old', dir=STORE_DIR)
+            os.rmdir(old_path)
+            os.rename(store_path, old_path)
+        os.rename(temp_path, store_path)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+    print(f"Saved telemetry store for {year} {gp} {session_type} ({len(written)} drivers)")
+    record_artifact(year, gp, session_type, 'store', store_path)
+    return load_store(year, gp, session_type)
+
+def write_store(year, gp, session_type, session):
+    """
+    Extract a loaded FastF1 session and persist it as a telemetry store.
+    Drivers are merged and written one at a time, so only one driver's
+    telemetry is in memory. Returns the store as load_store() would.
+    """
+    return save_store(year, gp, session_type, session.drivers, _iter_driver_telemetry(session),
+                      _session_tables(session), _session_date(session), _session_t0_date(session))
+
+class DriverTelemetry(Mapping):
+    """Read-only mapping of driver number -> telemetry frame, read from Parquet on access"""
+
+    def __init__(self, store_path, drivers):
+        self.store_path = store_path
+        self.drivers = list(drivers)
+
+    def __getitem__(self, driver):
+        return self.load(driver)
+
+    def __iter__(self):
+        return iter(self.drivers)
+
+    def __len__(self):
+        return len(self.drivers)
+
+    def __contains__(self, driver):
+        return driver in self.drivers
+
+    def load(self, driver, columns=None):
+        """Read one driver's telemetry, optionally only some columns"""
+        import pandas as pd
+
+        import pyarrow.parquet as pq
+
+        if driver not in self.drivers:
+            raise KeyError(driver)
+        path = os.path.join(self.store_path, 'drivers', f"{driver}.parquet")
+        with pin_entry(self.store_path):
+            if columns is not None:
+                # Columns FastF1 did not provide for this session are skipped
+                available = set(pq.read_schema(path).names)
+                columns = [c for c in columns if c in available]
+            return pd.read_parquet(path, columns=columns)
+
+def load_store(year, gp, session_type='R'):
+    """
+    Open a session's telemetry store. Returns None if there is no store.
+
+    Returns a dict with 'meta', a frame (or None) for each of SESSION_TABLES,
+    and 'telemetry', a DriverTelemetry mapping that reads drivers lazily.
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+    import pandas as pd
+
+    store_path = get_store_path(year, gp, session_type)
+    meta_path = os.path.join(store_path, 'meta.json')
+    try:
+        with pin_entry(store_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('format') != STORE_FORMAT:
+                print(f"Ignoring telemetry store for {year} {gp} {session_type} (format {meta.get('format')})")
+                return None
+            store = {'meta': meta}
+            for name in SESSION_TABLES:
+                path = os.path.join(store_path, f"{name}.parquet")
+                store[name] = pd.read_parquet(path) if os.path.exists(path) else None
+        touch_access(meta_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error loading telemetry store: {e}")
+        return None
+
+    store['telemetry'] = DriverTelemetry(store_path, meta.get('telemetry_drivers', []))
+    return store
+
+def list_stores():
+    """Sessions with a telemetry store, as (year, gp, session_type) read from their metadata"""
+    sessions = []
+    if not os.path.isdir(STORE_DIR):
+        return sessions
+    for name in sorted(os.listdir(STORE_DIR)):
+        if name.startswith('.'):
+            continue
+        try:
+            with open(os.path.join(STORE_DIR, name, 'meta.json'), 'r') as f:
+                meta = json.load(f)
+            sessions.append((meta['year'], meta['gp'], meta['session']))
+        except (OSError, ValueError, KeyError):
+            continue
+    return sessions
+
+def remove_store(year, gp, session_type='R'):
+    """Delete a session's telemetry store. Returns True if one was removed."""
+    store_path = get_store_path(year, gp, session_type)
+    if not os.path.isdir(store_path):
+        return False
+    shutil.rmtree(store_path, ignore_errors=True)
+    if os.path.exists(store_path):
+        return False
+    forget_artifact(store_path)
+    return True
+
+def get_store_mtime(year, gp, session_type='R'):
+    """mtime (ns) of a store's meta.json, which changes whenever the store is rewritten, or None"""
+    try:
+        return os.stat(os.path.join(get_store_path(year, gp, session_type), 'meta.json')).st_mtime_ns
+    except OSError:
+        return None
+
+def driver_numbers(year, gp, session_type='R'):
+    """
+    Driver codes and numbers -> driver number, for the drivers with telemetry
+    in a session's store. Remembered until the store is rewritten. None
+    without a store.
+    """
+    key = (get_store_path(year, gp, session_type), get_store_mtime(year, gp, session_type))
+    if key[1] is None:
+        return None
+    with _driver_numbers_lock:
+        if key in _driver_numbers:
+            return _driver_numbers[key]
+    store = load_store(year, gp, session_type)
+    if store is None:
+        return None
+    numbers = {driver: driver for driver in store['telemetry']}
+    laps = store.get('laps')
+    if laps is not None and 'Driver' in laps.columns and 'DriverNumber' in laps.columns:
+        for code, number in zip(laps['Driver'].astype(str), laps['DriverNumber'].astype(str)):
+            if number in numbers:
+                numbers[code.upper()] = number
+    with _driver_numbers_lock:
+        _driver_numbers[key] = numbers
+    return numbers
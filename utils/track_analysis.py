@@ -0,0 +1,194 @@
+"""
+Speed along the track, for colouring the track map.
+
+Every driver's telemetry from a session's store is binned by lap distance
+into fixed-length segments, and each segment gets the min, median and max
+speed over the field's representative laps (see season_laps.lap_rows: no pit,
+neutralized, deleted or inaccurate laps) plus the speed of the session's
+fastest lap. Drivers are read one at a time and the statistics come from one
+vectorized group-by over the combined samples.
+
+The segment table is saved as columnar JSON under
+DATA_CACHE_DIR/speed/{year}_{gp}_{session}_{segment}m.json and rebuilt when
+the store is rewritten. Segment midpoints are normalized like the cached
+track coordinates (see track_maps.normalize_coordinates), so they overlay
+the track path served by /api/track.
+
+Configure with environment variables:
+- TRACK_SEGMENT_METRES (optional, defaults to 50)
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from .cache import CACHE_DIR, atomic_write_json, cache_key_lock, get_cache_key, load_track_from_cache, touch_access
+from .season_laps import lap_rows
+from .telemetry_store import get_store_mtime, load_store
+
+SPEED_DIR = os.path.join(CACHE_DIR, 'speed')
+
+DEFAULT_SEGMENT_METRES = float(os.getenv('TRACK_SEGMENT_METRES', '50'))
+MIN_SEGMENT_METRES = 10.0
+MAX_SEGMENT_METRES = 500.0
+
+# Segment tables kept decoded in memory
+SPEED_MEMORY_ENTRIES = 16
+
+# table path -> (file mtime, table)
+_tables = OrderedDict()
+_tables_lock = threading.Lock()
+
+def get_speed_path(year, gp, session_type, segment):
+    """Get the file path of a session's speed segment table"""
+    return os.path.join(SPEED_DIR, f"{get_cache_key(year, gp, session_type)}_{segment:g}m.json")
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _clean_laps(gp, session_type, laps):
+    """Representative lap numbers by driver number, and the fastest of those laps"""
+    rows = lap_rows(gp, session_type, laps)
+    if rows is None:
+        return None, None
+    rows = rows[rows['status'] == 'green']
+    clean = {}
+    for driver, lap in zip(rows['driver_number'].astype(str), rows['lap'].astype(int)):
+        clean.setdefault(driver, []).append(lap)
+    timed = rows[rows['lap_time'].notna()]
+    if len(timed) == 0:
+        return clean, None
+    best = timed.loc[timed['lap_time'].idxmin()]
+    return clean, {'driver': str(best['driver_number']), 'lap': int(best['lap']),
+                   'lap_time': round(float(best['lap_time']), 3)}
+
+def _driver_samples(store, driver, clean, fastest):
+    """One driver's samples on representative laps: distance, speed, x, y and a fastest-lap flag"""
+    tel = store['telemetry'].load(driver, columns=['Distance', 'Speed', 'X', 'Y', 'LapNumber'])
+    tel = tel.dropna(subset=['Distance', 'Speed', 'LapNumber'])
+    laps = tel['LapNumber'].astype(int)
+    if clean is not None:
+        keep = laps.isin(clean.get(driver, []))
+        tel, laps = tel[keep], laps[keep]
+    is_fastest = (laps == fastest['lap']).to_numpy() if fastest and fastest['driver'] == driver else False
+    return tel.assign(fastest=is_fastest)[['Distance', 'Speed', 'X', 'Y', 'fastest']]
+
+def _normalizer(year, gp, x, y):
+    """Map raw X/Y onto the track path's normalized coordinates"""
+    track = load_track_from_cache(year, gp)
+    track = track.get('data') if track else None
+    if track and track.get('scale') and track.get('center'):
+        center_x, center_y, scale = track['center']['x'], track['center']['y'], track['scale']
+    else:
+        # No cached track: normalize by the segments' own bounds
+        center_x, center_y = (x.min() + x.max()) / 2, (y.min() + y.max()) / 2
+        scale = max(x.max() - x.min(), y.max() - y.min()) or 1.0
+    return -(x - center_x) / scale, (y - center_y) / scale
+
+def build_speed_segments(year, gp, session_type, store, segment):
+    """The segment table for a session's store, or None without usable telemetry"""
+    import numpy as np
+    import pandas as pd
+
+    clean, fastest = _clean_laps(gp, session_type, store.get('laps'))
+    samples = []
+    for driver in store['telemetry']:
+        try:
+            samples.append(_driver_samples(store, driver, clean, fastest))
+        except Exception as e:
+            print(f"Could not read telemetry for driver {driver}: {e}")
+    samples = pd.concat(samples, ignore_index=True) if samples else None
+    if samples is None or len(samples) == 0:
+        return None
+
+    track_length = float(samples['Distance'].quantile(0.99))
+    count = max(int(np.ceil(track_length / segment)), 1)
+    samples['segment'] = np.clip((samples['Distance'] // segment).astype(int), 0, count - 1)
+    groups = samples.groupby('segment')
+    stats = groups['Speed'].agg(['min', 'median', 'max', 'size'])
+    stats = stats.join(groups[['X', 'Y']].median())
+    stats = stats.join(samples[samples['fastest']].groupby('segment')['Speed'].mean().rename('fastest'))
+    stats = stats.reindex(range(count))
+
+    x, y = _normalizer(year, gp, stats['X'].to_numpy(), stats['Y'].to_numpy())
+
+    def column(values, decimals):
+        return [None if np.isnan(v) else round(float(v), decimals) for v in values]
+
+    return {
+        'year': year,
+        'gp': gp,
+        'session': session_type,
+        'segment_length': segment,
+        'track_length': round(track_length, 1),
+        'fastest_lap': fastest,
+        'segments': {
+            'start': [round(i * segment, 1) for i in range(count)],
+            'x': column(x, 4),
+            'y': column(y, 4),
+            'min': column(stats['min'], 1),
+            'median': column(stats['median'], 1),
+            'max': column(stats['max'], 1),
+            'fastest': column(stats['fastest'], 1),
+            'samples': [int(v) for v in stats['size'].fillna(0)],
+        },
+    }
+
+def _load_table(path, store_mtime):
+    mtime = _get_mtime(path)
+    with _tables_lock:
+        entry = _tables.get(path)
+        if entry is not None and entry[0] == mtime and mtime is not None:
+            _tables.move_to_end(path)
+            return entry[1]
+    if mtime is None or mtime < store_mtime:
+        return None
+    try:
+        with open(path, 'r') as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_access(path)
+    _remember(path, mtime, table)
+    return table
+
+def _remember(path, mtime, table):
+    with _tables_lock:
+        _tables[path] = (mtime, table)
+        _tables.move_to_end(path)
+        while len(_tables) > SPEED_MEMORY_ENTRIES:
+            _tables.popitem(last=False)
+
+def get_speed_segments(year, gp, session_type='R', segment=DEFAULT_SEGMENT_METRES):
+    """
+    Speed statistics per track segment of segment metres (clamped to
+    MIN/MAX_SEGMENT_METRES) for a session. Returns None without a store.
+    """
+    segment = min(max(float(segment), MIN_SEGMENT_METRES), MAX_SEGMENT_METRES)
+    store_mtime = get_store_mtime(year, gp, session_type)
+    if store_mtime is None:
+        return None
+    path = get_speed_path(year, gp, session_type, segment)
+    table = _load_table(path, store_mtime)
+    if table is not None:
+        return table
+
+    with cache_key_lock(f"{get_cache_key(year, gp, session_type)}_speed"):
+        table = _load_table(path, store_mtime)
+        if table is not None:
+            return table
+        store = load_store(year, gp, session_type)
+        table = build_speed_segments(year, gp, session_type, store, segment) if store is not None else None
+        if table is None:
+            return None
+        try:
+            os.makedirs(SPEED_DIR, exist_ok=True)
+            atomic_write_json(path, table)
+            _remember(path, _get_mtime(path), table)
+        except Exception as e:
+            print(f"Error saving speed segments: {e}")
+    return table
@@ -1,35 +1,39 @@
-import fastf1
-import numpy as np
 import os
-import json
-from datetime import datetime, timedelta
 
-# Enable FastF1 cache
-CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'cache')
-fastf1.Cache.enable_cache(CACHE_DIR)
+from .cache import (
+    cache_key_lock, get_cache_key, load_track_from_cache, save_track_to_cache
+)
+from .fastf1_loader import load_session
+from .track_render import cached_tracks
+
+# Another year's outline of a circuit is reused when every point of each
+# outline lies within this distance of the other (the layout is unchanged)
+CIRCUIT_MATCH_METRES = float(os.getenv('CIRCUIT_MATCH_METRES', '15'))
+
+# Fields taken from the matching year; the stored path is then a shared blob
+GEOMETRY_FIELDS = ('path', 'bounds', 'center', 'scale')
+
+# Outline points compared per step, to bound the size of the distance matrix
+MATCH_CHUNK_POINTS = 256
 
 def get_track_coordinates(year, gp):
     """Extract track coordinates from FastF1 with caching"""
-    # Try to load from cache first (using 'track' as session type for cache key)
-    cache_key = f"{year}_{gp}_track"
-    cache_path = os.path.join(os.path.dirname(__file__), '..', 'data_cache', f"{cache_key}.json")
-    
-    if os.path.exists(cache_path):
-        try:
-            # Check if cache is valid (30 days)
-            file_time = datetime.fromtimestamp(os.path.getmtime(cache_path))
-            if (datetime.now() - file_time) < timedelta(days=30):
-                with open(cache_path, 'r') as f:
-                    cached = json.load(f)
-                    print(f"Loaded track coordinates from cache: {year} {gp}")
-                    return cached['data']
-        except Exception:
-            pass
-    
-    # If not in cache, fetch and process
+    # Try to load from cache first (memory, local disk, then S3)
+    cached = load_track_from_cache(year, gp)
+    if cached and 'data' in cached:
+        return cached['data']
+
+    # Only one process extracts a track; others wait here and then read its result
+    with cache_key_lock(get_cache_key(year, gp, 'track')):
+        cached = load_track_from_cache(year, gp)
+        if cached and 'data' in cached:
+            return cached['data']
+        return _process_track_coordinates(year, gp)
+
+def _process_track_coordinates(year, gp):
+    """Load a session from FastF1, extract and normalize the track, and save it to cache"""
     try:
-        session = fastf1.get_session(year, gp, 'R')
-        session.load()
+        session = load_session(year, gp, 'R')
         
         # Try to get track coordinates directly
         if hasattr(session, 'track_coordinates') and session.track_coordinates is not None:
@@ -112,19 +116,12 @@ def get_track_coordinates(year, gp):
         if sectors:
             result['sectors'] = sectors
         
+        # Reuse another year's outline if the layout has not changed, so the
+        # circuit's geometry is stored (and fetched) once
+        result = shared_geometry(year, gp, result)
+
         # Save to cache
-        try:
-            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
-            with open(cache_path, 'w') as f:
-                json.dump({
-                    'cached_at': datetime.now().isoformat(),
-                    'year': year,
-                    'gp': gp,
-                    'data': result
-                }, f, indent=2)
-            print(f"Saved track coordinates to cache: {year} {gp}")
-        except Exception as e:
-            print(f"Error saving track cache: {e}")
+        save_track_to_cache(year, gp, result)
         
         return result
     
@@ -174,3 +171,51 @@ def normalize_coordinates(track_path):
         'scale': scale
     }
 
+def _raw_outline(track):
+    """A normalized track path back in FastF1 X/Y units (1/10 m), as an (n, 2) array"""
+    import numpy as np
+
+    scale, center = track['scale'], track['center']
+    return np.array([[center['x'] - p['x'] * scale, center['y'] + p['y'] * scale] for p in track['path']])
+
+def _outline_distance(a, b):
+    """Largest distance from a point of outline a to the closed outline b"""
+    import numpy as np
+
+    start = b
+    segment = np.roll(b, -1, axis=0) - start
+    length2 = (segment ** 2).sum(axis=1)
+    length2[length2 == 0] = 1.0
+    largest = 0.0
+    for i in range(0, len(a), MATCH_CHUNK_POINTS):
+        offset = a[i:i + MATCH_CHUNK_POINTS, None, :] - start[None, :, :]
+        t = np.clip((offset * segment[None]).sum(axis=2) / length2, 0.0, 1.0)
+        nearest = np.sqrt(((offset - t[..., None] * segment[None]) ** 2).sum(axis=2)).min(axis=1)
+        largest = max(largest, float(nearest.max()))
+    return largest
+
+def shared_geometry(year, gp, track):
+    """
+    The track with another cached year's geometry (GEOMETRY_FIELDS) if that
+    year's outline matches within CIRCUIT_MATCH_METRES, nearest year first;
+    otherwise the track unchanged.
+    """
+    if not track.get('path') or not track.get('scale'):
+        return track
+    outline = None
+    for other_year in sorted((y for y, g in cached_tracks() if g == gp and y != year), key=lambda y: abs(y - year)):
+        cached = load_track_from_cache(other_year, gp)
+        other = cached.get('data') if cached else None
+        if not other or not other.get('path') or not other.get('scale'):
+            continue
+        try:
+            outline = _raw_outline(track) if outline is None else outline
+            other_outline = _raw_outline(other)
+            distance = max(_outline_distance(outline, other_outline), _outline_distance(other_outline, outline))
+        except Exception as e:
+            print(f"Could not compare {gp} outlines with {other_year}: {e}")
+            continue
+        if distance <= CIRCUIT_MATCH_METRES * 10:
+            print(f"{year} {gp} layout matches {other_year} (within {distance / 10:.1f}m): sharing its geometry")
+            return dict(track, **{field: other[field] for field in GEOMETRY_FIELDS if field in other})
+    return track
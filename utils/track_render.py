@@ -0,0 +1,198 @@
+"""
+Pre-rendered track outlines for race pickers and previews.
+
+Drawing a track from /api/track means downloading its coordinate array and
+building the path in the browser. For every cached track this renders once:
+
+    path.json       a compact SVG path (absolute start, then relative steps
+                    rounded to 0.1 units, points closer than 0.5 units
+                    dropped) in the same 800 x 600 viewBox and orientation as
+                    TrackMap.jsx
+    {size}.png      square transparent thumbnails at THUMBNAIL_SIZES pixels,
+                    drawn headless with matplotlib's Agg renderer
+
+under DATA_CACHE_DIR/renders/{year}_{gp}/. Renders are rebuilt when the
+track file changes. render_all() renders many tracks in parallel worker
+processes; the endpoints render a single missing track on first request.
+PNG thumbnails require matplotlib; SVG paths do not.
+
+Configure with environment variables:
+- TRACK_THUMBNAIL_SIZES (optional, comma-separated pixels, defaults to 64,128,256)
+"""
+
+import io
+import os
+import json
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import (
+    CACHE_DIR, atomic_write_bytes, atomic_write_json, cache_key_lock, get_cache_key,
+    get_track_cache_path, load_track_from_cache, parse_cache_key, touch_access
+)
+
+RENDER_DIR = os.path.join(CACHE_DIR, 'renders')
+
+THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv('TRACK_THUMBNAIL_SIZES', '64,128,256').split(',') if size)
+
+# matplotlib is only needed for PNG thumbnails
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+
+# SVG viewBox, matching TrackMap.jsx
+VIEWBOX_WIDTH = 800
+VIEWBOX_HEIGHT = 600
+PADDING = 0.85
+
+# Points closer than this (viewBox units) to the last kept point are dropped
+MIN_STEP = 0.5
+
+def get_render_dir(year, gp):
+    """Get the directory holding a track's renders"""
+    return os.path.join(RENDER_DIR, f"{year}_{gp}")
+
+def _get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _outline(track):
+    """The track path as (x, y) lists, oriented like the plots (x un-inverted, y up)"""
+    path = track.get('path') or []
+    return [-p['x'] for p in path], [p['y'] for p in path]
+
+def svg_path(track, width=VIEWBOX_WIDTH, height=VIEWBOX_HEIGHT):
+    """A compact SVG path for a track in a width x height viewBox, or None without points"""
+    xs, ys = _outline(track)
+    if not xs:
+        return None
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    scale = min(width / ((max_x - min_x) or 1), height / ((max_y - min_y) or 1)) * PADDING
+    offset_x = width / 2 - (min_x + max_x) / 2 * scale
+    offset_y = height / 2 + (min_y + max_y) / 2 * scale
+
+    # Tenths of a unit as integers, so relative steps add up exactly
+    points = []
+    for x, y in zip(xs, ys):
+        point = (round((x * scale + offset_x) * 10), round((-y * scale + offset_y) * 10))
+        if not points or max(abs(point[0] - points[-1][0]), abs(point[1] - points[-1][1])) >= MIN_STEP * 10:
+            points.append(point)
+
+    def number(tenths):
+        return f"{tenths / 10:g}"
+
+    steps = [f"{number(x - px)} {number(y - py)}" for (px, py), (x, y) in zip(points, points[1:])]
+    d = f"M{number(points[0][0])} {number(points[0][1])}" + (f"l{' '.join(steps)}" if steps else '') + 'Z'
+    return {
+        'viewBox': f"0 0 {width} {height}",
+        'd': d,
+        'start': [points[0][0] / 10, points[0][1] / 10],
+        'points': len(points),
+    }
+
+def render_png(track, size):
+    """A square transparent PNG of a track's outline, size pixels wide"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+
+    xs, ys = _outline(track)
+    figure = Figure(figsize=(size / 100, size / 100), dpi=100)
+    axes = figure.add_axes([0.05, 0.05, 0.9, 0.9])
+    axes.plot(xs + xs[:1], ys + ys[:1], color='#888888', linewidth=max(size / 64, 1.0),
+              solid_capstyle='round', solid_joinstyle='round')
+    axes.plot(xs[:1], ys[:1], 'o', color='#e10600', markersize=max(size / 32, 2.0))
+    axes.set_aspect('equal', adjustable='datalim')
+    axes.axis('off')
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', transparent=True)
+    return buffer.getvalue()
+
+def _is_current(path, track_path):
+    mtime = _get_mtime(path)
+    track_mtime = _get_mtime(track_path)
+    return mtime is not None and (track_mtime is None or mtime >= track_mtime)
+
+def is_render_current(year, gp, name):
+    """Whether a track's render ('path.json' or '{size}.png') is up to date with its track file"""
+    return _is_current(os.path.join(get_render_dir(year, gp), name), get_track_cache_path(year, gp))
+
+def render_track(year, gp, sizes=THUMBNAIL_SIZES, force=False):
+    """
+    Render a cached track's SVG path and (with matplotlib) its thumbnails.
+    Returns False if the track is not cached.
+    """
+    track_path = get_track_cache_path(year, gp)
+    render_dir = get_render_dir(year, gp)
+    with cache_key_lock(f"{get_cache_key(year, gp, 'track')}_render"):
+        wanted = ['path.json'] + ([f"{size}.png" for size in sizes] if MATPLOTLIB_AVAILABLE else [])
+        missing = [name for name in wanted if force or not _is_current(os.path.join(render_dir, name), track_path)]
+        if not missing:
+            return True
+        cached = load_track_from_cache(year, gp)
+        track = cached.get('data') if cached else None
+        if not track or not track.get('path'):
+            return False
+        os.makedirs(render_dir, exist_ok=True)
+        for name in missing:
+            if name == 'path.json':
+                atomic_write_json(os.path.join(render_dir, name), svg_path(track))
+            else:
+                atomic_write_bytes(os.path.join(render_dir, name), render_png(track, int(name.split('.')[0])))
+    return True
+
+def get_track_svg(year, gp):
+    """A track's SVG path (see svg_path), rendered on first request, or None if the track is not cached"""
+    path = os.path.join(get_render_dir(year, gp), 'path.json')
+    if not _is_current(path, get_track_cache_path(year, gp)) and not render_track(year, gp, sizes=()):
+        return None
+    try:
+        with open(path, 'r') as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch_access(path)
+    return result
+
+def get_thumbnail_path(year, gp, size):
+    """
+    Path of a track's PNG thumbnail, rendered on first request, or None if the
+    track is not cached. Raises ValueError for a size not in THUMBNAIL_SIZES
+    and RuntimeError without matplotlib.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"size must be one of {', '.join(str(s) for s in THUMBNAIL_SIZES)}")
+    if not MATPLOTLIB_AVAILABLE:
+        raise RuntimeError("PNG thumbnails require matplotlib")
+    path = os.path.join(get_render_dir(year, gp), f"{size}.png")
+    if not _is_current(path, get_track_cache_path(year, gp)) and not render_track(year, gp, sizes=(size,)):
+        return None
+    touch_access(path)
+    return path
+
+def cached_tracks():
+    """(year, gp) of every track file in the local cache"""
+    tracks = []
+    for name in sorted(os.listdir(CACHE_DIR)) if os.path.isdir(CACHE_DIR) else []:
+        parsed = parse_cache_key(name[:-len('.json')]) if name.endswith('_track.json') else None
+        if parsed and parsed[2] == 'track':
+            tracks.append((parsed[0], parsed[1]))
+    return tracks
+
+def _render_one(args):
+    year, gp, force = args
+    try:
+        return year, gp, render_track(year, gp, force=force), None
+    except Exception as e:
+        return year, gp, False, str(e)
+
+def render_all(tracks=None, workers=None, force=False):
+    """
+    Render many tracks (default: every cached track) in worker processes.
+    Yields (year, gp, rendered, error) as tracks finish.
+    """
+    tracks = cached_tracks() if tracks is None else tracks
+    if not tracks:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_render_one, [(year, gp, force) for year, gp in tracks])
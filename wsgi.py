@@ -0,0 +1,23 @@
+"""
+Production WSGI entry point.
+
+Run with:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so this module is imported once in the
+master process. The hottest cached races are loaded here, before the
+workers are forked, so every worker shares them copy-on-write.
+"""
+
+import gc
+
+from app import create_app
+from utils.hot_cache import preload_hot_races
+
+app = create_app()
+
+preload_hot_races()
+
+# Move everything allocated so far out of the collector's view so that GC
+# passes in the workers don't write to (and un-share) the preloaded pages
+gc.freeze()